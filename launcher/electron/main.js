@@ -177,7 +177,7 @@ ipcMain.handle('sync:check', async (event, { serverUrl }) => {
     for (const folder of folders) {
       const targetDir = path.join(gameManager.getMinecraftDir(), folder.id)
       const manager = new FileSyncManager(targetDir, config.global_settings)
-      const manifest = await manager.fetchJSON(`${url}/sync/${folder.id}/manifest`)
+      const manifest = await manager.fetchManifest(`${url}/sync/${folder.id}/manifest`)
       const diff = await manager.checkDiff(manifest, folder.extensions)
       totalToDownload += diff.toDownload.length
       totalToDelete += diff.toDelete.length
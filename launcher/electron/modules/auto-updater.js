@@ -6,6 +6,8 @@ const fs = require('fs')
 const path = require('path')
 const { spawn } = require('child_process')
 const yaml = require('js-yaml')
+const { differentialDownload, sha512File } = require('./differential-download')
+const { getMachineId } = require('./machine-id')
 
 const UPDATE_URL = 'http://mc.sivita.xyz:5806/updates'
 
@@ -26,7 +28,8 @@ function safeSend(channel, data) {
 function httpGet(url, options = {}) {
   return new Promise((resolve, reject) => {
     const mod = url.startsWith('https') ? https : http
-    const req = mod.get(url, { timeout: options.timeout || 15000 }, (res) => {
+    const headers = options.headers || {}
+    const req = mod.get(url, { timeout: options.timeout || 15000, headers }, (res) => {
       if (res.statusCode >= 300 && res.statusCode < 400 && res.headers.location) {
         return httpGet(res.headers.location, options).then(resolve, reject)
       }
@@ -43,6 +46,13 @@ function httpGet(url, options = {}) {
   })
 }
 
+/**
+ * 获取 latest.yml，带上机器码（服务端分批发布时按机器码决定是否返回新版本）
+ */
+function fetchLatestYml() {
+  return httpGet(`${UPDATE_URL}/latest.yml`, { headers: { 'X-Machine-Id': getMachineId() } })
+}
+
 /**
  * 比较语义版本号: 返回 1 (a>b), -1 (a<b), 0 (a==b)
  */
@@ -102,7 +112,7 @@ async function checkForUpdates() {
   const currentVersion = app.getVersion()
   log.info(`检查更新... 当前版本: ${currentVersion}`)
 
-  const buf = await httpGet(`${UPDATE_URL}/latest.yml`)
+  const buf = await fetchLatestYml()
   const info = yaml.load(buf.toString('utf-8'))
   const remoteVersion = info.version
 
@@ -131,7 +141,7 @@ async function downloadUpdate() {
 
   try {
     // 1. 获取 latest.yml
-    const buf = await httpGet(`${UPDATE_URL}/latest.yml`)
+    const buf = await fetchLatestYml()
     const info = yaml.load(buf.toString('utf-8'))
     const fileName = info.files?.[0]?.url || info.path
     const fileSize = info.files?.[0]?.size || 0
@@ -160,16 +170,24 @@ async function downloadUpdate() {
       fs.unlinkSync(newExePath)
     }
 
-    // 3. 下载到目标路径
-    await downloadFile(downloadUrl, newExePath, fileSize)
+    // 3. 优先差分下载（只下载与当前版本不同的块），不可用或失败时完整下载
+    const sha512 = info.files?.[0]?.sha512 || info.sha512
+    if (!await tryDifferentialDownload(info, fileName, newExePath, sha512)) {
+      await downloadFile(downloadUrl, newExePath, fileSize)
+    }
 
-    // 4. 验证文件大小
+    // 4. 验证文件大小和 sha512
     const stat = fs.statSync(newExePath)
     if (fileSize > 0 && stat.size !== fileSize) {
       log.error(`下载文件大小不匹配: ${stat.size} vs ${fileSize}`)
       fs.unlinkSync(newExePath)
       throw new Error('下载文件大小不匹配')
     }
+    if (sha512 && await sha512File(newExePath) !== sha512) {
+      log.error('下载文件 sha512 不匹配')
+      fs.unlinkSync(newExePath)
+      throw new Error('下载文件校验失败')
+    }
 
     log.info(`下载完成: ${newExePath} (${stat.size} bytes)`)
     safeSend('updater:downloaded', { version: info.version })
@@ -182,6 +200,44 @@ async function downloadUpdate() {
   }
 }
 
+/**
+ * 差分下载：用当前版本和新版本的 blockmap 比较，相同的块从当前 exe 复制，其余块按 Range 下载
+ * 需要 latest.yml 带 blockMapSize（由服务端 releases.py 发布）且当前是 portable exe
+ */
+async function tryDifferentialDownload(info, fileName, dest, sha512) {
+  const currentExe = process.env.PORTABLE_EXECUTABLE_FILE
+  if (!currentExe || !info.files?.[0]?.blockMapSize) return false
+
+  let lastReport = 0
+  try {
+    const result = await differentialDownload({
+      oldFile: currentExe,
+      oldBlockmapUrl: `${UPDATE_URL}/CubeRecall-${app.getVersion()}.exe.blockmap`,
+      newBlockmapUrl: `${UPDATE_URL}/${fileName}.blockmap`,
+      fileUrl: `${UPDATE_URL}/${fileName}`,
+      dest,
+      sha512,
+      onProgress: (transferred, total) => {
+        const now = Date.now()
+        if (total > 0 && now - lastReport > 500) {
+          lastReport = now
+          safeSend('updater:progress', {
+            percent: Math.round((transferred / total) * 100),
+            transferred,
+            total,
+            bytesPerSecond: 0
+          })
+        }
+      },
+    })
+    log.info(`差分下载完成: 下载 ${result.downloadBytes} bytes，复用本地 ${result.reusedBytes} bytes`)
+    return true
+  } catch (err) {
+    log.info(`差分下载不可用，改为完整下载: ${err.message}`)
+    return false
+  }
+}
+
 /**
  * 启动新版本 exe 并退出当前进程
  */
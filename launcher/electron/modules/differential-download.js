@@ -0,0 +1,182 @@
+const fs = require('fs')
+const http = require('http')
+const https = require('https')
+const zlib = require('zlib')
+const crypto = require('crypto')
+const pLimit = require('p-limit')
+
+// 单个 Range 请求最多下载的字节数，较大的连续区间拆成多个请求
+const MAX_RANGE_BYTES = 4 * 1024 * 1024
+// 两段待下载区间之间的已有数据小于该值时一并下载，减少请求次数
+const MERGE_GAP_BYTES = 32 * 1024
+const CONCURRENCY = 4
+
+const agents = {
+  'http:': new http.Agent({ keepAlive: true, maxSockets: CONCURRENCY }),
+  'https:': new https.Agent({ keepAlive: true, maxSockets: CONCURRENCY }),
+}
+
+/**
+ * GET 请求，返回 { status, headers, body }，自动跟随重定向
+ */
+function request(url, headers = {}, timeout = 30000) {
+  return new Promise((resolve, reject) => {
+    const { protocol } = new URL(url)
+    const mod = protocol === 'https:' ? https : http
+    const req = mod.get(url, { headers, timeout, agent: agents[protocol] }, (res) => {
+      if (res.statusCode >= 300 && res.statusCode < 400 && res.headers.location) {
+        res.resume()
+        return request(new URL(res.headers.location, url).href, headers, timeout).then(resolve, reject)
+      }
+      const chunks = []
+      res.on('data', c => chunks.push(c))
+      res.on('end', () => resolve({ status: res.statusCode, headers: res.headers, body: Buffer.concat(chunks) }))
+      res.on('error', reject)
+    })
+    req.on('error', reject)
+    req.on('timeout', () => { req.destroy(); reject(new Error('timeout')) })
+  })
+}
+
+/**
+ * 下载并解析 blockmap（gzip 压缩的 JSON）
+ */
+async function fetchBlockmap(url) {
+  const res = await request(url)
+  if (res.status !== 200) throw new Error(`blockmap HTTP ${res.status}: ${url}`)
+  const file = JSON.parse(zlib.gunzipSync(res.body).toString('utf-8')).files[0]
+  return { checksums: file.checksums, sizes: file.sizes }
+}
+
+/**
+ * 比较新旧 blockmap，得到按新文件顺序排列的操作：
+ * { type: 'copy', from, to, size } 从本地旧文件复制；{ type: 'download', start, end } 从服务器下载
+ */
+function planOperations(oldMap, newMap) {
+  const oldBlocks = new Map()
+  let offset = 0
+  oldMap.checksums.forEach((checksum, i) => {
+    const key = `${checksum}:${oldMap.sizes[i]}`
+    if (!oldBlocks.has(key)) oldBlocks.set(key, offset)
+    offset += oldMap.sizes[i]
+  })
+
+  const ops = []
+  offset = 0
+  newMap.checksums.forEach((checksum, i) => {
+    const size = newMap.sizes[i]
+    const from = oldBlocks.get(`${checksum}:${size}`)
+    const last = ops[ops.length - 1]
+    if (from === undefined) {
+      if (last && last.type === 'download') last.end += size
+      else ops.push({ type: 'download', start: offset, end: offset + size })
+    } else if (last && last.type === 'copy' && last.from + last.size === from) {
+      last.size += size
+    } else {
+      ops.push({ type: 'copy', from, to: offset, size })
+    }
+    offset += size
+  })
+
+  // 夹在两段下载之间的短复制改为一起下载
+  const merged = []
+  for (const op of ops) {
+    const prev = merged[merged.length - 1]
+    const prev2 = merged[merged.length - 2]
+    if (op.type === 'download' && prev && prev.type === 'copy' && prev.size < MERGE_GAP_BYTES &&
+        prev2 && prev2.type === 'download') {
+      merged.pop()
+      prev2.end = op.end
+    } else {
+      merged.push(op)
+    }
+  }
+
+  const ranges = []
+  for (const op of merged) {
+    if (op.type !== 'download') continue
+    for (let start = op.start; start < op.end; start += MAX_RANGE_BYTES) {
+      ranges.push({ start, end: Math.min(start + MAX_RANGE_BYTES, op.end) })
+    }
+  }
+  return {
+    copies: merged.filter(op => op.type === 'copy'),
+    ranges,
+    totalSize: offset,
+    downloadBytes: ranges.reduce((sum, r) => sum + r.end - r.start, 0),
+  }
+}
+
+/**
+ * 流式计算文件 sha512（base64，与 latest.yml 一致）
+ */
+function sha512File(filepath) {
+  return new Promise((resolve, reject) => {
+    const hash = crypto.createHash('sha512')
+    fs.createReadStream(filepath)
+      .on('data', c => hash.update(c))
+      .on('end', () => resolve(hash.digest('base64')))
+      .on('error', reject)
+  })
+}
+
+/**
+ * 差分下载：与旧版本相同的块从本地 oldFile 复制，其余块用 Range 请求下载，写入 dest 后校验 sha512
+ * 任何一步失败都会抛出异常并删除 dest，由调用方回退为完整下载
+ */
+async function differentialDownload({ oldFile, oldBlockmapUrl, newBlockmapUrl, fileUrl, dest, sha512, onProgress }) {
+  const [oldMap, newMap] = await Promise.all([fetchBlockmap(oldBlockmapUrl), fetchBlockmap(newBlockmapUrl)])
+  const oldSize = oldMap.sizes.reduce((a, b) => a + b, 0)
+  if (fs.statSync(oldFile).size !== oldSize) throw new Error('本地版本与 blockmap 不符')
+
+  const plan = planOperations(oldMap, newMap)
+  const oldFd = fs.openSync(oldFile, 'r')
+  const fd = fs.openSync(dest, 'w')
+  try {
+    const buf = Buffer.alloc(MAX_RANGE_BYTES)
+    for (const op of plan.copies) {
+      for (let done = 0; done < op.size; done += MAX_RANGE_BYTES) {
+        const n = Math.min(MAX_RANGE_BYTES, op.size - done)
+        fs.readSync(oldFd, buf, 0, n, op.from + done)
+        fs.writeSync(fd, buf, 0, n, op.to + done)
+      }
+    }
+
+    let transferred = 0
+    let etag = null
+    const limit = pLimit(CONCURRENCY)
+    await Promise.all(plan.ranges.map(range => limit(async () => {
+      const headers = { Range: `bytes=${range.start}-${range.end - 1}` }
+      // 下载期间服务器上的文件被替换时返回 200 整个文件，直接失败
+      if (etag) headers['If-Range'] = etag
+      const res = await request(fileUrl, headers)
+      if (res.status !== 206 || res.body.length !== range.end - range.start) {
+        throw new Error(`Range 请求失败: HTTP ${res.status}`)
+      }
+      etag = etag || res.headers.etag
+      fs.writeSync(fd, res.body, 0, res.body.length, range.start)
+      transferred += res.body.length
+      if (onProgress) onProgress(transferred, plan.downloadBytes)
+    })))
+    fs.ftruncateSync(fd, plan.totalSize)
+  } catch (err) {
+    fs.closeSync(fd)
+    try { fs.unlinkSync(dest) } catch (_) {}
+    throw err
+  } finally {
+    fs.closeSync(oldFd)
+  }
+  fs.closeSync(fd)
+
+  if (sha512 && await sha512File(dest) !== sha512) {
+    fs.unlinkSync(dest)
+    throw new Error('差分下载结果 sha512 校验失败')
+  }
+  return { downloadBytes: plan.downloadBytes, reusedBytes: plan.totalSize - plan.downloadBytes }
+}
+
+module.exports = {
+  differentialDownload,
+  planOperations,
+  sha512File,
+}
@@ -4,6 +4,8 @@ const crypto = require('crypto')
 const https = require('https')
 const http = require('http')
 const pLimit = require('p-limit')
+const { getMachineId } = require('./machine-id')
+const { MEDIA_TYPE, unpackManifest } = require('./manifest-pack')
 
 /**
  * 通用文件同步管理器
@@ -41,7 +43,8 @@ class FileSyncManager {
       const mod = url.startsWith('https') ? https : http
       const Agent = mod.Agent
       const options = {
-        headers: { 'User-Agent': 'CubeRecall/1.0' },
+        // 机器码用于服务端分批发布时确定本机拿到新清单还是旧清单
+        headers: { 'User-Agent': 'CubeRecall/1.0', 'X-Machine-Id': getMachineId() },
         agent: new Agent({ keepAlive: false }),
         timeout: this.timeout
       }
@@ -61,6 +64,43 @@ class FileSyncManager {
     })
   }
 
+  /**
+   * 获取文件清单：优先请求二进制清单（体积更小），服务端不支持时照常返回 JSON
+   */
+  fetchManifest(url) {
+    return new Promise((resolve, reject) => {
+      const mod = url.startsWith('https') ? https : http
+      const Agent = mod.Agent
+      const options = {
+        headers: {
+          'User-Agent': 'CubeRecall/1.0',
+          'X-Machine-Id': getMachineId(),
+          'Accept': `${MEDIA_TYPE}, application/json;q=0.5`
+        },
+        agent: new Agent({ keepAlive: false }),
+        timeout: this.timeout
+      }
+
+      mod.get(url, options, (res) => {
+        if (res.statusCode !== 200) {
+          res.resume()
+          reject(new Error(`HTTP ${res.statusCode}`))
+          return
+        }
+        const chunks = []
+        res.on('data', chunk => chunks.push(chunk))
+        res.on('end', () => {
+          try {
+            const body = Buffer.concat(chunks)
+            const type = (res.headers['content-type'] || '').split(';')[0].trim()
+            resolve(type === MEDIA_TYPE ? unpackManifest(body) : JSON.parse(body.toString('utf-8')))
+          } catch (e) { reject(e) }
+        })
+        res.on('error', reject)
+      }).on('error', reject).on('timeout', () => reject(new Error('Request timeout')))
+    })
+  }
+
   /**
    * 下载文件（带重定向支持）
    */
@@ -256,7 +296,7 @@ class FileSyncManager {
 
     // 1. 获取服务器清单
     onProgress({ stage: 'checking', percent: 0, message: '正在检查文件差异...' })
-    const manifest = await this.fetchJSON(manifestUrl)
+    const manifest = await this.fetchManifest(manifestUrl)
 
     // 1.5 清理不在清单中的文件和目录
     const cleaned = this.cleanUntracked(manifest, extensions)
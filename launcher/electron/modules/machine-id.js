@@ -1,11 +1,14 @@
 const { execSync } = require('child_process')
 const crypto = require('crypto')
 
+let cachedId = null
+
 /**
  * 获取机器唯一标识
- * 基于 CPU ID + 主板序列号 + 磁盘序列号 生成 SHA256 hash
+ * 基于 CPU ID + 主板序列号 + 磁盘序列号 生成 SHA256 hash（进程内只计算一次）
  */
 function getMachineId() {
+  if (cachedId) return cachedId
   const parts = []
 
   // CPU ID
@@ -54,7 +57,8 @@ function getMachineId() {
   }
 
   const raw = parts.join('|')
-  return crypto.createHash('sha256').update(raw).digest('hex')
+  cachedId = crypto.createHash('sha256').update(raw).digest('hex')
+  return cachedId
 }
 
 module.exports = { getMachineId }
@@ -0,0 +1,106 @@
+/**
+ * 二进制清单（MessagePack）解码，格式见服务端 manifest_pack.py
+ * 清单只用到 map / array / str / bin / int，这里自带一个小的解码器，不引入额外依赖
+ */
+
+const MEDIA_TYPE = 'application/x-msgpack'
+const FORMAT_VERSION = 1
+
+function decode(buf) {
+  let pos = 0
+
+  const bytes = (n) => {
+    if (pos + n > buf.length) throw new Error('MessagePack 数据不完整')
+    const out = buf.subarray(pos, pos + n)
+    pos += n
+    return out
+  }
+  const str = (n) => bytes(n).toString('utf-8')
+  const array = (n) => {
+    const out = new Array(n)
+    for (let i = 0; i < n; i++) out[i] = value()
+    return out
+  }
+  const map = (n) => {
+    const out = {}
+    for (let i = 0; i < n; i++) {
+      const key = value()
+      out[key] = value()
+    }
+    return out
+  }
+
+  function value() {
+    const b = bytes(1)[0]
+    if (b <= 0x7f) return b
+    if (b >= 0xe0) return b - 0x100
+    if ((b & 0xf0) === 0x80) return map(b & 0x0f)
+    if ((b & 0xf0) === 0x90) return array(b & 0x0f)
+    if ((b & 0xe0) === 0xa0) return str(b & 0x1f)
+    switch (b) {
+      case 0xc0: return null
+      case 0xc2: return false
+      case 0xc3: return true
+      case 0xc4: return bytes(bytes(1)[0])
+      case 0xc5: return bytes(bytes(2).readUInt16BE(0))
+      case 0xc6: return bytes(bytes(4).readUInt32BE(0))
+      case 0xca: return bytes(4).readFloatBE(0)
+      case 0xcb: return bytes(8).readDoubleBE(0)
+      case 0xcc: return bytes(1)[0]
+      case 0xcd: return bytes(2).readUInt16BE(0)
+      case 0xce: return bytes(4).readUInt32BE(0)
+      case 0xcf: return Number(bytes(8).readBigUInt64BE(0))
+      case 0xd0: return bytes(1).readInt8(0)
+      case 0xd1: return bytes(2).readInt16BE(0)
+      case 0xd2: return bytes(4).readInt32BE(0)
+      case 0xd3: return Number(bytes(8).readBigInt64BE(0))
+      case 0xd9: return str(bytes(1)[0])
+      case 0xda: return str(bytes(2).readUInt16BE(0))
+      case 0xdb: return str(bytes(4).readUInt32BE(0))
+      case 0xdc: return array(bytes(2).readUInt16BE(0))
+      case 0xdd: return array(bytes(4).readUInt32BE(0))
+      case 0xde: return map(bytes(2).readUInt16BE(0))
+      case 0xdf: return map(bytes(4).readUInt32BE(0))
+      default: throw new Error(`不支持的 MessagePack 类型: 0x${b.toString(16)}`)
+    }
+  }
+
+  return value()
+}
+
+/**
+ * 还原成与 JSON 清单相同的结构：{ 相对路径: { md5, size, url } }
+ */
+function unpackManifest(buf) {
+  const doc = decode(buf)
+  if (doc.v !== FORMAT_VERSION) throw new Error(`不支持的清单格式: ${doc.v}`)
+  const urls = new Map(doc.urls || [])
+  const manifest = {}
+  // 路径按 UTF-8 字节前缀压缩：在同一块缓冲区里把后缀写到前缀之后，拼回字节后再解码，避免把多字节字符截断
+  let path = Buffer.alloc(4096)
+  for (let i = 0; i < doc.prefix.length; i++) {
+    const shared = doc.prefix[i]
+    const suffix = doc.suffix[i]
+    const length = shared + suffix.length
+    if (length > path.length) {
+      const grown = Buffer.alloc(length * 2)
+      path.copy(grown, 0, 0, shared)
+      path = grown
+    }
+    suffix.copy(path, shared)
+    const relPath = path.toString('utf-8', 0, length)
+    const md5 = doc.md5.toString('hex', i * 16, i * 16 + 16)
+    manifest[relPath] = {
+      md5,
+      size: doc.size[i],
+      url: urls.get(i) || (doc.md5_url ? `${doc.base}/${md5}/${relPath}` : `${doc.base}/${relPath}`),
+    }
+  }
+  return manifest
+}
+
+module.exports = {
+  MEDIA_TYPE,
+  decode,
+  unpackManifest,
+}
@@ -30,7 +30,7 @@ async function checkMods(serverUrl) {
   const modsDir = path.join(gameManager.getMinecraftDir(), 'mods')
 
   const syncManager = new FileSyncManager(modsDir)
-  const manifest = await syncManager.fetchJSON(`${serverUrl}/mods/manifest`)
+  const manifest = await syncManager.fetchManifest(`${serverUrl}/mods/manifest`)
   const diff = await syncManager.checkDiff(manifest, ['.jar'])
 
   return diff
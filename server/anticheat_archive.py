@@ -0,0 +1,174 @@
+"""违规记录归档
+
+anticheat_logs 只增不减，这里按保留期（ANTICHEAT_RETENTION_DAYS）把更早的原始记录移出热表：
+- 按 UTC 自然日写成 gzip 压缩的 NDJSON 分段文件 <日期>-<首行id>.ndjson.gz，每段最多 SEGMENT_ROWS 行
+- 分段写入临时文件、fsync 后原子改名，之后才在一个事务里从热表删除整段对应的行；写好的分段不再修改
+- 写入后、删除提交前若进程中断，整段仍在热表，下一轮会重新写成同名分段（首行 id 相同）覆盖，不会重复
+
+由 reaper 每轮顺带执行。/anticheat/logs 和导出接口在热表不够时继续读归档，
+按玩家查询时先从汇总表（anticheat_rollups.py）找出有记录的日期，只打开这些日期的分段。
+"""
+import datetime
+import gzip
+import json
+import logging
+import os
+import re
+from typing import Iterable, Iterator, List, Optional, Set, Tuple
+
+from sqlalchemy import func, select
+
+from database import SessionLocal, run_write
+from models import AntiCheatLog
+from search_index import remove_from_index
+from counters import bump
+from config import ANTICHEAT_RETENTION_DAYS, ANTICHEAT_ARCHIVE_DIR, REAPER_BATCH_SIZE
+
+logger = logging.getLogger("anticheat_archive")
+
+SEGMENT_ROWS = 10000
+
+_SEGMENT_NAME = re.compile(r"(\d{4}-\d{2}-\d{2})-(\d+)\.ndjson\.gz")
+
+
+def log_to_dict(log: AntiCheatLog) -> dict:
+    return {
+        "id": log.id,
+        "username": log.username,
+        "client_ip": log.client_ip,
+        "violation_count": log.violation_count,
+        "reason": log.reason,
+        "created_at": log.created_at.isoformat() if log.created_at else None,
+    }
+
+
+def _day_start(day: datetime.date) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time())
+
+
+def list_segments() -> List[Tuple[datetime.date, str]]:
+    """[(日期, 路径), ...]，按日期和首行 id 升序"""
+    if not os.path.isdir(ANTICHEAT_ARCHIVE_DIR):
+        return []
+    segments = []
+    for name in os.listdir(ANTICHEAT_ARCHIVE_DIR):
+        match = _SEGMENT_NAME.fullmatch(name)
+        if match:
+            day = datetime.date.fromisoformat(match.group(1))
+            segments.append((day, int(match.group(2)), os.path.join(ANTICHEAT_ARCHIVE_DIR, name)))
+    return [(day, path) for day, _, path in sorted(segments)]
+
+
+def _write_segment(path: str, rows: List[dict]):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as raw:
+        with gzip.GzipFile(fileobj=raw, mode="wb") as gz:
+            for row in rows:
+                gz.write((json.dumps(row, ensure_ascii=False) + "\n").encode("utf-8"))
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(tmp, path)
+
+
+def _read_segment(path: str) -> List[dict]:
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def archive_old_logs(retention_days: int = ANTICHEAT_RETENTION_DAYS, batch_size: int = REAPER_BATCH_SIZE) -> int:
+    """把保留期之前的违规记录写入归档分段并从热表删除，返回归档行数"""
+    if retention_days <= 0:
+        return 0
+    today = datetime.datetime.utcnow().date()
+    cutoff = _day_start(today - datetime.timedelta(days=retention_days))
+    os.makedirs(ANTICHEAT_ARCHIVE_DIR, exist_ok=True)
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            oldest = db.scalar(select(func.min(AntiCheatLog.created_at)))
+            if oldest is None or oldest >= cutoff:
+                break
+            day = oldest.date()
+            end = min(_day_start(day + datetime.timedelta(days=1)), cutoff)
+            logs = db.scalars(
+                select(AntiCheatLog).where(AntiCheatLog.created_at < end)
+                .order_by(AntiCheatLog.created_at, AntiCheatLog.id).limit(SEGMENT_ROWS)
+            ).all()
+            rows = [log_to_dict(log) for log in logs]
+            db.expunge_all()
+            _write_segment(os.path.join(ANTICHEAT_ARCHIVE_DIR, f"{day.isoformat()}-{rows[0]['id']}.ndjson.gz"), rows)
+
+            ids = [row["id"] for row in rows]
+
+            # 整段在同一个事务里删除（语句按 batch_size 分批，避免 IN 列表过长），
+            # 中断时要么整段都还在热表、下一轮重写同名分段，要么整段都已删除，不会有行被归档两次
+            def _delete(s, ids=ids):
+                removed = 0
+                for i in range(0, len(ids), batch_size):
+                    chunk = ids[i:i + batch_size]
+                    removed += s.query(AntiCheatLog).filter(AntiCheatLog.id.in_(chunk)).delete(synchronize_session=False)
+                    remove_from_index(s.connection(), AntiCheatLog, chunk)
+                bump(s, "anticheat_logs", -removed)
+
+            run_write(db, _delete)
+            total += len(ids)
+    finally:
+        db.close()
+    return total
+
+
+def _in_range(row: dict, since, until, username) -> bool:
+    if username and row["username"] != username:
+        return False
+    if since or until:
+        created_at = datetime.datetime.fromisoformat(row["created_at"])
+        if since and created_at < since:
+            return False
+        if until and created_at >= until:
+            return False
+    return True
+
+
+def _candidate_segments(since, until, days: Optional[Iterable[datetime.date]]) -> List[Tuple[datetime.date, str]]:
+    wanted: Optional[Set[datetime.date]] = set(days) if days is not None else None
+    return [
+        (day, path) for day, path in list_segments()
+        if (wanted is None or day in wanted)
+        and (since is None or day >= since.date())
+        and (until is None or _day_start(day) < until)
+    ]
+
+
+def iter_archived(
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    username: Optional[str] = None,
+    days: Optional[Iterable[datetime.date]] = None,
+) -> Iterator[List[dict]]:
+    """按时间升序逐段返回符合条件的归档记录；days 为 None 时不按日期筛选分段"""
+    for _, path in _candidate_segments(since, until, days):
+        rows = [row for row in _read_segment(path) if _in_range(row, since, until, username)]
+        if rows:
+            yield rows
+
+
+def archived_before(
+    limit: int,
+    before: Optional[Tuple[datetime.datetime, int]] = None,
+    username: Optional[str] = None,
+    days: Optional[Iterable[datetime.date]] = None,
+) -> List[dict]:
+    """按时间倒序返回 (created_at, id) 早于 before 的最多 limit 条归档记录"""
+    result: List[dict] = []
+    until = before[0] + datetime.timedelta(microseconds=1) if before else None
+    for _, path in reversed(_candidate_segments(None, until, days)):
+        for row in reversed(_read_segment(path)):
+            if username and row["username"] != username:
+                continue
+            if before and (datetime.datetime.fromisoformat(row["created_at"]), row["id"]) >= before:
+                continue
+            result.append(row)
+            if len(result) >= limit:
+                return result
+    return result
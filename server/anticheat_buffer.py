@@ -0,0 +1,180 @@
+"""反作弊上报缓冲
+
+服务端 Mod 的反作弊检测在卡顿时会误报，短时间内同一玩家的上报可能有几十条，
+每条都单独插入、提交就要各拿一次写锁。开启缓冲（ANTICHEAT_BUFFER_SECONDS > 0）后：
+- 上报接口把记录放进内存缓冲区后立即返回，不等待写库
+- 同一个刷新窗口内 (username, client_ip, reason) 相同的上报合并为一行，violation_count 累加
+- 缓冲行数达到 ANTICHEAT_BUFFER_MAX_ROWS 或距上次刷新满 ANTICHEAT_BUFFER_SECONDS 时，
+  在一个事务里批量插入
+
+缓冲区在进程内存里，每个 worker 各自一份；正常关闭时 lifespan 会先 stop() 把剩余记录写完，
+进程被强制杀掉时缓冲中的记录会丢失。
+"""
+import asyncio
+import datetime
+import logging
+from typing import Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, run_write
+from models import AntiCheatLog
+from search_index import add_to_index
+from counters import bump, record
+from events import emit
+from anticheat_rollups import apply_rollups
+from risk_scores import apply_risk
+from config import ANTICHEAT_BUFFER_SECONDS, ANTICHEAT_BUFFER_MAX_ROWS
+
+logger = logging.getLogger("anticheat_buffer")
+
+
+def insert_reports(s: Session, rows: List[dict]) -> int:
+    """在当前写事务里批量插入违规记录并同步搜索索引、统计、汇总表和风险分，返回插入行数
+
+    rows 的每一项除表字段外还带 reports（合并前的上报条数），用于按小时统计上报次数。
+    """
+    if not rows:
+        return 0
+    values = [{k: v for k, v in row.items() if k != "reports"} for row in rows]
+    stmt = insert(AntiCheatLog)
+    ids = [None] * len(values)
+    if s.get_bind().dialect.name == "sqlite":
+        # 只有 SQLite 需要手动同步 FTS 表，顺带用 RETURNING 拿到新行的 id
+        inserted = s.execute(
+            stmt.returning(AntiCheatLog.id, AntiCheatLog.username, sort_by_parameter_order=True), values,
+        ).all()
+        add_to_index(s.connection(), AntiCheatLog, [tuple(row) for row in inserted])
+        ids = [row.id for row in inserted]
+    else:
+        s.execute(stmt, values)
+    emit(s, "anticheat", {"logs": [
+        dict(value, id=row_id, created_at=value["created_at"].isoformat()) for row_id, value in zip(ids, values)
+    ]})
+    bump(s, "anticheat_logs", len(rows))
+    hours: Dict[datetime.datetime, int] = {}
+    for row in rows:
+        hour = row["created_at"].replace(minute=0, second=0, microsecond=0)
+        hours[hour] = hours.get(hour, 0) + row.get("reports", 1)
+    for hour, count in hours.items():
+        record(s, "anticheat_reports", count, at=hour)
+    apply_rollups(s, rows)
+    apply_risk(s, rows)
+    return len(rows)
+
+
+def _merge(pending: Dict[tuple, dict], reports: List[dict]):
+    now = datetime.datetime.utcnow()
+    for report in reports:
+        key = (report["username"], report["client_ip"], report["reason"])
+        row = pending.get(key)
+        if row is None:
+            pending[key] = dict(report, created_at=now, reports=1)
+        else:
+            row["violation_count"] += report["violation_count"]
+            row["reports"] += 1
+
+
+def coalesce(reports: List[dict]) -> List[dict]:
+    """不经过缓冲直接写库时，同一批里相同的上报也先合并"""
+    pending: Dict[tuple, dict] = {}
+    _merge(pending, reports)
+    return list(pending.values())
+
+
+def _write(rows: List[dict]) -> int:
+    db = SessionLocal()
+    try:
+        return run_write(db, lambda s: insert_reports(s, rows))
+    finally:
+        db.close()
+
+
+class ReportBuffer:
+    def __init__(self, interval: float = ANTICHEAT_BUFFER_SECONDS, max_rows: int = ANTICHEAT_BUFFER_MAX_ROWS):
+        self._interval = interval
+        self._max_rows = max_rows
+        self._pending: Dict[tuple, dict] = {}
+        self._full = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+        self.received = 0
+        self.flushed_rows = 0
+        self.flushes = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._interval > 0
+
+    def add(self, reports: List[dict]):
+        """放入缓冲区，同一窗口内相同的上报合并"""
+        _merge(self._pending, reports)
+        self.received += len(reports)
+        if len(self._pending) >= self._max_rows:
+            self._full.set()
+
+    async def flush(self) -> int:
+        """把当前缓冲写入数据库，返回写入行数；写入失败时放回缓冲区等下次重试"""
+        async with self._flush_lock:
+            if not self._pending:
+                return 0
+            pending, self._pending = self._pending, {}
+            self._full.clear()
+            rows = list(pending.values())
+            try:
+                written = await asyncio.to_thread(_write, rows)
+            except Exception:
+                # 失败期间新到的同 key 上报合并进旧行，旧行的 created_at 更早，保留旧行
+                for key, row in self._pending.items():
+                    if key in pending:
+                        pending[key]["violation_count"] += row["violation_count"]
+                        pending[key]["reports"] += row["reports"]
+                    else:
+                        pending[key] = row
+                self._pending = pending
+                raise
+            self.flushes += 1
+            self.flushed_rows += written
+            return written
+
+    async def _run(self):
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._full.wait(), timeout=self._interval)
+            except asyncio.TimeoutError:
+                pass
+            try:
+                await self.flush()
+            except Exception:
+                logger.exception("违规记录批量写入失败，%d 行保留在缓冲区", len(self._pending))
+
+    def start(self):
+        if self.enabled and self._task is None:
+            self._stopping = False
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止定时刷新，并把缓冲区剩余的记录写完"""
+        if self._task is not None:
+            self._stopping = True
+            self._full.set()
+            await self._task
+            self._task = None
+        try:
+            await self.flush()
+        except Exception:
+            logger.exception("关闭时写入违规记录失败，丢弃 %d 行", len(self._pending))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "pending_rows": len(self._pending),
+            "received": self.received,
+            "flushed_rows": self.flushed_rows,
+            "flushes": self.flushes,
+        }
+
+
+report_buffer = ReportBuffer()
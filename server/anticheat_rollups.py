@@ -0,0 +1,127 @@
+"""违规记录汇总
+
+按玩家按小时、按天汇总违规记录：记录行数、上报次数、violation_count 合计和最大值、去重 IP、原因分布。
+汇总和原始记录在同一个写事务里更新（anticheat_buffer.insert_reports），
+原始记录按保留期归档后（见 anticheat_archive.py）汇总仍然保留，长时间范围的统计只查汇总表。
+"""
+import datetime
+import json
+from collections import Counter
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import select, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import AntiCheatRollup
+
+PERIODS = {
+    "hour": lambda ts: ts.replace(minute=0, second=0, microsecond=0),
+    "day": lambda ts: ts.replace(hour=0, minute=0, second=0, microsecond=0),
+}
+
+# 一次 IN 查询的最多主键数
+_LOAD_CHUNK = 300
+
+
+def _deltas(rows: Iterable[dict]) -> Dict[tuple, dict]:
+    deltas: Dict[tuple, dict] = {}
+    for row in rows:
+        for period, truncate in PERIODS.items():
+            key = (row["username"], period, truncate(row["created_at"]))
+            delta = deltas.get(key)
+            if delta is None:
+                delta = deltas[key] = {
+                    "logs": 0, "reports": 0, "violations": 0, "max_violation": 0,
+                    "ips": set(), "reasons": Counter(),
+                }
+            violation_count = row["violation_count"] or 0
+            delta["logs"] += 1
+            delta["reports"] += row.get("reports", 1)
+            delta["violations"] += violation_count
+            delta["max_violation"] = max(delta["max_violation"], violation_count)
+            delta["ips"].add(row["client_ip"])
+            delta["reasons"][row["reason"]] += 1
+    return deltas
+
+
+def apply_rollups(s: Session, rows: List[dict]):
+    """在当前写事务里把一批新记录累加到汇总表
+
+    rows 的字段同 anticheat_buffer.insert_reports。MySQL 上用 SELECT ... FOR UPDATE 锁住已有的汇总行，
+    多个 worker 同时插入同一玩家同一小时的第一行时其中一个会主键冲突，该批回滚后由上报缓冲重试。
+    """
+    deltas = _deltas(rows)
+    keys = list(deltas)
+    existing: Dict[tuple, AntiCheatRollup] = {}
+    for i in range(0, len(keys), _LOAD_CHUNK):
+        chunk = keys[i:i + _LOAD_CHUNK]
+        query = select(AntiCheatRollup).where(
+            tuple_(AntiCheatRollup.username, AntiCheatRollup.period, AntiCheatRollup.bucket).in_(chunk)
+        ).with_for_update()
+        for rollup in s.scalars(query):
+            existing[(rollup.username, rollup.period, rollup.bucket)] = rollup
+
+    for key, delta in deltas.items():
+        rollup = existing.get(key)
+        if rollup is None:
+            username, period, bucket = key
+            rollup = AntiCheatRollup(
+                username=username, period=period, bucket=bucket,
+                logs=0, reports=0, violations=0, max_violation=0, ips="[]", reasons="{}",
+            )
+            s.add(rollup)
+        rollup.logs += delta["logs"]
+        rollup.reports += delta["reports"]
+        rollup.violations += delta["violations"]
+        rollup.max_violation = max(rollup.max_violation, delta["max_violation"])
+        ips = json.loads(rollup.ips)
+        rollup.ips = json.dumps(ips + sorted(delta["ips"].difference(ips)))
+        reasons = Counter(json.loads(rollup.reasons))
+        reasons.update(delta["reasons"])
+        rollup.reasons = json.dumps(dict(reasons), ensure_ascii=False)
+    s.flush()
+
+
+def rollup_to_dict(rollup: AntiCheatRollup) -> dict:
+    ips = json.loads(rollup.ips)
+    return {
+        "username": rollup.username,
+        "period": rollup.period,
+        "bucket": rollup.bucket.isoformat(),
+        "logs": rollup.logs,
+        "reports": rollup.reports,
+        "violations": rollup.violations,
+        "max_violation": rollup.max_violation,
+        "distinct_ips": len(ips),
+        "ips": ips,
+        "reasons": json.loads(rollup.reasons),
+    }
+
+
+async def read_rollups(
+    db: AsyncSession,
+    period: str,
+    username: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+    until: Optional[datetime.datetime] = None,
+    limit: int = 500,
+) -> List[dict]:
+    """按时间倒序返回汇总行"""
+    query = select(AntiCheatRollup).where(AntiCheatRollup.period == period)
+    if username:
+        query = query.where(AntiCheatRollup.username == username)
+    if since:
+        query = query.where(AntiCheatRollup.bucket >= PERIODS[period](since))
+    if until:
+        query = query.where(AntiCheatRollup.bucket < until)
+    query = query.order_by(AntiCheatRollup.bucket.desc(), AntiCheatRollup.username.desc()).limit(limit)
+    return [rollup_to_dict(r) for r in (await db.scalars(query)).all()]
+
+
+async def days_with_logs(db: AsyncSession, username: str) -> List[datetime.date]:
+    """玩家有违规记录的日期（升序），用于只打开需要的归档分段"""
+    query = select(AntiCheatRollup.bucket).where(
+        AntiCheatRollup.username == username, AntiCheatRollup.period == "day",
+    ).order_by(AntiCheatRollup.bucket)
+    return [bucket.date() for bucket in (await db.scalars(query)).all()]
@@ -0,0 +1,103 @@
+"""
+同步 Session（线程池）vs 异步 AsyncSession 并发基准
+
+同步处理函数在 anyio 线程池（默认 40 个线程）里执行，整个数据库往返期间占着线程，
+并发上限就是线程数；异步处理函数等待数据库时不占线程，上限只取决于连接池大小。
+
+用 SQLite 自定义函数 sleep_ms() 模拟 100ms 的数据库往返（慢查询或跨机房数据库），
+两种方式使用同样大小的连接池，逐步提高并发看吞吐变化。
+
+用法:
+  cd server && python benchmarks/bench_async_db.py [每轮请求数]
+"""
+
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ENV", "development")
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+
+from engine_profiles import create_profiled_engine, create_profiled_async_engine
+
+REQUESTS = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+DB_LATENCY_MS = 100
+POOL_SIZE = 200
+QUERY = text(f"SELECT sleep_ms({DB_LATENCY_MS})")
+
+
+def _sleep_ms(ms):
+    time.sleep(ms / 1000)
+    return 1
+
+
+def build_app(path):
+    url = f"sqlite:///{path}"
+    sync_engine = create_profiled_engine(url, "production", pool_size=POOL_SIZE, max_overflow=0)
+    async_engine = create_profiled_async_engine(
+        url.replace("sqlite:", "sqlite+aiosqlite:"), "production", pool_size=POOL_SIZE, max_overflow=0
+    )
+    for eng in (sync_engine, async_engine.sync_engine):
+        event.listen(eng, "connect", lambda conn, _: conn.create_function("sleep_ms", 1, _sleep_ms))
+
+    SyncSession = sessionmaker(bind=sync_engine)
+    AsyncSessionLocal = async_sessionmaker(bind=async_engine)
+
+    def get_sync():
+        with SyncSession() as db:
+            yield db
+
+    async def get_async():
+        async with AsyncSessionLocal() as db:
+            yield db
+
+    app = FastAPI()
+
+    @app.get("/sync")
+    def sync_handler(db: Session = Depends(get_sync)):
+        return {"v": db.execute(QUERY).scalar()}
+
+    @app.get("/async")
+    async def async_handler(db: AsyncSession = Depends(get_async)):
+        return {"v": (await db.execute(QUERY)).scalar()}
+
+    return app, async_engine
+
+
+async def run(client, path, concurrency):
+    sem = asyncio.Semaphore(concurrency)
+
+    async def one():
+        async with sem:
+            r = await client.get(path)
+            r.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(REQUESTS)))
+    return REQUESTS / (time.perf_counter() - start)
+
+
+async def main():
+    with tempfile.TemporaryDirectory() as d:
+        app, async_engine = build_app(os.path.join(d, "bench.db"))
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+            print(f"模拟数据库往返 {DB_LATENCY_MS}ms，连接池 {POOL_SIZE}，每轮 {REQUESTS} 个请求")
+            print(f"{'并发':>6}{'同步 req/s':>14}{'异步 req/s':>14}")
+            for concurrency in (20, 40, 80, 160):
+                sync_rps = await run(client, "/sync", concurrency)
+                async_rps = await run(client, "/async", concurrency)
+                print(f"{concurrency:>6}{sync_rps:>14.0f}{async_rps:>14.0f}")
+        await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
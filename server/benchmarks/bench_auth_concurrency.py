@@ -0,0 +1,114 @@
+"""
+认证接口并发基准：对比不同 DB_PROFILE 下的吞吐和错误数
+
+每个配置档案在独立子进程里跑（引擎在导入时创建），使用临时 SQLite 文件，
+通过 ASGI 直接压测 /auth/verify、/auth/verify-player、/auth/create-launch-token、
+/anticheat/report 的混合请求，统计吞吐、P50/P99 延迟和失败数（主要是 database is locked）。
+
+用法:
+  cd server && python benchmarks/bench_auth_concurrency.py [并发数] [请求总数]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import tempfile
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+ARGS = [a for a in sys.argv[1:] if a != "--worker"]
+CONCURRENCY = int(ARGS[0]) if len(ARGS) > 0 else 64
+REQUESTS = int(ARGS[1]) if len(ARGS) > 1 else 4000
+USERS = 20
+
+
+async def worker_main():
+    sys.path.insert(0, SERVER_DIR)
+    import httpx
+    import main
+    from database import init_db
+
+    init_db()
+
+    async def app(scope, receive, send):
+        scope["client"] = ("10.0.0.1", 50000)
+        await main.app(scope, receive, send)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        tokens = []
+        for i in range(USERS):
+            name = f"bench_{i}"
+            await c.post("/auth/register", json={"username": name, "password": "secret1", "machine_id": f"m{i}"})
+            r = await c.post("/auth/login", json={"username": name, "password": "secret1", "machine_id": f"m{i}"})
+            tokens.append((name, r.json()["token"]))
+
+        def make_request(i):
+            name, token = tokens[i % USERS]
+            kind = i % 4
+            if kind == 0:
+                return "/auth/verify", {"username": name, "token": token, "client_ip": "10.0.0.1"}
+            if kind == 1:
+                return "/auth/verify-player", {"username": name, "client_ip": "10.0.0.1"}
+            if kind == 2:
+                return "/auth/create-launch-token", {"username": name, "token": token}
+            return "/anticheat/report", {"username": name, "client_ip": "10.0.0.1", "violation_count": i, "reason": "bench"}
+
+        sem = asyncio.Semaphore(CONCURRENCY)
+        latencies, errors = [], 0
+
+        async def one(i):
+            nonlocal errors
+            path, body = make_request(i)
+            async with sem:
+                start = time.perf_counter()
+                try:
+                    r = await c.post(path, json=body)
+                    ok = r.status_code == 200
+                except Exception:
+                    ok = False
+                latencies.append(time.perf_counter() - start)
+                errors += 0 if ok else 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(REQUESTS)))
+        elapsed = time.perf_counter() - start
+
+    from engine_profiles import pool_stats
+    from database import engine
+    latencies.sort()
+    print(json.dumps({
+        "rps": REQUESTS / elapsed,
+        "p50_ms": latencies[len(latencies) // 2] * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99)] * 1000,
+        "errors": errors,
+        "pool": pool_stats(engine),
+    }))
+
+
+def main():
+    print(f"并发 {CONCURRENCY}，请求 {REQUESTS}")
+    for profile in ("development", "production"):
+        with tempfile.TemporaryDirectory() as d:
+            os.makedirs(os.path.join(d, "updates"))
+            env = dict(os.environ, ENV="development", DB_PROFILE=profile, ADMIN_TOKEN="bench",
+                       MOD_API_KEY="", REAPER_INTERVAL_SECONDS="0",
+                       DATABASE_URL=f"sqlite:///{d}/bench.db")
+            out = subprocess.run([sys.executable, __file__, str(CONCURRENCY), str(REQUESTS), "--worker"], env=env, cwd=d,
+                                 capture_output=True, text=True)
+            if out.returncode != 0:
+                print(out.stderr[-2000:])
+                continue
+            r = json.loads(out.stdout.strip().splitlines()[-1])
+            print(f"{profile:<12} {r['rps']:>8.0f} req/s  p50 {r['p50_ms']:>7.1f}ms  "
+                  f"p99 {r['p99_ms']:>7.1f}ms  失败 {r['errors']:>4}  "
+                  f"连接池平均等待 {r['pool'].get('avg_wait_ms', 0)}ms")
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        asyncio.run(worker_main())
+    else:
+        main()
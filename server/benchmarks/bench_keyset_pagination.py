@@ -0,0 +1,75 @@
+"""
+后台列表分页基准：OFFSET 分页 vs (created_at, id) 游标分页
+
+在临时 SQLite 文件里写入 anticheat_logs，建 (created_at, id) 复合索引，
+对比翻到不同深度时单页查询耗时。OFFSET 随深度线性变慢，游标分页应保持不变。
+
+用法:
+  cd server && python benchmarks/bench_keyset_pagination.py [行数]
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import datetime
+import tempfile
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+SIZE = 20
+REPEAT = 20
+
+
+def populate(conn):
+    conn.execute(
+        "CREATE TABLE anticheat_logs (id INTEGER PRIMARY KEY, username TEXT NOT NULL,"
+        " client_ip TEXT NOT NULL, violation_count INTEGER, reason TEXT NOT NULL, created_at DATETIME)"
+    )
+    base = datetime.datetime(2026, 1, 1)
+    conn.executemany(
+        "INSERT INTO anticheat_logs (username, client_ip, violation_count, reason, created_at) VALUES (?, ?, ?, ?, ?)",
+        (
+            (f"player_{i % 5000}", "10.0.0.1", i % 7, "fly",
+             (base + datetime.timedelta(seconds=i // 2)).isoformat(" "))
+            for i in range(ROWS)
+        ),
+    )
+    conn.execute("CREATE INDEX ix_anticheat_logs_created_id ON anticheat_logs (created_at, id)")
+    conn.commit()
+
+
+def timed(conn, sql, params):
+    start = time.perf_counter()
+    for _ in range(REPEAT):
+        rows = conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) / REPEAT * 1000, rows
+
+
+def main():
+    path = os.path.join(tempfile.mkdtemp(), "bench.db")
+    conn = sqlite3.connect(path)
+    print(f"写入 {ROWS} 行...")
+    populate(conn)
+
+    offset_sql = "SELECT * FROM anticheat_logs ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?"
+    keyset_sql = (
+        "SELECT * FROM anticheat_logs WHERE created_at <= ? AND (created_at < ? OR id < ?)"
+        " ORDER BY created_at DESC, id DESC LIMIT ?"
+    )
+    print(f"{'深度(行)':>12} {'OFFSET ms':>12} {'游标 ms':>12}")
+    for depth in (0, 1_000, 10_000, 100_000, ROWS // 2, ROWS - SIZE):
+        if depth >= ROWS:
+            continue
+        offset_ms, _ = timed(conn, offset_sql, (SIZE, depth))
+        # 游标取自上一页最后一行，这里直接定位到 depth 行
+        prev = conn.execute(
+            "SELECT created_at, id FROM anticheat_logs ORDER BY created_at DESC, id DESC LIMIT 1 OFFSET ?",
+            (max(depth - 1, 0),),
+        ).fetchone()
+        keyset_ms, _ = timed(conn, keyset_sql, (prev[0], prev[0], prev[1], SIZE))
+        print(f"{depth:>12} {offset_ms:>12.3f} {keyset_ms:>12.3f}")
+    print(conn.execute("EXPLAIN QUERY PLAN " + keyset_sql, ("x", "x", 1, SIZE)).fetchall())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""
+清单 JSON 序列化基准：完整 dict + jsonable_encoder + 标准库 json vs orjson vs 流式编码
+
+生成 N 条与 /sync/{id}/manifest 相同结构的清单条目（相对路径 -> md5/size/url），对比：
+  before     先拼完整 dict，再 jsonable_encoder + Starlette JSONResponse（改动前的清单接口）
+  default    先拼完整 dict，再 jsonable_encoder + FastJSONResponse（其余接口的默认路径）
+  direct     先拼完整 dict，直接 FastJSONResponse（跳过 jsonable_encoder）
+  stream     fast_json.iter_object 边生成边编码（现在的清单接口）
+  stream-std 同上，但屏蔽 orjson，使用标准库回退
+每种方式在独立子进程里运行，耗时取 3 次最好值，峰值 RSS 为相对运行前的增量。
+
+用法:
+  cd server && python benchmarks/bench_manifest_json.py [条目数 ...]
+  默认跑 20000 和 100000 两档
+"""
+
+import os
+import sys
+import time
+import resource
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+VARIANTS = ["before", "default", "direct", "stream", "stream-std"]
+ROUNDS = 3
+
+
+def entries(n):
+    for i in range(n):
+        rel_path = f"config/mod_{i % 500:03d}/settings/file_{i:06d}.json"
+        yield rel_path, {
+            "md5": f"{i * 2654435761 % (1 << 128):032x}",
+            "size": 1000 + i * 37 % 100000,
+            "url": f"http://mc.sivita.xyz:5806/sync/config/download/{rel_path}",
+        }
+
+
+def run(variant, n):
+    from fastapi.encoders import jsonable_encoder
+    from starlette.responses import JSONResponse
+    from fast_json import FastJSONResponse, iter_object
+
+    if variant == "before":
+        return len(JSONResponse(jsonable_encoder(dict(entries(n)))).body)
+    if variant == "default":
+        return len(FastJSONResponse(jsonable_encoder(dict(entries(n)))).body)
+    if variant == "direct":
+        return len(FastJSONResponse(dict(entries(n))).body)
+    return sum(len(chunk) for chunk in iter_object(entries(n)))
+
+
+def child(variant, n):
+    if variant == "stream-std":
+        sys.modules["orjson"] = None  # import orjson 时抛 ImportError
+    sys.path.insert(0, SERVER_DIR)
+    import fast_json  # noqa: F401  提前导入，不计入峰值
+    from fastapi.encoders import jsonable_encoder  # noqa: F401
+
+    base_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    best = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        size = run(variant, n)
+        best = min(best, time.perf_counter() - start)
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss - base_kb
+    print(f"{best * 1000:.1f} {peak_kb} {size}")
+
+
+def main():
+    sizes = [int(a) for a in sys.argv[1:]] or [20_000, 100_000]
+    for n in sizes:
+        print(f"\n{n} 条清单")
+        print(f"  {'方式':<12}{'耗时 ms':>10}{'峰值 RSS 增量 MB':>20}{'响应字节':>12}")
+        for variant in VARIANTS:
+            out = subprocess.run(
+                [sys.executable, __file__, "--child", variant, str(n)],
+                capture_output=True, text=True, check=True,
+            ).stdout.split()
+            ms, peak_kb, size = float(out[0]), int(out[1]), int(out[2])
+            print(f"  {variant:<12}{ms:>10.1f}{peak_kb / 1024:>20.1f}{size:>12}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        child(sys.argv[2], int(sys.argv[3]))
+    else:
+        main()
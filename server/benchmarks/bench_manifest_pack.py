@@ -0,0 +1,133 @@
+"""
+清单编码对比：JSON vs 二进制清单（manifest_pack，MessagePack + 公共下载前缀 + 原始 MD5 + 路径前缀压缩）
+
+对给定目录生成与 /sync/{id}/manifest 相同的清单，比较：
+  响应字节（原始 / gzip）、服务端编码耗时、解码耗时（Python，以及装了 node 时启动器实际使用的 JS 实现）
+解码后的内容会与 JSON 清单逐条核对。
+
+用法:
+  cd server && python benchmarks/bench_manifest_pack.py [目录 ...]
+  不带参数时扫描 sync_config.json 里的所有文件夹（即线上整合包）；
+  --synthetic N 生成 N 条与整合包 config 目录类似的假条目，不读磁盘
+"""
+
+import os
+import sys
+import gzip
+import json
+import time
+import shutil
+import tempfile
+import subprocess
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+LAUNCHER_MODULE = os.path.join(SERVER_DIR, "..", "launcher", "electron", "modules", "manifest-pack.js")
+ROUNDS = 5
+
+sys.path.insert(0, SERVER_DIR)
+os.chdir(SERVER_DIR)
+
+import manifest_pack  # noqa: E402
+from fast_json import dumps, iter_object  # noqa: E402
+from routers.sync import iter_folder_manifest  # noqa: E402
+from config import SYNC_CONFIG_FILE  # noqa: E402
+
+NODE_SCRIPT = r"""
+const fs = require('fs')
+const { unpackManifest } = require(process.argv[1])
+const [jsonFile, packFile, rounds] = [process.argv[2], process.argv[3], Number(process.argv[4])]
+const json = fs.readFileSync(jsonFile), packed = fs.readFileSync(packFile)
+const best = (fn) => {
+  let t = Infinity, out
+  for (let i = 0; i < rounds; i++) {
+    const s = process.hrtime.bigint(); out = fn(); t = Math.min(t, Number(process.hrtime.bigint() - s) / 1e6)
+  }
+  return [t, out]
+}
+const [tj, a] = best(() => JSON.parse(json.toString('utf-8')))
+const [tp, b] = best(() => unpackManifest(packed))
+const same = JSON.stringify(Object.keys(a).sort().map(k => [k, a[k]])) ===
+             JSON.stringify(Object.keys(b).sort().map(k => [k, b[k]]))
+console.log(tj.toFixed(2), tp.toFixed(2), same)
+"""
+
+
+def best(fn):
+    elapsed = float("inf")
+    for _ in range(ROUNDS):
+        start = time.perf_counter()
+        out = fn()
+        elapsed = min(elapsed, time.perf_counter() - start)
+    return elapsed * 1000, out
+
+
+def synthetic(n, base_url):
+    for i in range(n):
+        rel_path = f"config/mod_{i % 500:03d}/settings/file_{i:06d}.json"
+        yield rel_path, {
+            "md5": f"{i * 2654435761 % (1 << 128):032x}",
+            "size": 1000 + i * 37 % 100000,
+            "url": f"{base_url}/{rel_path}",
+        }
+
+
+def folders():
+    args = sys.argv[1:]
+    if args[:1] == ["--synthetic"]:
+        base_url = "http://mc.sivita.xyz:5806/sync/config/download"
+        yield f"synthetic {args[1]}", list(synthetic(int(args[1]), base_url)), base_url
+        return
+    if args:
+        configs = [{"id": os.path.basename(os.path.abspath(p)), "path": p, "extensions": ["*"],
+                    "download_base_url": f"http://mc.sivita.xyz:5806/sync/{os.path.basename(os.path.abspath(p))}/download"}
+                   for p in args]
+    else:
+        with open(SYNC_CONFIG_FILE, encoding="utf-8") as f:
+            configs = json.load(f)["folders"]
+    for folder in configs:
+        if os.path.isdir(folder["path"]):
+            yield folder["id"], list(iter_folder_manifest(folder)), folder["download_base_url"]
+
+
+def node_decode(json_body, packed_body):
+    node = shutil.which("node")
+    if node is None:
+        return None
+    with tempfile.TemporaryDirectory() as tmp:
+        json_file, pack_file = os.path.join(tmp, "m.json"), os.path.join(tmp, "m.bin")
+        with open(json_file, "wb") as f:
+            f.write(json_body)
+        with open(pack_file, "wb") as f:
+            f.write(packed_body)
+        out = subprocess.run(
+            [node, "-e", NODE_SCRIPT, os.path.abspath(LAUNCHER_MODULE), json_file, pack_file, str(ROUNDS)],
+            capture_output=True, text=True, check=True,
+        ).stdout.split()
+    return float(out[0]), float(out[1]), out[2] == "true"
+
+
+def main():
+    for name, items, base_url in folders():
+        json_ms, json_body = best(lambda: b"".join(iter_object(items)))
+        pack_ms, packed_body = best(lambda: manifest_pack.pack(items, base_url))
+        json_dec_ms, decoded_json = best(lambda: json.loads(json_body))
+        pack_dec_ms, decoded_pack = best(lambda: manifest_pack.unpack(packed_body))
+        assert decoded_pack == decoded_json, "二进制清单解码结果与 JSON 不一致"
+        assert dumps(dict(items)) == json_body
+
+        print(f"\n{name}: {len(items)} 条")
+        print(f"  {'':<10}{'字节':>12}{'gzip 后':>12}{'编码 ms':>10}{'Python 解码 ms':>16}{'JS 解码 ms':>12}")
+        node = node_decode(json_body, packed_body)
+        for label, body, enc, dec, js in (
+            ("JSON", json_body, json_ms, json_dec_ms, node[0] if node else None),
+            ("msgpack", packed_body, pack_ms, pack_dec_ms, node[1] if node else None),
+        ):
+            js_text = f"{js:>12.2f}" if js is not None else f"{'-':>12}"
+            print(f"  {label:<10}{len(body):>12}{len(gzip.compress(body)):>12}{enc:>10.2f}{dec:>16.2f}{js_text}")
+        if node and not node[2]:
+            print("  JS 解码结果与 JSON 不一致")
+        print(f"  二进制清单为 JSON 的 {len(packed_body) / max(len(json_body), 1):.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+用户名子串搜索基准：LIKE '%x%' 全表扫描 vs FTS5 trigram 索引
+
+在临时 SQLite 文件里写入 anticheat_logs 和对应的 anticheat_logs_fts，
+对比 LIKE、纯 FTS5 和 search_index.username_filter 的自适应选择
+在一次搜索请求（第一页 + 总数）上的耗时。
+
+用法:
+  cd server && python benchmarks/bench_search_index.py [行数 ...]
+  默认跑 100000 和 1000000 两档
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import datetime
+import tempfile
+
+SIZES = [int(a) for a in sys.argv[1:]] or [100_000, 1_000_000]
+QUERIES = 50
+PLAYERS = 50_000
+DENSE_HITS = 2000
+
+LIKE_WHERE = "username LIKE '%' || ? || '%'"
+FTS_WHERE = "id IN (SELECT rowid FROM anticheat_logs_fts WHERE username MATCH '\"' || ? || '\"')"
+PAGE = "SELECT * FROM anticheat_logs WHERE {} ORDER BY created_at DESC, id DESC LIMIT 20"
+COUNT = "SELECT COUNT(*) FROM anticheat_logs WHERE {}"
+
+
+def populate(conn, rows):
+    conn.execute(
+        "CREATE TABLE anticheat_logs (id INTEGER PRIMARY KEY, username TEXT NOT NULL,"
+        " reason TEXT NOT NULL, created_at DATETIME)"
+    )
+    base = datetime.datetime(2026, 1, 1)
+    conn.executemany(
+        "INSERT INTO anticheat_logs (username, reason, created_at) VALUES (?, ?, ?)",
+        (
+            (f"player_{random.randrange(PLAYERS):05d}", "fly", (base + datetime.timedelta(seconds=i)).isoformat(" "))
+            for i in range(rows)
+        ),
+    )
+    conn.execute("CREATE INDEX ix_anticheat_logs_created_id ON anticheat_logs (created_at, id)")
+    conn.execute("CREATE VIRTUAL TABLE anticheat_logs_fts USING fts5(username, tokenize='trigram')")
+    conn.execute("INSERT INTO anticheat_logs_fts (rowid, username) SELECT id, username FROM anticheat_logs")
+    conn.commit()
+
+
+def adaptive_where(conn, term):
+    """与 search_index.username_filter 相同的选择：命中数达到 DENSE_HITS 时用 LIKE"""
+    hits = conn.execute(
+        "SELECT COUNT(*) FROM (SELECT rowid FROM anticheat_logs_fts WHERE username MATCH '\"' || ? || '\"' LIMIT ?)",
+        (term, DENSE_HITS),
+    ).fetchone()[0]
+    return LIKE_WHERE if hits >= DENSE_HITS else FTS_WHERE
+
+
+def request_ms(conn, terms, where):
+    """后台搜索新词时一次请求 = 第一页 + 总数（总数随后按 ADMIN_COUNT_TTL_SECONDS 缓存）"""
+    start = time.perf_counter()
+    hits = 0
+    for term in terms:
+        w = where(conn, term)
+        hits += len(conn.execute(PAGE.format(w), (term,)).fetchall())
+        conn.execute(COUNT.format(w), (term,)).fetchone()
+    return (time.perf_counter() - start) / len(terms) * 1000, hits
+
+
+def main():
+    print(f"{'行数':>10} {'搜索词':>6} {'LIKE ms':>10} {'FTS5 ms':>10} {'自适应 ms':>10} {'加速':>8}")
+    for rows in SIZES:
+        path = os.path.join(tempfile.mkdtemp(), "bench.db")
+        conn = sqlite3.connect(path)
+        populate(conn, rows)
+        # 精确的玩家号（命中少，后台搜索的主要场景）和常见片段（命中大量行）分开统计
+        selective = [f"{random.randrange(PLAYERS):05d}" for _ in range(QUERIES)]
+        common = [random.choice(["yer_1", "r_00", "ayer_4"]) for _ in range(QUERIES)]
+        for label, terms in (("精确", selective), ("常见", common)):
+            like_ms, like_hits = request_ms(conn, terms, lambda c, t: LIKE_WHERE)
+            fts_ms, fts_hits = request_ms(conn, terms, lambda c, t: FTS_WHERE)
+            adaptive_ms, adaptive_hits = request_ms(conn, terms, adaptive_where)
+            assert like_hits == fts_hits == adaptive_hits, (like_hits, fts_hits, adaptive_hits)
+            print(f"{rows:>10} {label:>6} {like_ms:>10.3f} {fts_ms:>10.3f} {adaptive_ms:>10.3f}"
+                  f" {like_ms / adaptive_ms:>7.1f}x")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
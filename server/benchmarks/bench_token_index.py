@@ -0,0 +1,82 @@
+"""
+login_tokens 索引基准：完整 JWT 字符串 vs 32 字节 SHA-256 摘要
+
+在临时 SQLite 文件里分别建两张表，写入相同的一批 JWT，
+对比唯一索引占用的页数/字节数以及随机点查耗时。
+
+用法:
+  cd server && python benchmarks/bench_token_index.py [行数]
+"""
+
+import os
+import sys
+import time
+import random
+import sqlite3
+import hashlib
+import datetime
+import tempfile
+
+from jose import jwt
+
+ROWS = int(sys.argv[1]) if len(sys.argv) > 1 else 200_000
+LOOKUPS = 20_000
+
+
+def make_tokens(n):
+    base = datetime.datetime(2026, 1, 1)
+    tokens = []
+    for i in range(n):
+        claims = {
+            "sub": f"player_{i}",
+            "exp": base + datetime.timedelta(hours=24, seconds=i),
+            "ip": f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}",
+        }
+        tokens.append(jwt.encode(claims, "bench-secret", algorithm="HS256"))
+    return tokens
+
+
+def page_count(conn):
+    return conn.execute("PRAGMA page_count").fetchone()[0]
+
+
+def bench(conn, name, col_type, keys):
+    conn.execute(f"CREATE TABLE {name} (id INTEGER PRIMARY KEY, k {col_type} NOT NULL)")
+    conn.executemany(f"INSERT INTO {name} (k) VALUES (?)", ((k,) for k in keys))
+    conn.commit()
+    before = page_count(conn)
+    conn.execute(f"CREATE UNIQUE INDEX ix_{name} ON {name} (k)")
+    conn.commit()
+    index_pages = page_count(conn) - before
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+
+    probes = random.sample(keys, min(LOOKUPS, len(keys)))
+    sql = f"SELECT id FROM {name} WHERE k = ?"
+    start = time.perf_counter()
+    for k in probes:
+        conn.execute(sql, (k,)).fetchone()
+    elapsed = time.perf_counter() - start
+    return index_pages, index_pages * page_size, elapsed / len(probes) * 1e6
+
+
+def main():
+    print(f"生成 {ROWS} 个 JWT ...")
+    tokens = make_tokens(ROWS)
+    digests = [hashlib.sha256(t.encode()).digest() for t in tokens]
+    print(f"JWT 平均长度: {sum(map(len, tokens)) / len(tokens):.0f} 字节")
+
+    with tempfile.TemporaryDirectory() as d:
+        conn = sqlite3.connect(os.path.join(d, "bench.db"))
+        results = [
+            ("token VARCHAR(256)", bench(conn, "by_token", "VARCHAR(256)", tokens)),
+            ("token_hash BLOB(32)", bench(conn, "by_digest", "BLOB", digests)),
+        ]
+        conn.close()
+
+    print(f"{'索引列':<22}{'索引页数':>10}{'索引大小(MB)':>14}{'点查(us)':>12}")
+    for label, (pages, size, lookup_us) in results:
+        print(f"{label:<22}{pages:>10}{size / 1024 / 1024:>14.2f}{lookup_us:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""
+SQLite 写入吞吐基准：每请求单独提交 vs 单写线程组提交
+
+模拟 N 个线程并发写 anticheat_logs（和 report_violation 相同的写法），
+分别统计直接提交和经过 WriteQueue 组提交时的总吞吐、平均每批操作数。
+
+用法:
+  cd server && python benchmarks/bench_write_queue.py [线程数] [每线程写入数]
+"""
+
+import os
+import sys
+import time
+import tempfile
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("ENV", "development")
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+
+from database import Base
+from models import AntiCheatLog
+from write_queue import WriteQueue, sqlite_writer_sessionmaker
+
+THREADS = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+PER_THREAD = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+
+def make_session_factory(path):
+    engine = create_engine(f"sqlite:///{path}", connect_args={"check_same_thread": False, "timeout": 30})
+    Base.metadata.create_all(bind=engine)
+    return sessionmaker(bind=engine, autoflush=False)
+
+
+def insert_op(i):
+    def _insert(s):
+        s.add(AntiCheatLog(username=f"p{i % 100}", client_ip="10.0.0.1", violation_count=i, reason="bench"))
+    return _insert
+
+
+def run(label, worker):
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(THREADS)]
+    start = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    total = THREADS * PER_THREAD
+    print(f"{label:<18}{total:>8} 次写入  {elapsed:>7.2f}s  {total / elapsed:>9.0f} 次/秒")
+
+
+def main():
+    with tempfile.TemporaryDirectory() as d:
+        direct = make_session_factory(os.path.join(d, "direct.db"))
+
+        def direct_worker(t):
+            s = direct()
+            for i in range(PER_THREAD):
+                insert_op(i)(s)
+                s.commit()
+            s.close()
+
+        run("逐条提交", direct_worker)
+
+        queued = os.path.join(d, "queued.db")
+        make_session_factory(queued)
+        wq = WriteQueue(sqlite_writer_sessionmaker(
+            create_engine(f"sqlite:///{queued}", connect_args={"check_same_thread": False})
+        ), interval_ms=5, max_batch=64)
+        wq.start()
+
+        def queued_worker(t):
+            for i in range(PER_THREAD):
+                wq.submit(insert_op(i)).result()
+
+        run("写队列组提交", queued_worker)
+        wq.stop()
+        print(f"写队列共 {wq.batches} 批，平均每批 {wq.ops / max(wq.batches, 1):.1f} 个操作")
+
+
+if __name__ == "__main__":
+    main()
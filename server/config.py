@@ -22,6 +22,8 @@ TOKEN_EXPIRE_HOURS = 24
 MODS_DIR = os.getenv("MODS_DIR", "./mods")
 MODS_MANIFEST = os.getenv("MODS_MANIFEST", "./mods_manifest.json")
 MODS_DOWNLOAD_BASE_URL = os.getenv("MODS_DOWNLOAD_BASE_URL", "http://mc.sivita.xyz:5806/mods/download")
+# /mods/refresh 生成的清单指向这里按 MD5 保存的 jar 副本，替换 MODS_DIR 里的 jar 不影响还在用旧清单的机器
+MODS_STORE_DIR = os.getenv("MODS_STORE_DIR", "./mods_store")
 
 # 通用同步配置
 SYNC_CONFIG_FILE = os.getenv("SYNC_CONFIG_FILE", "./sync_config.json")
@@ -43,3 +45,77 @@ MOD_API_KEY = os.getenv("MOD_API_KEY", "")
 
 # CORS 允许的源（生产环境应限制）
 CORS_ORIGINS = os.getenv("CORS_ORIGINS", "*").split(",")
+
+# 一次性启动令牌存储：memory（单进程）/ sqlite（多 worker 共享同一文件）
+LAUNCH_TOKEN_STORE = os.getenv("LAUNCH_TOKEN_STORE", "memory")
+LAUNCH_TOKEN_DB = os.getenv("LAUNCH_TOKEN_DB", "./launch_tokens.db")
+LAUNCH_TOKEN_TTL_SECONDS = int(os.getenv("LAUNCH_TOKEN_TTL_SECONDS", "120"))
+
+# 过期数据清理：间隔秒数（0 表示关闭）和每批删除行数
+REAPER_INTERVAL_SECONDS = int(os.getenv("REAPER_INTERVAL_SECONDS", "600"))
+REAPER_BATCH_SIZE = int(os.getenv("REAPER_BATCH_SIZE", "500"))
+
+# 登录 Token 校验方式：db（每次查库）/ jwt（仅校验签名 + 内存吊销表，仅适用于单 worker）
+TOKEN_VERIFY_MODE = os.getenv("TOKEN_VERIFY_MODE", "db")
+
+# 单写线程组提交（主要用于 SQLite）：开关、攒批间隔毫秒数、每批最多操作数
+WRITE_QUEUE_ENABLED = os.getenv("WRITE_QUEUE_ENABLED", "0") == "1"
+WRITE_QUEUE_INTERVAL_MS = int(os.getenv("WRITE_QUEUE_INTERVAL_MS", "5"))
+WRITE_QUEUE_MAX_BATCH = int(os.getenv("WRITE_QUEUE_MAX_BATCH", "64"))
+
+# 数据库引擎配置档案：development / production（见 engine_profiles.py）
+DB_PROFILE = os.getenv("DB_PROFILE", "production" if IS_PROD else "development")
+
+# 只读副本（逗号分隔的同步驱动 URL，留空表示不拆分读写）
+DATABASE_READ_URLS = [u.strip() for u in os.getenv("DATABASE_READ_URLS", "").split(",") if u.strip()]
+# 副本允许的最大复制延迟（秒），超过则读请求回落到主库；应大于心跳间隔
+READ_REPLICA_MAX_LAG_SECONDS = float(os.getenv("READ_REPLICA_MAX_LAG_SECONDS", "5"))
+REPLICA_HEARTBEAT_SECONDS = float(os.getenv("REPLICA_HEARTBEAT_SECONDS", "1"))
+
+# 后台列表总数的缓存时间（秒），翻页时不再每页执行 COUNT(*)
+ADMIN_COUNT_TTL_SECONDS = float(os.getenv("ADMIN_COUNT_TTL_SECONDS", "30"))
+
+# 统计计数器校正间隔（秒），0 表示不校正
+COUNTER_RECONCILE_SECONDS = int(os.getenv("COUNTER_RECONCILE_SECONDS", "3600"))
+
+# 按请求统计 SQL（sql_profiler.py），开发排查用，默认关闭
+SQL_PROFILE = os.getenv("SQL_PROFILE", "0") == "1"
+SQL_PROFILE_MAX_STATEMENTS = int(os.getenv("SQL_PROFILE_MAX_STATEMENTS", "20"))
+SQL_PROFILE_MAX_DB_MS = float(os.getenv("SQL_PROFILE_MAX_DB_MS", "200"))
+# 同一语句在一个请求里执行达到该次数时按疑似 N+1 告警
+SQL_PROFILE_REPEAT_THRESHOLD = int(os.getenv("SQL_PROFILE_REPEAT_THRESHOLD", "5"))
+
+# 反作弊上报缓冲（anticheat_buffer.py）：刷新间隔秒数（0 表示每条上报直接写库）、缓冲行数上限
+ANTICHEAT_BUFFER_SECONDS = float(os.getenv("ANTICHEAT_BUFFER_SECONDS", "2"))
+ANTICHEAT_BUFFER_MAX_ROWS = int(os.getenv("ANTICHEAT_BUFFER_MAX_ROWS", "500"))
+
+# 违规记录保留天数，更早的原始记录归档到 ANTICHEAT_ARCHIVE_DIR 下的压缩分段（0 表示不归档）
+ANTICHEAT_RETENTION_DAYS = int(os.getenv("ANTICHEAT_RETENTION_DAYS", "30"))
+ANTICHEAT_ARCHIVE_DIR = os.getenv("ANTICHEAT_ARCHIVE_DIR", "./archive/anticheat")
+
+# 玩家风险分（risk_scores.py）：半衰期小时数、按原因的权重（如 "anticheat_auto_kick=3,speed=1"）、未列出原因的权重
+RISK_HALF_LIFE_HOURS = float(os.getenv("RISK_HALF_LIFE_HOURS", "72"))
+RISK_REASON_WEIGHTS = {
+    reason.strip(): float(value)
+    for reason, value in (item.split("=", 1) for item in os.getenv("RISK_REASON_WEIGHTS", "").split(",") if "=" in item)
+}
+RISK_DEFAULT_WEIGHT = float(os.getenv("RISK_DEFAULT_WEIGHT", "1"))
+
+# 后台实时事件：有页面连接时推送完整统计的间隔（秒），用于校正增量
+EVENTS_SNAPSHOT_SECONDS = float(os.getenv("EVENTS_SNAPSHOT_SECONDS", "30"))
+
+# 公告列表缓存：预序列化响应体的重建间隔（秒，多 worker 时其他 worker 看到修改的最长延迟，0 表示只在本进程修改后重建）
+ANNOUNCEMENTS_CACHE_SECONDS = float(os.getenv("ANNOUNCEMENTS_CACHE_SECONDS", "60"))
+# 公告列表响应的 Cache-Control: public, max-age（秒）
+ANNOUNCEMENTS_MAX_AGE = int(os.getenv("ANNOUNCEMENTS_MAX_AGE", "30"))
+
+# 启动器更新文件目录（latest.yml、exe 和 blockmap，见 releases.py），以及保留 exe 的版本数（blockmap 全部保留）
+UPDATES_DIR = os.getenv("UPDATES_DIR", "./updates")
+RELEASE_KEEP_VERSIONS = int(os.getenv("RELEASE_KEEP_VERSIONS", "3"))
+
+# 分批发布（rollout.py）：从初始比例线性放量到 100% 的分钟数（0 表示发布后立即对所有机器生效）、初始比例、
+# 进行中的下载数上限（达到时暂停放量）、推进间隔秒数
+ROLLOUT_RAMP_MINUTES = float(os.getenv("ROLLOUT_RAMP_MINUTES", "120"))
+ROLLOUT_INITIAL_PERCENT = float(os.getenv("ROLLOUT_INITIAL_PERCENT", "5"))
+ROLLOUT_MAX_CONCURRENT_DOWNLOADS = int(os.getenv("ROLLOUT_MAX_CONCURRENT_DOWNLOADS", "50"))
+ROLLOUT_TICK_SECONDS = float(os.getenv("ROLLOUT_TICK_SECONDS", "15"))
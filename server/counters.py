@@ -0,0 +1,131 @@
+"""后台统计计数器
+
+仪表盘每次刷新都对五张表做 COUNT，这里改为在写路径上增量维护 counters 表，
+统计接口只读几行。另外按小时累计注册、登录、违规上报次数（counter_buckets），用于画趋势图。
+
+增量计数可能因并发或批量操作产生漂移，由 reconcile_counters 定期用真实 COUNT 校正。
+login_tokens 计数是表里的行数（含尚未被 reaper 清理的过期 Token）；统计接口里的 active_tokens
+在读取时减去已过期的行数（走 expires_at 索引，只扫 reaper 间隔内积压的过期行），只计仍有效的 Token。
+reaper 删除过期行时不再推送 active_tokens 增量，这些行早已不计入。
+"""
+import datetime
+import logging
+from typing import Dict, List
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from database import SessionLocal, run_write
+from events import emit, emit_counter
+from models import Counter, CounterBucket, User, MachineBinding, LoginToken, Announcement, AntiCheatLog
+
+logger = logging.getLogger("counters")
+
+# 计数器名 -> 真实值的统计查询，reconcile 时使用
+TOTALS = {
+    "users": lambda: select(func.count(User.id)),
+    "machines": lambda: select(func.count(func.distinct(MachineBinding.machine_id))),
+    "login_tokens": lambda: select(func.count(LoginToken.id)),
+    "announcements": lambda: select(func.count(Announcement.id)).where(Announcement.active == 1),
+    "anticheat_logs": lambda: select(func.count(AntiCheatLog.id)),
+}
+
+# 按小时分桶的事件序列
+SERIES = ("registrations", "logins", "anticheat_reports")
+
+# 计数器名 -> 后台统计接口（/admin/api/stats 和实时事件）里的字段名
+STAT_FIELDS = {
+    "users": "users",
+    "machines": "machines",
+    "login_tokens": "active_tokens",
+    "announcements": "announcements",
+    "anticheat_logs": "anticheat_logs",
+}
+
+
+def _upsert_add(s: Session, model, keys: dict, delta: int):
+    """value += delta，行不存在时插入 delta"""
+    values = dict(keys, value=delta)
+    if s.get_bind().dialect.name == "mysql":
+        stmt = mysql_insert(model).values(**values)
+        stmt = stmt.on_duplicate_key_update(value=model.value + stmt.inserted.value)
+    else:
+        stmt = sqlite_insert(model).values(**values)
+        stmt = stmt.on_conflict_do_update(index_elements=list(keys), set_={"value": model.value + delta})
+    s.execute(stmt)
+
+
+def _hour(ts: datetime.datetime) -> datetime.datetime:
+    return ts.replace(minute=0, second=0, microsecond=0)
+
+
+def bump(s: Session, name: str, delta: int = 1, publish: bool = True):
+    """在当前写事务里调整计数器，提交后推送给后台实时页面（publish=False 时只改计数器）"""
+    if delta:
+        _upsert_add(s, Counter, {"name": name}, delta)
+        if publish:
+            emit_counter(s, STAT_FIELDS.get(name, name), delta)
+
+
+def record(s: Session, series: str, count: int = 1, at: datetime.datetime = None):
+    """在当前写事务里给某个小时桶加 count"""
+    bucket = _hour(at or datetime.datetime.utcnow())
+    _upsert_add(s, CounterBucket, {"name": series, "bucket": bucket}, count)
+    emit(s, "series", {"name": series, "bucket": bucket.isoformat(), "value": count})
+
+
+def read_counters(s: Session) -> Dict[str, int]:
+    return dict(s.execute(select(Counter.name, Counter.value)).all())
+
+
+def expired_tokens_query():
+    return select(func.count(LoginToken.id)).where(LoginToken.expires_at <= datetime.datetime.utcnow())
+
+
+def read_stats(s: Session) -> Dict[str, int]:
+    counters = read_counters(s)
+    stats = {field: counters.get(name, 0) for name, field in STAT_FIELDS.items()}
+    # 表里还没被 reaper 清理的过期 Token 不算活跃
+    stats["active_tokens"] = max(stats["active_tokens"] - s.scalar(expired_tokens_query()), 0)
+    return stats
+
+
+def reconcile(s: Session) -> Dict[str, int]:
+    """在当前事务里用真实 COUNT 校正计数器，返回各计数器的漂移量"""
+    current = read_counters(s)
+    drift = {}
+    for name, query in TOTALS.items():
+        actual = s.scalar(query())
+        drift[name] = actual - current.get(name, 0)
+        bump(s, name, drift[name])
+    return drift
+
+
+def reconcile_counters() -> Dict[str, int]:
+    """定期校正任务；首次初始化由 migrations.py 完成"""
+    db = SessionLocal()
+    try:
+        drift = run_write(db, reconcile)
+    finally:
+        db.close()
+    if any(drift.values()):
+        logger.warning("计数器校正: %s", drift)
+    return drift
+
+
+async def read_series(db, series: str, hours: int) -> List[dict]:
+    """最近 hours 小时的逐小时数据，没有事件的小时补 0"""
+    end = _hour(datetime.datetime.utcnow())
+    start = end - datetime.timedelta(hours=hours - 1)
+    rows = await db.execute(
+        select(CounterBucket.bucket, CounterBucket.value)
+        .where(CounterBucket.name == series, CounterBucket.bucket >= start)
+    )
+    values = {bucket: value for bucket, value in rows.all()}
+    return [
+        {"bucket": (start + datetime.timedelta(hours=i)).isoformat(),
+         "value": values.get(start + datetime.timedelta(hours=i), 0)}
+        for i in range(hours)
+    ]
@@ -1,6 +1,17 @@
 import os
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, DeclarativeBase
+import time
+import asyncio
+import logging
+from typing import Any, Callable, List, Optional
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from sqlalchemy.orm import Session, sessionmaker, DeclarativeBase
+
+from config import (
+    DB_PROFILE, WRITE_QUEUE_ENABLED, WRITE_QUEUE_INTERVAL_MS, WRITE_QUEUE_MAX_BATCH,
+    DATABASE_READ_URLS, READ_REPLICA_MAX_LAG_SECONDS,
+)
+from engine_profiles import create_profiled_engine, create_profiled_async_engine
+from write_queue import WriteQueue, sqlite_writer_sessionmaker
 
 # 支持 MySQL 和 SQLite 切换，默认使用 SQLite 方便开发测试
 DATABASE_URL = os.getenv(
@@ -8,12 +19,59 @@ DATABASE_URL = os.getenv(
     "sqlite:///./mclauncher.db"
 )
 
-if DATABASE_URL.startswith("sqlite"):
-    engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
-else:
-    engine = create_engine(DATABASE_URL, pool_pre_ping=True)
+
+def _async_url(url: str) -> str:
+    """同步驱动 URL 换成对应的异步驱动：aiosqlite / aiomysql"""
+    scheme, sep, rest = url.partition("://")
+    backend = scheme.split("+", 1)[0]
+    driver = {"sqlite": "aiosqlite", "mysql": "aiomysql"}[backend]
+    return f"{backend}+{driver}{sep}{rest}"
+
+
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or _async_url(DATABASE_URL)
+
+# 同步引擎：建表迁移、后台任务、写队列使用
+engine = create_profiled_engine(DATABASE_URL, DB_PROFILE)
 SessionLocal = sessionmaker(bind=engine, autoflush=False, autocommit=False)
 
+# 异步引擎：路由处理函数使用，等待数据库时不占用线程池
+async_engine = create_profiled_async_engine(ASYNC_DATABASE_URL, DB_PROFILE)
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, autoflush=False, autocommit=False, expire_on_commit=False,
+)
+
+logger = logging.getLogger("database")
+
+
+class ReadReplica:
+    """只读副本：异步引擎 + 最近一次探测到的复制延迟"""
+
+    def __init__(self, url: str):
+        self.url = url
+        self.engine = create_profiled_async_engine(_async_url(url), DB_PROFILE)
+        self.sessionmaker = async_sessionmaker(
+            bind=self.engine, autoflush=False, autocommit=False, expire_on_commit=False,
+        )
+        self.lag: Optional[float] = None  # None 表示尚未探测成功
+
+    @property
+    def healthy(self) -> bool:
+        return self.lag is not None and self.lag <= READ_REPLICA_MAX_LAG_SECONDS
+
+
+read_replicas: List[ReadReplica] = [ReadReplica(url) for url in DATABASE_READ_URLS]
+_replica_cursor = 0
+
+# 可选的单写线程：所有写操作合并成批，每批一个事务提交
+write_queue = None
+if WRITE_QUEUE_ENABLED:
+    write_queue = WriteQueue(
+        sqlite_writer_sessionmaker(create_profiled_engine(DATABASE_URL, DB_PROFILE, pool_size=1))
+        if DATABASE_URL.startswith("sqlite") else SessionLocal,
+        WRITE_QUEUE_INTERVAL_MS,
+        WRITE_QUEUE_MAX_BATCH,
+    )
+
 
 class Base(DeclarativeBase):
     pass
@@ -27,5 +85,98 @@ def get_db():
         db.close()
 
 
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def _pick_read_sessionmaker() -> async_sessionmaker:
+    """轮询选择一个延迟在允许范围内的副本，全部不可用时回落到主库"""
+    global _replica_cursor
+    for _ in range(len(read_replicas)):
+        replica = read_replicas[_replica_cursor % len(read_replicas)]
+        _replica_cursor += 1
+        if replica.healthy:
+            return replica.sessionmaker
+    return AsyncSessionLocal
+
+
+async def get_read_db():
+    """只读处理函数使用：路由到副本，可以接受 READ_REPLICA_MAX_LAG_SECONDS 以内的旧数据。
+    需要读到自己刚写入数据的处理函数应继续使用 get_async_db。"""
+    async with _pick_read_sessionmaker()() as db:
+        yield db
+
+
+def open_read_session() -> AsyncSession:
+    """流式响应在处理函数返回后才读数据，依赖注入的会话那时已经关闭，需要自己开一个"""
+    return _pick_read_sessionmaker()()
+
+
+async def check_replicas():
+    """主库写入心跳时间戳，再读各副本上的心跳，差值即复制延迟"""
+    from models import ReplicaHeartbeat
+
+    now = time.time()
+    async with async_engine.begin() as conn:
+        updated = await conn.execute(
+            ReplicaHeartbeat.__table__.update().where(ReplicaHeartbeat.id == 1).values(ts=now)
+        )
+        if not updated.rowcount:
+            await conn.execute(ReplicaHeartbeat.__table__.insert().values(id=1, ts=now))
+    for replica in read_replicas:
+        try:
+            async with replica.engine.connect() as conn:
+                ts = await conn.scalar(
+                    ReplicaHeartbeat.__table__.select().with_only_columns(ReplicaHeartbeat.ts)
+                )
+            replica.lag = None if ts is None else max(0.0, now - ts)
+        except Exception as e:
+            replica.lag = None
+            logger.warning("只读副本不可用 %s: %s", replica.url, e)
+
+
+async def replica_health_loop(interval: float):
+    while True:
+        try:
+            await check_replicas()
+        except Exception:
+            logger.exception("副本健康检查失败")
+        await asyncio.sleep(interval)
+
+
+def replica_status() -> List[dict]:
+    return [
+        {"url": r.engine.url.render_as_string(hide_password=True), "lag_seconds": r.lag, "healthy": r.healthy}
+        for r in read_replicas
+    ]
+
+
+def run_write(db: Session, fn: Callable[[Session], Any]) -> Any:
+    """执行一个写操作并提交，返回 fn 的返回值
+
+    开启写队列时 fn 在写线程自己的会话里执行（和其他请求的写操作一起组提交），
+    因此 fn 只能通过参数拿到的会话读写，且只应返回普通值而不是 ORM 对象。
+    """
+    if write_queue is not None:
+        return write_queue.submit(fn).result()
+    result = fn(db)
+    db.commit()
+    return result
+
+
+async def run_write_async(db: AsyncSession, fn: Callable[[Session], Any]) -> Any:
+    """run_write 的异步版本：fn 仍然接收同步 Session（通过 AsyncSession.run_sync 执行）"""
+    if write_queue is not None:
+        return await asyncio.wrap_future(write_queue.submit(fn))
+    result = await db.run_sync(fn)
+    await db.commit()
+    return result
+
+
 def init_db():
+    # migrations 会导入 models，保证 create_all 时所有表都已注册到 Base.metadata
+    from migrations import upgrade
     Base.metadata.create_all(bind=engine)
+    # create_all 不会修改已存在的表，列和索引的变更走版本化迁移
+    upgrade()
@@ -0,0 +1,169 @@
+"""数据库引擎配置档案和连接池指标
+
+DB_PROFILE 选择一组预设：
+- development: 与早期版本一致，SQLite 只关 check_same_thread，MySQL 只开 pool_pre_ping
+- production: SQLite 开 WAL、synchronous=NORMAL、mmap、页缓存和 busy_timeout；
+  MySQL 配置连接池大小、溢出上限和连接回收时间
+
+SQLite 的 PRAGMA 在每个新连接建立时执行。连接池换成 TimedQueuePool（异步引擎为
+TimedAsyncAdaptedQueuePool），
+记录每次借出连接的等待时间，通过 pool_stats() 暴露给管理接口。
+"""
+import threading
+import time
+from typing import Any, Dict
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncEngine, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+ENGINE_PROFILES: Dict[str, Dict[str, Dict[str, Any]]] = {
+    "sqlite": {
+        "development": {
+            "pragmas": {},
+            "pool": {},
+        },
+        "production": {
+            "pragmas": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "mmap_size": 256 * 1024 * 1024,
+                "cache_size": -64 * 1024,  # 负数单位为 KiB，即 64MB
+                "busy_timeout": 5000,
+                "temp_store": "MEMORY",
+            },
+            "pool": {"pool_size": 10, "max_overflow": 20, "pool_timeout": 10},
+        },
+    },
+    "mysql": {
+        "development": {
+            "pool": {"pool_pre_ping": True},
+        },
+        "production": {
+            "pool": {
+                "pool_pre_ping": True,
+                "pool_size": 20,
+                "max_overflow": 30,
+                "pool_recycle": 1800,
+                "pool_timeout": 10,
+            },
+        },
+    },
+}
+
+
+class PoolMetrics:
+    """连接池借出次数和等待时间统计"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+        self.timeouts = 0
+
+    def record(self, wait: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+                return
+            self.checkouts += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            avg = self.total_wait / self.checkouts if self.checkouts else 0.0
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(avg * 1000, 3),
+                "max_wait_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+class _TimedPoolMixin:
+    """记录借出连接等待时间"""
+
+    metrics: PoolMetrics
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            conn = super()._do_get()
+        except Exception:
+            self.metrics.record(0.0, timed_out=True)
+            raise
+        self.metrics.record(time.perf_counter() - start)
+        return conn
+
+
+class TimedQueuePool(_TimedPoolMixin, QueuePool):
+    pass
+
+
+class TimedAsyncAdaptedQueuePool(_TimedPoolMixin, AsyncAdaptedQueuePool):
+    pass
+
+
+def _install_sqlite_pragmas(engine: Engine, pragmas: Dict[str, Any]):
+    if not pragmas:
+        return
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _):
+        cursor = dbapi_conn.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f"PRAGMA {name}={value}")
+        cursor.close()
+
+
+def _engine_options(url: str, profile: str, base_pool, **kwargs):
+    backend = "sqlite" if url.startswith("sqlite") else "mysql"
+    if profile not in ENGINE_PROFILES[backend]:
+        raise ValueError(f"未知的 DB_PROFILE: {profile}")
+    settings = ENGINE_PROFILES[backend][profile]
+    options = dict(settings.get("pool", {}))
+    options.update(kwargs)
+
+    in_memory = backend == "sqlite" and url.partition("///")[2] in ("", ":memory:")
+    if backend == "sqlite":
+        options.setdefault("connect_args", {})["check_same_thread"] = False
+    if not in_memory and "poolclass" not in options:
+        # 每个引擎一个池子类，指标互不干扰
+        options["poolclass"] = type(base_pool.__name__, (base_pool,), {"metrics": PoolMetrics()})
+    pragmas = settings.get("pragmas", {}) if backend == "sqlite" else {}
+    return options, pragmas
+
+
+def create_profiled_engine(url: str, profile: str, **kwargs) -> Engine:
+    """按配置档案创建同步引擎，未知档案名直接报错"""
+    options, pragmas = _engine_options(url, profile, TimedQueuePool, **kwargs)
+    engine = create_engine(url, **options)
+    _install_sqlite_pragmas(engine, pragmas)
+    return engine
+
+
+def create_profiled_async_engine(url: str, profile: str, **kwargs) -> AsyncEngine:
+    """按配置档案创建异步引擎（aiosqlite / aiomysql）"""
+    options, pragmas = _engine_options(url, profile, TimedAsyncAdaptedQueuePool, **kwargs)
+    engine = create_async_engine(url, **options)
+    _install_sqlite_pragmas(engine.sync_engine, pragmas)
+    return engine
+
+
+def pool_stats(engine) -> Dict[str, Any]:
+    """连接池当前连接数和借出等待指标（同步或异步引擎）"""
+    pool = engine.pool
+    stats: Dict[str, Any] = {"pool": type(pool).__name__, "status": pool.status()}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checked_in": pool.checkedin(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    if isinstance(pool, _TimedPoolMixin):
+        stats.update(pool.metrics.snapshot())
+    return stats
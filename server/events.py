@@ -0,0 +1,135 @@
+"""后台实时事件（SSE）
+
+写路径在事务里用 emit() 登记事件（注册、登录、违规记录、计数器增量、小时桶增量），
+事务提交后由 Session 的 after_commit 事件统一推送到进程内的 EventHub，回滚的事务不会推送。
+EventHub 把每个事件只序列化一次，再分发给所有已连接的后台页面（/admin/api/events），
+后台页面据此增量更新，不再重复查询，数据库负载与打开的页面数无关。
+
+EventHub 在进程内，多 worker 部署时每个页面只收到它所连接的 worker 上发生的事件；
+snapshot_loop 定期（EVENTS_SNAPSHOT_SECONDS）读一次计数器推送完整统计，用于校正。
+"""
+import asyncio
+import json
+import logging
+import time
+from typing import List, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+logger = logging.getLogger("events")
+
+# 每个连接最多积压的事件数，超过后断开该连接，由浏览器重连并重新拿完整统计
+QUEUE_SIZE = 256
+
+Event = Tuple[str, dict]
+
+
+def emit(s: Session, event_type: str, data: dict):
+    """在当前写事务里登记一个事件，提交后推送"""
+    s.info.setdefault("pending_events", []).append((event_type, data))
+
+
+def emit_counter(s: Session, field: str, delta: int):
+    """计数器增量，同一事务里的多次调整合并成一个 counters 事件"""
+    deltas = s.info.setdefault("pending_counters", {})
+    deltas[field] = deltas.get(field, 0) + delta
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(s: Session):
+    events: List[Event] = s.info.pop("pending_events", [])
+    deltas = {k: v for k, v in s.info.pop("pending_counters", {}).items() if v}
+    if deltas:
+        events.append(("counters", deltas))
+    if events:
+        hub.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(s: Session):
+    s.info.pop("pending_events", None)
+    s.info.pop("pending_counters", None)
+
+
+def encode_event(event_type: str, data) -> bytes:
+    return f"event: {event_type}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class EventHub:
+    def __init__(self):
+        self._subscribers: Set[asyncio.Queue] = set()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self.last_snapshot: Optional[dict] = None
+        self.last_snapshot_at = 0.0
+        self.published = 0
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    @property
+    def subscribers(self) -> int:
+        return len(self._subscribers)
+
+    def subscribe(self) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue(maxsize=QUEUE_SIZE)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue: asyncio.Queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, events: List[Event]):
+        """可以在任意线程调用（写队列线程、线程池），分发在事件循环里进行"""
+        if self._loop is None or not self._subscribers:
+            return
+        self._loop.call_soon_threadsafe(self._fanout, events)
+
+    def _fanout(self, events: List[Event]):
+        payloads = [encode_event(event_type, data) for event_type, data in events]
+        self.published += len(payloads)
+        for queue in list(self._subscribers):
+            try:
+                for payload in payloads:
+                    queue.put_nowait(payload)
+            except asyncio.QueueFull:
+                # 处理不过来的连接：清空积压，放入 None 通知其关闭
+                self._subscribers.discard(queue)
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(None)
+
+    def publish_snapshot(self, stats: dict):
+        self.last_snapshot = stats
+        self.last_snapshot_at = time.monotonic()
+        self._fanout([("stats", stats)])
+
+
+hub = EventHub()
+
+
+async def _read_stats() -> dict:
+    from counters import read_stats
+    from database import AsyncSessionLocal
+    # 计数器只有几行，读主库，避免副本延迟让快照落后于已推送的增量
+    async with AsyncSessionLocal() as db:
+        return await db.run_sync(read_stats)
+
+
+async def current_snapshot(max_age: float) -> dict:
+    """新连接的初始统计：最近一次快照足够新就直接用，否则读一次计数器"""
+    if hub.last_snapshot is None or time.monotonic() - hub.last_snapshot_at > max_age:
+        hub.publish_snapshot(await _read_stats())
+    return hub.last_snapshot
+
+
+async def snapshot_loop(interval: float):
+    """有连接时按固定间隔推送一次完整统计（所有连接共用一次查询）"""
+    while True:
+        await asyncio.sleep(interval)
+        if not hub.subscribers:
+            continue
+        try:
+            hub.publish_snapshot(await _read_stats())
+        except Exception:
+            logger.exception("推送统计快照失败")
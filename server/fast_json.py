@@ -0,0 +1,58 @@
+"""JSON 序列化
+
+FastJSONResponse 是全局默认响应类（main.py 的 default_response_class）：装了 orjson 时用 orjson 序列化，
+否则退回标准库 json（与 Starlette 的 JSONResponse 相同的紧凑格式）。
+路由直接返回 FastJSONResponse 时还能跳过 FastAPI 的 jsonable_encoder（逐个复制一遍整个 dict）。
+
+大清单用 stream_object 边生成边编码：条目由生成器逐条产出，攒到 STREAM_FLUSH_BYTES 发送一次，
+不需要先构造完整的 dict 和完整的响应体，峰值内存与条目数无关。
+"""
+import json
+from typing import Any, Iterable, Iterator, Tuple
+
+from starlette.responses import JSONResponse, StreamingResponse
+
+try:
+    import orjson
+except ImportError:  # 可选依赖
+    orjson = None
+
+# 流式输出时攒到这个大小再交给 ASGI 发送
+STREAM_FLUSH_BYTES = 64 * 1024
+
+
+if orjson is not None:
+    def dumps(obj: Any) -> bytes:
+        # 非字符串键（如 int）与标准库一样转成字符串
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+else:
+    def dumps(obj: Any) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def iter_object(items: Iterable[Tuple[str, Any]]) -> Iterator[bytes]:
+    """把 (键, 值) 逐条编码成一个 JSON 对象，按 STREAM_FLUSH_BYTES 分块产出"""
+    parts = [b"{"]
+    size = 1
+    sep = b""
+    for key, value in items:
+        piece = sep + dumps(key) + b":" + dumps(value)
+        sep = b","
+        parts.append(piece)
+        size += len(piece)
+        if size >= STREAM_FLUSH_BYTES:
+            yield b"".join(parts)
+            parts = []
+            size = 0
+    parts.append(b"}")
+    yield b"".join(parts)
+
+
+def stream_object(items: Iterable[Tuple[str, Any]]) -> StreamingResponse:
+    """以流式 JSON 对象响应；items 为同步生成器时由 Starlette 在线程池里迭代，可以在其中读文件"""
+    return StreamingResponse(iter_object(items), media_type="application/json")
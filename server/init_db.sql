@@ -15,7 +15,9 @@ CREATE TABLE IF NOT EXISTS users (
     machine_id VARCHAR(64) NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     INDEX idx_username (username),
-    INDEX idx_machine_id (machine_id)
+    INDEX idx_machine_id (machine_id),
+    INDEX ix_users_created_id (created_at, id),
+    FULLTEXT INDEX ft_users_username (username) WITH PARSER ngram
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- 机器码绑定表
@@ -32,11 +34,14 @@ CREATE TABLE IF NOT EXISTS machine_bindings (
 CREATE TABLE IF NOT EXISTS login_tokens (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
-    token VARCHAR(512) NOT NULL UNIQUE,
+    token_hash BINARY(32) NOT NULL,
     client_ip VARCHAR(45) NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
     expires_at DATETIME NOT NULL,
-    INDEX idx_token (token),
+    UNIQUE INDEX ix_login_tokens_token_hash (token_hash),
+    INDEX ix_login_tokens_expires_at (expires_at),
+    INDEX ix_login_tokens_user_created_expires (user_id, created_at, expires_at),
+    INDEX ix_login_tokens_created_id (created_at, id),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
@@ -58,7 +63,59 @@ CREATE TABLE IF NOT EXISTS anticheat_logs (
     violation_count INT DEFAULT 0,
     reason VARCHAR(200) NOT NULL,
     created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
-    INDEX idx_username (username)
+    INDEX ix_anticheat_logs_created_id (created_at, id),
+    INDEX ix_anticheat_logs_username_created (username, created_at),
+    FULLTEXT INDEX ft_anticheat_logs_username (username) WITH PARSER ngram
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 违规记录按玩家按小时/天的汇总（原始记录归档后保留）
+CREATE TABLE IF NOT EXISTS anticheat_rollups (
+    username VARCHAR(32) NOT NULL,
+    period VARCHAR(8) NOT NULL,
+    bucket DATETIME NOT NULL,
+    logs INT NOT NULL DEFAULT 0,
+    reports INT NOT NULL DEFAULT 0,
+    violations INT NOT NULL DEFAULT 0,
+    max_violation INT NOT NULL DEFAULT 0,
+    ips TEXT NOT NULL,
+    reasons TEXT NOT NULL,
+    PRIMARY KEY (username, period, bucket),
+    INDEX ix_anticheat_rollups_period_bucket (period, bucket, username)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 玩家风险分
+CREATE TABLE IF NOT EXISTS player_risk (
+    username VARCHAR(32) PRIMARY KEY,
+    decay_key DOUBLE NOT NULL,
+    logs INT NOT NULL DEFAULT 0,
+    last_report_at DATETIME NOT NULL,
+    INDEX ix_player_risk_decay_key (decay_key)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 后台统计计数器
+CREATE TABLE IF NOT EXISTS counters (
+    name VARCHAR(32) PRIMARY KEY,
+    value INT NOT NULL DEFAULT 0
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 按小时累计的事件数
+CREATE TABLE IF NOT EXISTS counter_buckets (
+    name VARCHAR(32) NOT NULL,
+    bucket DATETIME NOT NULL,
+    value INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (name, bucket)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
+
+-- 分批发布
+CREATE TABLE IF NOT EXISTS rollouts (
+    channel VARCHAR(16) PRIMARY KEY,
+    version VARCHAR(64) NOT NULL,
+    payload MEDIUMTEXT NOT NULL,
+    percent FLOAT NOT NULL,
+    paused INT NOT NULL DEFAULT 0,
+    started_at DATETIME NOT NULL,
+    ramp_at DATETIME NOT NULL,
+    completed_at DATETIME NULL
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4;
 
 -- 插入默认公告
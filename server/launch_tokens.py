@@ -0,0 +1,126 @@
+"""一次性启动令牌存储
+
+启动令牌有效期很短（默认 2 分钟）且只能使用一次，不需要落到业务数据库里。
+这里提供两种后端：
+- memory: 进程内字典，单 worker 部署使用，零 IO
+- sqlite: 独立的 SQLite 文件，多 worker / 多进程部署时共享
+
+两种后端都保证 consume 是原子的「校验 + 删除」，同一令牌并发校验只有一个能成功。
+"""
+import abc
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from models import token_digest
+from config import LAUNCH_TOKEN_STORE, LAUNCH_TOKEN_DB, LAUNCH_TOKEN_TTL_SECONDS
+
+
+class LaunchTokenStore(abc.ABC):
+    """启动令牌存储接口：每个用户同一时刻只保留最新的一个令牌"""
+
+    def issue(self, username: str, ttl: int = LAUNCH_TOKEN_TTL_SECONDS) -> Tuple[str, float]:
+        """为用户生成新令牌（覆盖旧令牌），返回 (令牌, 过期时间戳)"""
+        token = secrets.token_hex(32)
+        expires_at = time.time() + ttl
+        self._put(username, token_digest(token), expires_at)
+        return token, expires_at
+
+    @abc.abstractmethod
+    def consume(self, username: str, token: str) -> bool:
+        """原子地校验并作废令牌，成功返回 True"""
+
+    @abc.abstractmethod
+    def purge_expired(self) -> int:
+        """删除已过期的令牌，返回删除数量"""
+
+    @abc.abstractmethod
+    def _put(self, username: str, digest: bytes, expires_at: float):
+        """保存用户的令牌摘要（覆盖旧令牌）"""
+
+
+class MemoryLaunchTokenStore(LaunchTokenStore):
+    """进程内存储，仅适用于单 worker"""
+
+    def __init__(self):
+        self._tokens: Dict[str, Tuple[bytes, float]] = {}
+        self._lock = threading.Lock()
+
+    def _put(self, username: str, digest: bytes, expires_at: float):
+        with self._lock:
+            self._tokens[username] = (digest, expires_at)
+
+    def consume(self, username: str, token: str) -> bool:
+        digest = token_digest(token)
+        with self._lock:
+            entry = self._tokens.get(username)
+            if not entry or not secrets.compare_digest(entry[0], digest):
+                return False
+            del self._tokens[username]
+        return entry[1] > time.time()
+
+    def purge_expired(self) -> int:
+        now = time.time()
+        with self._lock:
+            expired = [u for u, (_, exp) in self._tokens.items() if exp <= now]
+            for username in expired:
+                del self._tokens[username]
+        return len(expired)
+
+
+class SQLiteLaunchTokenStore(LaunchTokenStore):
+    """基于独立 SQLite 文件的存储，可在多个 worker 进程间共享"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._conn().execute(
+            "CREATE TABLE IF NOT EXISTS launch_tokens ("
+            " username TEXT PRIMARY KEY,"
+            " token_hash BLOB NOT NULL,"
+            " expires_at REAL NOT NULL"
+            ") WITHOUT ROWID"
+        )
+
+    def _conn(self) -> sqlite3.Connection:
+        conn: Optional[sqlite3.Connection] = getattr(self._local, "conn", None)
+        if conn is None:
+            # isolation_level=None：每条语句自动提交，单语句即原子操作
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _put(self, username: str, digest: bytes, expires_at: float):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO launch_tokens (username, token_hash, expires_at) VALUES (?, ?, ?)",
+            (username, digest, expires_at),
+        )
+
+    def consume(self, username: str, token: str) -> bool:
+        cur = self._conn().execute(
+            "DELETE FROM launch_tokens WHERE username = ? AND token_hash = ? AND expires_at > ?",
+            (username, token_digest(token), time.time()),
+        )
+        return cur.rowcount == 1
+
+    def purge_expired(self) -> int:
+        cur = self._conn().execute("DELETE FROM launch_tokens WHERE expires_at <= ?", (time.time(),))
+        return cur.rowcount
+
+
+def create_launch_token_store(kind: str = LAUNCH_TOKEN_STORE) -> LaunchTokenStore:
+    if kind == "memory":
+        return MemoryLaunchTokenStore()
+    if kind == "sqlite":
+        return SQLiteLaunchTokenStore(LAUNCH_TOKEN_DB)
+    raise ValueError(f"未知的 LAUNCH_TOKEN_STORE: {kind}")
+
+
+launch_token_store = create_launch_token_store()
@@ -1,22 +1,63 @@
 import os
+import asyncio
 from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
 
-from database import init_db
-from routers import auth, mods, announcements, anticheat, sync, admin, landing
-from config import MODS_DIR, CLIENT_PACK_DIR, IS_PROD, CORS_ORIGINS
+from database import init_db, SessionLocal, write_queue, async_engine, read_replicas, replica_health_loop
+from revocation import revocation_set
+from maintenance import reaper_loop, reconcile_loop
+from anticheat_buffer import report_buffer
+from events import hub, snapshot_loop
+from static_assets import CompressedStaticFiles
+from fast_json import FastJSONResponse
+from rollout import rollout_loop, DownloadGaugeMiddleware
+from routers import auth, mods, announcements, anticheat, sync, admin, export, landing, updates
+from config import (
+    MODS_DIR, CLIENT_PACK_DIR, IS_PROD, CORS_ORIGINS, REAPER_INTERVAL_SECONDS, REPLICA_HEARTBEAT_SECONDS,
+    COUNTER_RECONCILE_SECONDS, SQL_PROFILE, EVENTS_SNAPSHOT_SECONDS, UPDATES_DIR, ROLLOUT_TICK_SECONDS,
+)
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     # 启动时初始化
     init_db()
+    if revocation_set.enabled:
+        db = SessionLocal()
+        try:
+            revocation_set.load(db)
+        finally:
+            db.close()
     os.makedirs(MODS_DIR, exist_ok=True)
     os.makedirs(CLIENT_PACK_DIR, exist_ok=True)
-    os.makedirs("./updates", exist_ok=True)
+    os.makedirs(UPDATES_DIR, exist_ok=True)
+
+    # 后台任务
+    if write_queue is not None:
+        write_queue.start()
+    tasks = []
+    if REAPER_INTERVAL_SECONDS > 0:
+        tasks.append(asyncio.create_task(reaper_loop(REAPER_INTERVAL_SECONDS)))
+    if COUNTER_RECONCILE_SECONDS > 0:
+        tasks.append(asyncio.create_task(reconcile_loop(COUNTER_RECONCILE_SECONDS)))
+    if read_replicas:
+        tasks.append(asyncio.create_task(replica_health_loop(REPLICA_HEARTBEAT_SECONDS)))
+    report_buffer.start()
+    hub.bind(asyncio.get_running_loop())
+    if EVENTS_SNAPSHOT_SECONDS > 0:
+        tasks.append(asyncio.create_task(snapshot_loop(EVENTS_SNAPSHOT_SECONDS)))
+    tasks.append(asyncio.create_task(rollout_loop(ROLLOUT_TICK_SECONDS)))
     yield
+    for task in tasks:
+        task.cancel()
+    # 缓冲的违规记录要在写队列停止之前写完
+    await report_buffer.stop()
+    if write_queue is not None:
+        write_queue.stop()
+    await async_engine.dispose()
+    for replica in read_replicas:
+        await replica.engine.dispose()
 
 
 # 生产环境禁用 Swagger 文档
@@ -24,10 +65,19 @@ app = FastAPI(
     title="MCLauncher Server",
     version="1.0.0",
     lifespan=lifespan,
+    default_response_class=FastJSONResponse,
     docs_url=None if IS_PROD else "/docs",
     redoc_url=None if IS_PROD else "/redoc",
 )
 
+if SQL_PROFILE:
+    import sql_profiler
+    sql_profiler.install()
+    app.add_middleware(sql_profiler.SQLProfilerMiddleware)
+
+# 统计进行中的下载数，分批发布据此暂停放量
+app.add_middleware(DownloadGaugeMiddleware)
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=CORS_ORIGINS,
@@ -42,10 +92,13 @@ app.include_router(sync.router)
 app.include_router(announcements.router)
 app.include_router(anticheat.router)
 app.include_router(admin.router)
+app.include_router(export.router)
 app.include_router(landing.router)
+# /updates/latest.yml 按分批发布返回，需在下面的静态目录之前注册
+app.include_router(updates.router)
 
 # 挂载静态文件服务用于自动更新
-app.mount("/updates", StaticFiles(directory="./updates"), name="updates")
+app.mount("/updates", CompressedStaticFiles(directory=UPDATES_DIR), name="updates")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,84 @@
+"""后台维护任务：定期清理过期的登录 Token、启动令牌和内存吊销表，归档过期的违规记录，定期校正统计计数器
+
+分小批删除，每批单独提交，避免长时间持有 SQLite 写锁。
+"""
+import asyncio
+import datetime
+import logging
+import time
+from typing import Dict
+
+from database import SessionLocal, run_write
+from models import LoginToken
+from launch_tokens import launch_token_store
+from revocation import revocation_set
+from counters import bump, reconcile_counters
+from anticheat_archive import archive_old_logs
+from config import REAPER_INTERVAL_SECONDS, REAPER_BATCH_SIZE, COUNTER_RECONCILE_SECONDS
+
+logger = logging.getLogger("maintenance")
+
+
+def reap_expired_login_tokens(batch_size: int = REAPER_BATCH_SIZE) -> int:
+    """按批删除已过期的登录 Token，返回删除总数"""
+    total = 0
+    db = SessionLocal()
+    try:
+        while True:
+            now = datetime.datetime.utcnow()
+            ids = [
+                row.id for row in
+                db.query(LoginToken.id).filter(LoginToken.expires_at < now).limit(batch_size)
+            ]
+            if not ids:
+                break
+            def _delete(s):
+                removed = s.query(LoginToken).filter(LoginToken.id.in_(ids)).delete(synchronize_session=False)
+                # 过期 Token 在统计里早已不算活跃，只调整行数，不向后台推送 active_tokens 变化
+                bump(s, "login_tokens", -removed, publish=False)
+
+            run_write(db, _delete)
+            total += len(ids)
+            if len(ids) < batch_size:
+                break
+    finally:
+        db.close()
+    return total
+
+
+def run_reaper_once() -> Dict[str, float]:
+    """执行一轮清理，返回各类删除数量和耗时"""
+    start = time.perf_counter()
+    report = {
+        "login_tokens": reap_expired_login_tokens(),
+        "launch_tokens": launch_token_store.purge_expired(),
+        "revocations": revocation_set.compact(),
+        "anticheat_archived": archive_old_logs(),
+    }
+    report["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 2)
+    logger.info(
+        "reaper: 删除过期登录Token %d 条，启动令牌 %d 个，吊销表条目 %d 个，归档违规记录 %d 条，耗时 %.2fms",
+        report["login_tokens"], report["launch_tokens"], report["revocations"], report["anticheat_archived"],
+        report["elapsed_ms"],
+    )
+    return report
+
+
+async def reaper_loop(interval: int = REAPER_INTERVAL_SECONDS):
+    """按固定间隔在线程池中运行清理，异常只记录不退出"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(run_reaper_once)
+        except Exception:
+            logger.exception("reaper: 清理失败")
+
+
+async def reconcile_loop(interval: int = COUNTER_RECONCILE_SECONDS):
+    """按固定间隔用真实 COUNT 校正统计计数器"""
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(reconcile_counters)
+        except Exception:
+            logger.exception("计数器校正失败")
@@ -0,0 +1,151 @@
+"""清单的紧凑二进制编码（MessagePack）
+
+/mods/manifest 和 /sync/{id}/manifest 默认返回 JSON；请求带 Accept: application/x-msgpack 且装了 msgpack 时
+返回下面的结构，体积主要省在 JSON 里每条都重复的下载地址和十六进制 MD5 上：
+
+  {
+    "v": 1,
+    "base": 下载地址前缀,        条目的 url 为 base + "/" + 路径时不单独存
+    "md5_url": true,            （可省略）默认 url 为 base + "/" + MD5 + "/" + 路径（/mods/refresh 生成的清单）
+    "prefix": [int, ...],       路径按 UTF-8 字节排序，与上一条路径相同的前缀字节数
+    "suffix": [bin, ...],       去掉相同前缀后剩下的字节
+    "md5": bin,                 每条 16 字节原始摘要，按顺序拼接
+    "size": [int, ...],
+    "urls": [[序号, url], ...]  url 不是默认地址的条目（可省略）
+  }
+
+条目只能有 md5 / size / url 三个字段，手写的清单文件里出现其他字段或 MD5 格式不对时无法编码，
+pack 抛出 ValueError，pack_json / pack_file 返回 None，调用方退回 JSON。
+二进制清单需要排序，所以总是在内存里生成完整内容（相比 JSON 很小）。
+"""
+import functools
+import json
+import os
+from typing import Any, Dict, Iterable, Mapping, Optional, Tuple
+
+from starlette.responses import Response
+
+try:
+    import msgpack
+except ImportError:  # 可选依赖，未安装时总是返回 JSON
+    msgpack = None
+
+MEDIA_TYPE = "application/x-msgpack"
+FORMAT_VERSION = 1
+
+_MEDIA_TYPES = {MEDIA_TYPE, "application/msgpack"}
+_FIELDS = {"md5", "size", "url"}
+
+
+def accepts(request_headers: Mapping[str, str]) -> bool:
+    """Accept 里列出了 MessagePack（q 不为 0）且服务端能编码"""
+    if msgpack is None:
+        return False
+    for part in request_headers.get("accept", "").split(","):
+        media_type, *params = [p.strip() for p in part.split(";")]
+        if media_type.lower() not in _MEDIA_TYPES:
+            continue
+        q = next((p[2:] for p in params if p.lower().startswith("q=")), "1")
+        try:
+            return float(q) > 0
+        except ValueError:
+            return False
+    return False
+
+
+def _shared_prefix(a: bytes, b: bytes) -> int:
+    """相同前缀的字节数：按大整数异或找第一个不同的字节，比逐字节比较快得多"""
+    n = min(len(a), len(b))
+    diff = int.from_bytes(a[:n], "big") ^ int.from_bytes(b[:n], "big")
+    return n - (diff.bit_length() + 7) // 8
+
+
+def pack(items: Iterable[Tuple[str, Dict[str, Any]]], base_url: str) -> bytes:
+    """把 (路径, 条目) 编码成上面的结构"""
+    entries = sorted(((path.encode("utf-8"), path, entry) for path, entry in items), key=lambda e: e[0])
+    for _, path, entry in entries:
+        if set(entry) != _FIELDS:
+            raise ValueError(f"{path}: 条目字段不是 md5/size/url")
+    # 多数条目的地址带 MD5 时按带 MD5 的地址作为默认值
+    md5_url = sum(e["url"] == f"{base_url}/{e['md5']}/{p}" for _, p, e in entries) * 2 > len(entries)
+    prefix, suffix, sizes, urls = [], [], [], []
+    md5 = bytearray()
+    prev = b""
+    for i, (raw, path, entry) in enumerate(entries):
+        digest = bytes.fromhex(entry["md5"])
+        if len(digest) != 16:
+            raise ValueError(f"{path}: MD5 长度不对")
+        shared = _shared_prefix(prev, raw)
+        prefix.append(shared)
+        suffix.append(raw[shared:])
+        md5 += digest
+        sizes.append(int(entry["size"]))
+        default = f"{base_url}/{entry['md5']}/{path}" if md5_url else f"{base_url}/{path}"
+        if entry["url"] != default:
+            urls.append([i, entry["url"]])
+        prev = raw
+    doc = {
+        "v": FORMAT_VERSION,
+        "base": base_url,
+        "prefix": prefix,
+        "suffix": suffix,
+        "md5": bytes(md5),
+        "size": sizes,
+    }
+    if md5_url:
+        doc["md5_url"] = True
+    if urls:
+        doc["urls"] = urls
+    return msgpack.packb(doc, use_bin_type=True)
+
+
+def unpack(data: bytes) -> Dict[str, Dict[str, Any]]:
+    """还原成与 JSON 清单相同的 dict（启动器 manifest-pack.js 的同一逻辑，用于基准和核对）"""
+    doc = msgpack.unpackb(data, raw=False)
+    if doc["v"] != FORMAT_VERSION:
+        raise ValueError(f"不支持的清单格式: {doc['v']}")
+    urls = dict(doc.get("urls", []))
+    md5_url = doc.get("md5_url", False)
+    md5 = doc["md5"]
+    manifest = {}
+    prev = b""
+    for i, (shared, rest) in enumerate(zip(doc["prefix"], doc["suffix"])):
+        raw = prev[:shared] + rest
+        path = raw.decode("utf-8")
+        digest = md5[i * 16:(i + 1) * 16].hex()
+        manifest[path] = {
+            "md5": digest,
+            "size": doc["size"][i],
+            "url": urls.get(i) or (f"{doc['base']}/{digest}/{path}" if md5_url else f"{doc['base']}/{path}"),
+        }
+        prev = raw
+    return manifest
+
+
+def _pack_or_none(items: Iterable[Tuple[str, Dict[str, Any]]], base_url: str) -> Optional[bytes]:
+    try:
+        return pack(items, base_url)
+    except (ValueError, TypeError, KeyError, AttributeError):
+        return None
+
+
+@functools.lru_cache(maxsize=8)
+def pack_json(payload: bytes, base_url: str) -> Optional[bytes]:
+    """把分批发布中的 JSON 清单编码一次并缓存，无法编码时返回 None（调用方退回 JSON）"""
+    return _pack_or_none(json.loads(payload).items(), base_url)
+
+
+@functools.lru_cache(maxsize=8)
+def _pack_file(path: str, mtime_ns: int, size: int, base_url: str) -> Optional[bytes]:
+    with open(path, "rb") as f:
+        return _pack_or_none(json.load(f).items(), base_url)
+
+
+def pack_file(path: str, base_url: str) -> Optional[bytes]:
+    """清单文件的二进制版本（按修改时间和大小缓存），无法编码时返回 None"""
+    stat = os.stat(path)
+    return _pack_file(path, stat.st_mtime_ns, stat.st_size, base_url)
+
+
+def response(body: bytes) -> Response:
+    return Response(body, media_type=MEDIA_TYPE, headers={"Vary": "Accept"})
@@ -0,0 +1,238 @@
+"""版本化数据库迁移
+
+create_all 只会建不存在的表，已有表上新增的列和索引到不了线上库。
+这里按版本号顺序执行迁移，已执行的版本记录在 schema_migrations 表里，每个版本只跑一次。
+迁移函数需要可重复执行（先检查再修改）：新库由 create_all 直接建成最终结构，迁移跑一遍应当没有变化。
+
+启动时 init_db 会自动执行全部未执行的迁移，也可以手动运行:
+  cd server && python migrations.py status
+  cd server && python migrations.py upgrade [--to 版本号]
+
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 名称, 函数)，版本号只增不改。
+"""
+import argparse
+import datetime
+import logging
+import time
+from typing import Callable, List, NamedTuple, Optional
+
+from sqlalchemy import inspect, select, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.orm import Session
+
+from database import Base, engine
+from models import (
+    token_digest, User, LoginToken, AntiCheatLog, AntiCheatRollup, SchemaMigration,
+)
+
+logger = logging.getLogger("migrations")
+
+
+class Migration(NamedTuple):
+    version: int
+    name: str
+    fn: Callable[[Connection], None]
+
+
+def _index_names(conn: Connection, table: str) -> set:
+    return {ix["name"] for ix in inspect(conn).get_indexes(table)}
+
+
+def _create_indexes(conn: Connection, model, *names: str):
+    """按 models.py 里的定义补建索引"""
+    existing = _index_names(conn, model.__tablename__)
+    for index in model.__table__.indexes:
+        if index.name in names and index.name not in existing:
+            index.create(bind=conn)
+
+
+def _drop_index(conn: Connection, table: str, columns: List[str]):
+    """删除恰好建在 columns 上的普通非唯一索引（名称在 SQLite / MySQL 建表脚本里不同）；
+    MySQL 的 FULLTEXT 索引带 mysql_prefix，不在此列"""
+    for ix in inspect(conn).get_indexes(table):
+        if ix.get("dialect_options", {}).get("mysql_prefix"):
+            continue
+        if ix["column_names"] == columns and not ix.get("unique"):
+            if conn.dialect.name == "mysql":
+                conn.execute(text(f"DROP INDEX `{ix['name']}` ON {table}"))
+            else:
+                conn.execute(text(f'DROP INDEX "{ix["name"]}"'))
+
+
+def m001_login_token_digests(conn: Connection):
+    """login_tokens.token（完整 JWT）改为 token_hash（SHA-256 摘要）"""
+    columns = {c["name"] for c in inspect(conn).get_columns("login_tokens")}
+    if "token" in columns:
+        is_sqlite = conn.dialect.name == "sqlite"
+        if "token_hash" not in columns:
+            # SQLite 无法给已有表加 NOT NULL 列，这里先加可空列
+            col_type = "BLOB" if is_sqlite else "BINARY(32) NULL"
+            conn.execute(text(f"ALTER TABLE login_tokens ADD COLUMN token_hash {col_type}"))
+        rows = conn.execute(text("SELECT id, token FROM login_tokens")).fetchall()
+        for row in rows:
+            conn.execute(
+                text("UPDATE login_tokens SET token_hash = :h WHERE id = :id"),
+                {"h": token_digest(row.token), "id": row.id},
+            )
+        if is_sqlite:
+            # SQLite 删除列前必须先删掉引用它的索引
+            for index in inspect(conn).get_indexes("login_tokens"):
+                if "token" in index["column_names"]:
+                    conn.execute(text(f'DROP INDEX "{index["name"]}"'))
+        else:
+            conn.execute(text("ALTER TABLE login_tokens MODIFY token_hash BINARY(32) NOT NULL"))
+        conn.execute(text("ALTER TABLE login_tokens DROP COLUMN token"))
+    _create_indexes(conn, LoginToken, "ix_login_tokens_token_hash")
+
+
+def m002_admin_list_indexes(conn: Connection):
+    """reaper 按 expires_at 清理、后台列表按 (created_at, id) 游标分页"""
+    _create_indexes(conn, LoginToken, "ix_login_tokens_expires_at", "ix_login_tokens_created_id")
+    _create_indexes(conn, User, "ix_users_created_id")
+    _create_indexes(conn, AntiCheatLog, "ix_anticheat_logs_created_id")
+
+
+def m003_search_index(conn: Connection):
+    from search_index import ensure_search_index
+    ensure_search_index(conn)
+
+
+def m004_counters(conn: Connection):
+    """从现有数据初始化统计计数器"""
+    from counters import reconcile
+    s = Session(bind=conn)
+    try:
+        reconcile(s)
+        s.flush()
+    finally:
+        s.close()
+
+
+def m005_hot_query_indexes(conn: Connection):
+    """verify-player 和按玩家查违规记录的复合索引，替换被它们覆盖的旧索引"""
+    _create_indexes(conn, LoginToken, "ix_login_tokens_user_created_expires")
+    _drop_index(conn, "login_tokens", ["user_id", "created_at"])
+    _create_indexes(conn, AntiCheatLog, "ix_anticheat_logs_username_created")
+    _drop_index(conn, "anticheat_logs", ["username"])
+
+
+def m006_anticheat_rollups(conn: Connection):
+    """从已有的违规记录生成按小时/天的汇总"""
+    from anticheat_rollups import apply_rollups
+    if conn.execute(select(AntiCheatRollup.username).limit(1)).first() is not None:
+        return
+    s = Session(bind=conn)
+    try:
+        last_id = 0
+        while True:
+            rows = conn.execute(
+                select(AntiCheatLog.__table__).where(AntiCheatLog.id > last_id)
+                .order_by(AntiCheatLog.id).limit(5000)
+            ).mappings().all()
+            if not rows:
+                break
+            apply_rollups(s, [dict(row) for row in rows])
+            s.expunge_all()
+            last_id = rows[-1]["id"]
+    finally:
+        s.close()
+
+
+def m007_player_risk(conn: Connection):
+    """从按小时汇总生成玩家风险分"""
+    from risk_scores import backfill_from_rollups
+    s = Session(bind=conn)
+    try:
+        backfill_from_rollups(s)
+    finally:
+        s.close()
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, "login_token_digests", m001_login_token_digests),
+    Migration(2, "admin_list_indexes", m002_admin_list_indexes),
+    Migration(3, "search_index", m003_search_index),
+    Migration(4, "counters", m004_counters),
+    Migration(5, "hot_query_indexes", m005_hot_query_indexes),
+    Migration(6, "anticheat_rollups", m006_anticheat_rollups),
+    Migration(7, "player_risk", m007_player_risk),
+]
+
+
+def _applied(conn: Connection) -> dict:
+    return {row.version: row for row in conn.execute(select(SchemaMigration))}
+
+
+def upgrade(target: Optional[int] = None) -> List[dict]:
+    """执行所有未执行的迁移，返回本次执行的版本和耗时"""
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    done = []
+    is_sqlite = engine.dialect.name == "sqlite"
+    with engine.connect() as conn:
+        if not is_sqlite:
+            # 多个 worker 同时启动时只让一个执行迁移
+            conn.execute(text("SELECT GET_LOCK('mclauncher_migrations', 300)"))
+        try:
+            for migration in MIGRATIONS:
+                if target is not None and migration.version > target:
+                    break
+                if is_sqlite:
+                    # 先拿写锁再检查版本，避免两个进程重复执行同一个迁移
+                    conn.exec_driver_sql("BEGIN IMMEDIATE")
+                if migration.version in _applied(conn):
+                    conn.rollback()
+                    continue
+                start = time.perf_counter()
+                migration.fn(conn)
+                duration_ms = round((time.perf_counter() - start) * 1000, 2)
+                conn.execute(SchemaMigration.__table__.insert().values(
+                    version=migration.version, name=migration.name,
+                    applied_at=datetime.datetime.utcnow(), duration_ms=duration_ms,
+                ))
+                conn.commit()
+                logger.info("迁移 %03d %s 完成，耗时 %.2fms", migration.version, migration.name, duration_ms)
+                done.append({"version": migration.version, "name": migration.name, "duration_ms": duration_ms})
+        finally:
+            if not is_sqlite:
+                conn.execute(text("SELECT RELEASE_LOCK('mclauncher_migrations')"))
+                conn.commit()
+    return done
+
+
+def status() -> List[dict]:
+    SchemaMigration.__table__.create(bind=engine, checkfirst=True)
+    with engine.connect() as conn:
+        applied = _applied(conn)
+    return [
+        {
+            "version": m.version,
+            "name": m.name,
+            "applied_at": applied[m.version].applied_at.isoformat() if m.version in applied else None,
+            "duration_ms": applied[m.version].duration_ms if m.version in applied else None,
+        }
+        for m in MIGRATIONS
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="数据库迁移")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("status", help="列出各迁移版本及执行情况")
+    up = sub.add_parser("upgrade", help="执行未执行的迁移")
+    up.add_argument("--to", type=int, default=None, help="只执行到该版本")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "upgrade":
+        Base.metadata.create_all(bind=engine)
+        done = upgrade(args.to)
+        if not done:
+            print("没有需要执行的迁移")
+    else:
+        for row in status():
+            state = f"{row['applied_at']}  {row['duration_ms']}ms" if row["applied_at"] else "未执行"
+            print(f"{row['version']:03d} {row['name']:<24} {state}")
+
+
+if __name__ == "__main__":
+    main()
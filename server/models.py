@@ -1,5 +1,6 @@
 import datetime
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+import hashlib
+from sqlalchemy import Column, Integer, String, DateTime, Float, Double, Text, ForeignKey, Index, LargeBinary, BINARY
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -15,6 +16,11 @@ class User(Base):
 
     tokens = relationship("LoginToken", back_populates="user", cascade="all, delete-orphan")
 
+    __table_args__ = (
+        # 后台列表按 (created_at, id) 游标分页
+        Index("ix_users_created_id", "created_at", "id"),
+    )
+
 
 class MachineBinding(Base):
     """记录机器码绑定的账号数，一个机器码最多2个账号"""
@@ -30,19 +36,35 @@ class MachineBinding(Base):
     )
 
 
+def token_digest(token: str) -> bytes:
+    """Token 的 SHA-256 摘要（32 字节），只保存摘要不保存明文（登录 Token 和启动令牌共用）"""
+    return hashlib.sha256(token.encode("utf-8")).digest()
+
+
 class LoginToken(Base):
     """登录Token，用于服务端Mod校验"""
     __tablename__ = "login_tokens"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    token = Column(String(256), unique=True, nullable=False, index=True)
+    token_hash = Column(
+        LargeBinary(32).with_variant(BINARY(32), "mysql"),
+        unique=True, nullable=False, index=True,
+    )
     client_ip = Column(String(45), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
     expires_at = Column(DateTime, nullable=False)
 
     user = relationship("User", back_populates="tokens")
 
+    __table_args__ = (
+        Index("ix_login_tokens_expires_at", "expires_at"),
+        # verify-player: user_id = ? AND expires_at > ? ORDER BY created_at DESC LIMIT 1
+        # created_at 放在 expires_at 前面才能按索引顺序取最新一条，expires_at 在索引内过滤
+        Index("ix_login_tokens_user_created_expires", "user_id", "created_at", "expires_at"),
+        Index("ix_login_tokens_created_id", "created_at", "id"),
+    )
+
 
 class Announcement(Base):
     """公告"""
@@ -61,8 +83,101 @@ class AntiCheatLog(Base):
     __tablename__ = "anticheat_logs"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    username = Column(String(32), nullable=False, index=True)
+    username = Column(String(32), nullable=False)
     client_ip = Column(String(45), nullable=False)
     violation_count = Column(Integer, default=0)
     reason = Column(String(200), nullable=False)
     created_at = Column(DateTime, default=datetime.datetime.utcnow)
+
+    __table_args__ = (
+        Index("ix_anticheat_logs_created_id", "created_at", "id"),
+        # 按玩家查最近的违规记录；同时覆盖只按 username 过滤的查询
+        Index("ix_anticheat_logs_username_created", "username", "created_at"),
+    )
+
+
+class AntiCheatRollup(Base):
+    """按玩家按小时/天汇总的违规统计，写入违规记录时增量更新（见 anticheat_rollups.py）
+
+    原始记录归档后汇总仍然保留。ips 为去重后的 IP 列表，reasons 为 原因 -> 次数，均为 JSON 文本。
+    """
+    __tablename__ = "anticheat_rollups"
+
+    username = Column(String(32), primary_key=True)
+    period = Column(String(8), primary_key=True)  # hour / day
+    bucket = Column(DateTime, primary_key=True)
+    logs = Column(Integer, nullable=False, default=0)  # 记录行数
+    reports = Column(Integer, nullable=False, default=0)  # 上报次数（缓冲合并前）
+    violations = Column(Integer, nullable=False, default=0)
+    max_violation = Column(Integer, nullable=False, default=0)
+    ips = Column(Text, nullable=False, default="[]")
+    reasons = Column(Text, nullable=False, default="{}")
+
+    __table_args__ = (
+        # 按时间段查所有玩家的汇总
+        Index("ix_anticheat_rollups_period_bucket", "period", "bucket", "username"),
+    )
+
+
+class PlayerRisk(Base):
+    """玩家风险分（见 risk_scores.py），decay_key = ln(分数) + λ·t"""
+    __tablename__ = "player_risk"
+
+    username = Column(String(32), primary_key=True)
+    decay_key = Column(Double, nullable=False)
+    logs = Column(Integer, nullable=False, default=0)
+    last_report_at = Column(DateTime, nullable=False)
+
+    __table_args__ = (
+        # 风险排行按 decay_key 倒序取前 N 条
+        Index("ix_player_risk_decay_key", "decay_key"),
+    )
+
+
+class Counter(Base):
+    """后台统计计数器，由写路径增量维护（见 counters.py）"""
+    __tablename__ = "counters"
+
+    name = Column(String(32), primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class CounterBucket(Base):
+    """按小时累计的事件数，bucket 为该小时的起始时间（UTC）"""
+    __tablename__ = "counter_buckets"
+
+    name = Column(String(32), primary_key=True)
+    bucket = Column(DateTime, primary_key=True)
+    value = Column(Integer, nullable=False, default=0)
+
+
+class Rollout(Base):
+    """分批发布中的新版本（见 rollout.py），每个渠道一行，放量结束后保留最近一次的记录"""
+    __tablename__ = "rollouts"
+
+    channel = Column(String(16), primary_key=True)  # launcher / mods
+    version = Column(String(64), nullable=False)
+    payload = Column(Text(16 * 1024 * 1024), nullable=False)  # 新的 latest.yml / 清单 JSON
+    percent = Column(Float, nullable=False)
+    paused = Column(Integer, nullable=False, default=0)
+    started_at = Column(DateTime, nullable=False)
+    ramp_at = Column(DateTime, nullable=False)  # 上次推进放量比例的时间
+    completed_at = Column(DateTime, nullable=True)
+
+
+class SchemaMigration(Base):
+    """已执行的数据库迁移版本（见 migrations.py）"""
+    __tablename__ = "schema_migrations"
+
+    version = Column(Integer, primary_key=True, autoincrement=False)
+    name = Column(String(100), nullable=False)
+    applied_at = Column(DateTime, default=datetime.datetime.utcnow)
+    duration_ms = Column(Float, nullable=False)
+
+
+class ReplicaHeartbeat(Base):
+    """主库定期写入的心跳时间戳，用于计算只读副本的复制延迟"""
+    __tablename__ = "replica_heartbeat"
+
+    id = Column(Integer, primary_key=True)
+    ts = Column(Float, nullable=False)
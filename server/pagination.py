@@ -0,0 +1,82 @@
+"""后台列表的游标分页和总数缓存
+
+OFFSET 分页越往后越慢（数据库要先扫过前面所有行），这里改为按 (created_at, id)
+做 keyset 分页：游标记录上一页最后一行的排序键，下一页直接从索引上定位，
+翻到第几页耗时都一样。需要配合 (created_at, id) 复合索引。
+
+总数不再每页都 COUNT(*)，而是缓存一段时间（ADMIN_COUNT_TTL_SECONDS），
+列表页显示的总数允许有短暂误差。
+"""
+import base64
+import datetime
+import time
+from typing import Any, Dict, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from config import ADMIN_COUNT_TTL_SECONDS
+
+
+def encode_cursor(created_at: datetime.datetime, row_id: int) -> str:
+    raw = f"{created_at.isoformat()}|{row_id}".encode("ascii")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime.datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode("ascii")
+        created_at, row_id = raw.rsplit("|", 1)
+        return datetime.datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(400, "无效的分页游标")
+
+
+async def keyset_page(db: AsyncSession, query, model, cursor: Optional[str], size: int, options=()):
+    """按 created_at DESC, id DESC 取一页，返回 (行列表, 下一页游标或 None)"""
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        # 等价于 (created_at, id) < (游标)，先用 created_at <= 游标给出索引范围，
+        # 写成 a < x OR (a = x AND id < y) 时 SQLite 会退化为整个索引扫描
+        query = query.where(and_(
+            model.created_at <= created_at,
+            or_(model.created_at < created_at, model.id < row_id),
+        ))
+    # 多取一行用来判断是否还有下一页
+    rows = (await db.scalars(
+        query.options(*options).order_by(model.created_at.desc(), model.id.desc()).limit(size + 1)
+    )).all()
+    if len(rows) <= size:
+        return rows, None
+    rows = rows[:size]
+    return rows, encode_cursor(rows[-1].created_at, rows[-1].id)
+
+
+class CountCache:
+    """按 key 缓存 COUNT(*) 结果，过期后下次请求时重新统计"""
+
+    MAX_KEYS = 256  # 搜索词组合很多，超过上限时清空重来
+
+    def __init__(self, ttl: float = ADMIN_COUNT_TTL_SECONDS):
+        self.ttl = ttl
+        self._values: Dict[Any, Tuple[int, float]] = {}
+
+    async def get(self, db: AsyncSession, key: Any, query) -> int:
+        now = time.monotonic()
+        cached = self._values.get(key)
+        if cached and now - cached[1] < self.ttl:
+            return cached[0]
+        total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery()))
+        if len(self._values) >= self.MAX_KEYS:
+            self._values.clear()
+        self._values[key] = (total, now)
+        return total
+
+    def invalidate(self, prefix: str):
+        """写操作后让对应列表的总数失效"""
+        for key in [k for k in self._values if k[0] == prefix]:
+            del self._values[key]
+
+
+count_cache = CountCache()
@@ -0,0 +1,137 @@
+"""热点查询的执行计划检查
+
+对登录、校验、后台列表等热点查询执行 EXPLAIN，断言都用上了索引：
+- SQLite: 不允许不带索引的 `SCAN <表>`，不允许 `USE TEMP B-TREE`（临时排序/分组）
+- MySQL: 不允许 type=ALL（全表扫描），不允许 Using filesort / Using temporary
+
+查询和路由里的写法保持一致，改了路由里的查询或 models.py 的索引后运行一次：
+  cd server && python query_plans.py          # 检查当前 DATABASE_URL
+  cd server && python query_plans.py --fresh  # 在临时 SQLite 库上建表、迁移后检查
+有不合格的查询时退出码为 1，可以直接放进 CI。
+"""
+import argparse
+import datetime
+import os
+import re
+import sys
+import tempfile
+from typing import Callable, Dict, List
+
+from sqlalchemy import and_, func, or_, select
+from sqlalchemy.engine import Connection, Engine
+
+NOW = datetime.datetime(2026, 1, 1)
+
+
+def hot_queries() -> Dict[str, Callable]:
+    from models import User, MachineBinding, LoginToken, AntiCheatLog, AntiCheatRollup, PlayerRisk, Counter
+
+    def keyset(model, q):
+        return q.where(and_(
+            model.created_at <= NOW, or_(model.created_at < NOW, model.id < 100),
+        )).order_by(model.created_at.desc(), model.id.desc()).limit(21)
+
+    return {
+        "login: 按用户名查用户": select(User).where(User.username == "alice"),
+        "register: 机器码绑定数": select(func.count(MachineBinding.id)).where(MachineBinding.machine_id == "m1"),
+        "verify: token_hash 联表用户": (
+            select(LoginToken.client_ip, LoginToken.expires_at, User.username)
+            .join(User, User.id == LoginToken.user_id)
+            .where(LoginToken.token_hash == b"x" * 32)
+        ),
+        "verify-player: 最新有效 Token": (
+            select(LoginToken).where(LoginToken.user_id == 1, LoginToken.expires_at > NOW)
+            .order_by(LoginToken.created_at.desc()).limit(1)
+        ),
+        "reaper: 过期 Token": select(LoginToken.id).where(LoginToken.expires_at < NOW).limit(500),
+        "admin: 用户列表游标页": keyset(User, select(User)),
+        "admin: Token 列表游标页": keyset(LoginToken, select(LoginToken).where(LoginToken.expires_at > NOW)),
+        "admin: 违规列表游标页": keyset(AntiCheatLog, select(AntiCheatLog)),
+        "admin: 机器码分组页": (
+            select(MachineBinding.machine_id, func.group_concat(MachineBinding.username))
+            .where(MachineBinding.machine_id > "m").group_by(MachineBinding.machine_id)
+            .order_by(MachineBinding.machine_id).limit(51)
+        ),
+        "anticheat: 按玩家查日志": (
+            select(AntiCheatLog).where(AntiCheatLog.username == "alice")
+            .order_by(AntiCheatLog.created_at.desc(), AntiCheatLog.id.desc()).limit(50)
+        ),
+        "archive: 最早的违规记录": select(func.min(AntiCheatLog.created_at)),
+        "rollups: 玩家按天汇总": (
+            select(AntiCheatRollup).where(AntiCheatRollup.username == "alice", AntiCheatRollup.period == "day")
+            .order_by(AntiCheatRollup.bucket.desc(), AntiCheatRollup.username.desc()).limit(200)
+        ),
+        "rollups: 全部玩家按小时汇总": (
+            select(AntiCheatRollup).where(AntiCheatRollup.period == "hour", AntiCheatRollup.bucket >= NOW)
+            .order_by(AntiCheatRollup.bucket.desc(), AntiCheatRollup.username.desc()).limit(200)
+        ),
+        "risk: 风险排行": select(PlayerRisk).order_by(PlayerRisk.decay_key.desc()).limit(20),
+        "stats: 计数器": select(Counter.name, Counter.value),
+        "stats: 未清理的过期 Token 数": select(func.count(LoginToken.id)).where(LoginToken.expires_at <= NOW),
+    }
+
+
+# 只有几行的表，整表扫描是预期行为
+SMALL_TABLES = {"counters"}
+
+
+def _sqlite_problems(rows) -> List[str]:
+    problems = []
+    for row in rows:
+        detail = row[-1]
+        scan = re.fullmatch(r"SCAN (\w+)", detail)
+        if (scan and scan.group(1) not in SMALL_TABLES) or "TEMP B-TREE" in detail:
+            problems.append(detail)
+    return problems
+
+
+def _mysql_problems(rows) -> List[str]:
+    problems = []
+    for row in rows:
+        plan = dict(row._mapping)
+        extra = plan.get("Extra") or ""
+        if plan.get("table") in SMALL_TABLES:
+            continue
+        if plan.get("type") == "ALL" or "filesort" in extra or "temporary" in extra:
+            problems.append(f"{plan.get('table')}: type={plan.get('type')} key={plan.get('key')} {extra}")
+    return problems
+
+
+def explain(conn: Connection, statement) -> tuple:
+    """返回 (执行计划文本, 问题列表)"""
+    sql = str(statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True}))
+    if conn.dialect.name == "sqlite":
+        rows = conn.exec_driver_sql("EXPLAIN QUERY PLAN " + sql).fetchall()
+        return "; ".join(r[-1] for r in rows), _sqlite_problems(rows)
+    rows = conn.exec_driver_sql("EXPLAIN " + sql).fetchall()
+    plan = "; ".join(f"{r._mapping.get('table')}:{r._mapping.get('type')}:{r._mapping.get('key')}" for r in rows)
+    return plan, _mysql_problems(rows)
+
+
+def check(engine: Engine) -> bool:
+    ok = True
+    with engine.connect() as conn:
+        for name, statement in hot_queries().items():
+            plan, problems = explain(conn, statement)
+            mark = "OK  " if not problems else "FAIL"
+            ok = ok and not problems
+            print(f"{mark} {name}\n     {plan}")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="检查热点查询的执行计划")
+    parser.add_argument("--fresh", action="store_true", help="在临时 SQLite 库上建表并迁移后检查")
+    args = parser.parse_args()
+    if args.fresh:
+        os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/plans.db"
+        os.environ.setdefault("ENV", "development")
+
+    from database import init_db, engine
+    if args.fresh:
+        init_db()
+    sys.exit(0 if check(engine) else 1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,288 @@
+"""启动器版本发布
+
+python releases.py publish <exe> --version X.Y.Z 把新版本放进 UPDATES_DIR：
+- 复制 exe 为 CubeRecall-<版本>.exe，同时计算 sha512、大小和 blockmap，临时文件 fsync 后原子改名
+- blockmap（<exe>.blockmap，gzip 压缩的 JSON，格式同 electron-builder）按内容定义分块（FastCDC 式 gear 滚动哈希，
+  块大小 MIN_CHUNK ~ MAX_CHUNK，平均约 AVG_CHUNK）：块边界只由附近的内容决定，
+  exe 中间插入或删除内容只影响附近的块，其余块与旧版本的块完全相同
+- 最后更新 latest.yml，启动器看到新版本时 exe 和 blockmap 都已就位；
+  开启分批发布时 latest.yml 先保持旧版本，新版本按机器码逐步放量（见 rollout.py）
+- exe 只保留最近 RELEASE_KEEP_VERSIONS 个版本（分批发布期间 latest.yml 指向的版本另外保留），
+  blockmap 全部保留（旧版本启动器更新时要用）
+
+启动器用自己当前版本的 blockmap 和新版本的 blockmap 比较，相同的块从本地 exe 复制，
+其余的块通过 /updates 的 Range 请求下载，拼好后校验 sha512，失败时回退为完整下载。
+"""
+import argparse
+import base64
+import datetime
+import gzip
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import BinaryIO, Dict, List, Optional, Tuple
+
+import rollout
+from config import UPDATES_DIR, RELEASE_KEEP_VERSIONS
+
+logger = logging.getLogger("releases")
+
+EXE_PREFIX = "CubeRecall-"
+BLOCKMAP_SUFFIX = ".blockmap"
+VERSION_PATTERN = re.compile(r"^\d+\.\d+\.\d+(?:-[0-9A-Za-z.]+)?$")
+
+MIN_CHUNK = 16 * 1024
+AVG_CHUNK = 64 * 1024
+MAX_CHUNK = 256 * 1024
+# 达到平均大小之前用更严格的掩码（18 位），之后用更宽松的（14 位），块大小集中在平均值附近
+_MASK_STRICT = ((1 << 18) - 1) << 14
+_MASK_LOOSE = ((1 << 14) - 1) << 18
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:4], "big") for i in range(256)]
+
+_READ_SIZE = 4 * 1024 * 1024
+
+# 同一进程里的发布串行执行（latest.yml 和清理旧版本都依赖上一次发布的结果）
+_publish_lock = threading.Lock()
+
+
+def _cut(buf: bytes, start: int, end: int) -> int:
+    """返回从 start 开始的下一个块边界"""
+    if end - start <= MIN_CHUNK:
+        return end
+    normal = start + min(AVG_CHUNK, end - start)
+    limit = start + min(MAX_CHUNK, end - start)
+    gear = _GEAR
+    h = 0
+    i = start + MIN_CHUNK
+    for b in buf[i:normal]:
+        h = ((h << 1) + gear[b]) & 0xFFFFFFFF
+        i += 1
+        if not h & _MASK_STRICT:
+            return i
+    for b in buf[normal:limit]:
+        h = ((h << 1) + gear[b]) & 0xFFFFFFFF
+        i += 1
+        if not h & _MASK_LOOSE:
+            return i
+    return limit
+
+
+def _checksum(chunk: bytes) -> str:
+    return base64.b64encode(hashlib.blake2b(chunk, digest_size=18).digest()).decode("ascii")
+
+
+def copy_and_chunk(src: BinaryIO, dst: Optional[BinaryIO] = None) -> Tuple[dict, str, int]:
+    """读一遍 src（可同时写入 dst），返回 (blockmap, base64 sha512, 大小)"""
+    sha512 = hashlib.sha512()
+    checksums: List[str] = []
+    sizes: List[int] = []
+    buf = b""
+    size = 0
+    eof = False
+    while not eof:
+        block = src.read(_READ_SIZE)
+        eof = not block
+        if block:
+            sha512.update(block)
+            if dst is not None:
+                dst.write(block)
+            size += len(block)
+            buf += block
+        pos = 0
+        # 未读完时保留不足 MAX_CHUNK 的尾部，等下一次读入后再切，保证边界与读取大小无关
+        while len(buf) - pos >= (1 if eof else MAX_CHUNK):
+            cut = _cut(buf, pos, len(buf))
+            checksums.append(_checksum(buf[pos:cut]))
+            sizes.append(cut - pos)
+            pos = cut
+        buf = buf[pos:]
+    blockmap = {"version": "2", "files": [{"name": "file", "offset": 0, "checksums": checksums, "sizes": sizes}]}
+    return blockmap, base64.b64encode(sha512.digest()).decode("ascii"), size
+
+
+def exe_name(version: str) -> str:
+    return f"{EXE_PREFIX}{version}.exe"
+
+
+def _version_key(version: str) -> tuple:
+    core, _, pre = version.partition("-")
+    # 正式版排在同号的预发布版之后
+    return tuple(int(p) for p in core.split(".")) + ((1, "") if not pre else (0, pre),)
+
+
+def _atomic_write(path: str, data: bytes):
+    tmp = path + ".tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def read_blockmap(version: str) -> Optional[dict]:
+    path = os.path.join(UPDATES_DIR, exe_name(version) + BLOCKMAP_SUFFIX)
+    if not os.path.isfile(path):
+        return None
+    with gzip.open(path, "rb") as f:
+        return json.load(f)
+
+
+def diff(old: dict, new: dict) -> Dict[str, int]:
+    """按 blockmap 计算从旧版本更新到新版本需要下载的字节数（与启动器的算法一致）"""
+    old_file, new_file = old["files"][0], new["files"][0]
+    have = set(zip(old_file["checksums"], old_file["sizes"]))
+    reused = download = 0
+    for checksum, size in zip(new_file["checksums"], new_file["sizes"]):
+        if (checksum, size) in have:
+            reused += size
+        else:
+            download += size
+    return {"reused_bytes": reused, "download_bytes": download}
+
+
+def latest_yml(version: str, sha512: str, size: int, blockmap_size: int, release_date: str) -> str:
+    name = exe_name(version)
+    return (
+        f"version: {version}\n"
+        f"files:\n"
+        f"  - url: {name}\n"
+        f"    sha512: {sha512}\n"
+        f"    size: {size}\n"
+        f"    blockMapSize: {blockmap_size}\n"
+        f"path: {name}\n"
+        f"sha512: {sha512}\n"
+        f"releaseDate: '{release_date}'\n"
+    )
+
+
+def read_latest_version() -> Optional[str]:
+    path = os.path.join(UPDATES_DIR, "latest.yml")
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.startswith("version:"):
+                return line.split(":", 1)[1].strip().strip("'\"")
+    return None
+
+
+def list_releases() -> List[dict]:
+    """UPDATES_DIR 里的各版本（按版本倒序），有 blockmap 但 exe 已清理的版本也列出"""
+    versions = set()
+    for filename in os.listdir(UPDATES_DIR) if os.path.isdir(UPDATES_DIR) else []:
+        match = re.fullmatch(re.escape(EXE_PREFIX) + r"(.+)\.exe(?:" + re.escape(BLOCKMAP_SUFFIX) + ")?", filename)
+        if match and VERSION_PATTERN.match(match.group(1)):
+            versions.add(match.group(1))
+    latest = read_latest_version()
+    releases = []
+    for version in sorted(versions, key=_version_key, reverse=True):
+        exe_path = os.path.join(UPDATES_DIR, exe_name(version))
+        releases.append({
+            "version": version,
+            "latest": version == latest,
+            "size": os.path.getsize(exe_path) if os.path.isfile(exe_path) else None,
+            "blockmap": os.path.isfile(exe_path + BLOCKMAP_SUFFIX),
+        })
+    return releases
+
+
+def _prune(keep: int, current: str):
+    """只保留最近 keep 个版本的 exe
+
+    刚发布的版本和磁盘上 latest.yml 指向的版本总是保留：分批发布期间放量范围外的机器还在下载后者
+    """
+    pinned = {v for v in (current, read_latest_version()) if v}
+    with_exe = [r["version"] for r in list_releases() if r["size"] is not None and r["version"] not in pinned]
+    for version in with_exe[max(keep - len(pinned), 0):]:
+        os.remove(os.path.join(UPDATES_DIR, exe_name(version)))
+        logger.info("已清理旧版本 exe: %s", version)
+
+
+def publish(src: BinaryIO, version: str, release_date: Optional[datetime.datetime] = None) -> dict:
+    """发布新版本（src 为已打开的 exe），返回版本信息和相对上一个版本的差分大小"""
+    if not VERSION_PATTERN.match(version):
+        raise ValueError(f"版本号格式不正确: {version}")
+    with _publish_lock:
+        return _publish(src, version, release_date)
+
+
+def _publish(src: BinaryIO, version: str, release_date: Optional[datetime.datetime]) -> dict:
+    os.makedirs(UPDATES_DIR, exist_ok=True)
+    previous = read_latest_version()
+    exe_path = os.path.join(UPDATES_DIR, exe_name(version))
+
+    tmp = exe_path + ".tmp"
+    with open(tmp, "wb") as dst:
+        blockmap, sha512, size = copy_and_chunk(src, dst)
+        dst.flush()
+        os.fsync(dst.fileno())
+    os.replace(tmp, exe_path)
+
+    blockmap_data = gzip.compress(json.dumps(blockmap, separators=(",", ":")).encode("utf-8"), mtime=0)
+    _atomic_write(exe_path + BLOCKMAP_SUFFIX, blockmap_data)
+
+    released = (release_date or datetime.datetime.utcnow()).strftime("%Y-%m-%dT%H:%M:%S.%f")[:-3] + "Z"
+    rolling = rollout.start("launcher", version, latest_yml(version, sha512, size, len(blockmap_data), released))
+    if rolling:
+        # 进入分批发布前可能先完成了上一次未放量完的版本，latest.yml 里的才是其余机器所在的版本
+        previous = read_latest_version()
+    _prune(RELEASE_KEEP_VERSIONS, version)
+
+    result = {
+        "version": version,
+        "path": exe_name(version),
+        "sha512": sha512,
+        "size": size,
+        "blocks": len(blockmap["files"][0]["sizes"]),
+        "blockmap_size": len(blockmap_data),
+        "release_date": released,
+        "previous": previous,
+        "rollout": rolling,
+    }
+    old = read_blockmap(previous) if previous and previous != version else None
+    if old is not None:
+        result.update(diff(old, blockmap))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="启动器版本发布")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="发布新版本 exe 并更新 latest.yml")
+    pub.add_argument("exe", help="构建出的 portable exe")
+    pub.add_argument("--version", required=True, help="版本号，如 1.0.2")
+    sub.add_parser("list", help="列出已发布的版本")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    if args.command == "publish":
+        # 开启写队列时数据库写操作由写线程执行，命令行进程里也要启动
+        from database import write_queue
+        if write_queue is not None:
+            write_queue.start()
+        try:
+            with open(args.exe, "rb") as src:
+                result = publish(src, args.version)
+        finally:
+            if write_queue is not None:
+                write_queue.stop()
+        print(f"已发布 {result['path']}  {result['size']} 字节  {result['blocks']} 块")
+        print(f"sha512: {result['sha512']}")
+        if "download_bytes" in result:
+            print(
+                f"从 {result['previous']} 更新需下载 {result['download_bytes']} 字节"
+                f"（复用 {result['reused_bytes']} 字节）"
+            )
+        if result["rollout"]:
+            print("latest.yml 暂时保持旧版本，新版本正在按机器码分批放量（见 /admin/api/rollouts）")
+    else:
+        for release in list_releases():
+            size = f"{release['size']} 字节" if release["size"] is not None else "exe 已清理"
+            print(f"{release['version']:<16} {size:<20} {'latest' if release['latest'] else ''}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""登录 Token 本地校验用的内存吊销表
+
+TOKEN_VERIFY_MODE=jwt 时，/auth/verify 只校验 JWT 签名和声明，不再查数据库，
+数据库里「Token 已被删除」这一语义由这里的内存结构补齐：
+- 启动时快照：启动前签发、当时仍有效的 Token 摘要。启动前签发的 Token 必须在快照中
+  （快照外的说明已被新登录顶替或用户已删除）
+- 吊销表：本进程运行期间被新登录顶替、或随用户删除的 Token 摘要
+- IP 覆盖：快照时数据库中的 client_ip，以及运行期间 create-launch-token 更新过的 client_ip
+
+写路径在事务里用 revoke_on_commit() 登记要吊销的 Token，事务提交后才写入吊销表（与 events.emit 相同），
+回滚的事务不会吊销数据库里仍然有效的 Token。
+
+JWT 的 iat 是整秒，快照时间也取整到秒：快照那一秒内签发的 Token 一律按启动后签发处理，
+不会因为不在快照里被误判为已吊销。
+
+所有条目都带过期时间，compact() 会清掉已过期的条目，内存占用只和有效 Token 数相关。
+只在单 worker 部署下与数据库语义一致。
+"""
+import datetime
+import math
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import LoginToken
+from config import TOKEN_VERIFY_MODE
+
+
+def _timestamp(dt: datetime.datetime) -> float:
+    return dt.replace(tzinfo=datetime.timezone.utc).timestamp()
+
+
+class RevocationSet:
+    def __init__(self, enabled: bool):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._loaded_at: Optional[int] = None
+        self._preboot: Dict[bytes, float] = {}
+        self._revoked: Dict[bytes, float] = {}
+        self._ip_overrides: Dict[bytes, Tuple[str, float]] = {}
+
+    def load(self, db):
+        """从数据库快照当前有效的 Token，应在开始处理请求前调用"""
+        now = datetime.datetime.utcnow()
+        rows = db.query(LoginToken.token_hash, LoginToken.client_ip, LoginToken.expires_at).filter(
+            LoginToken.expires_at > now
+        ).all()
+        with self._lock:
+            self._loaded_at = math.floor(time.time())
+            self._preboot = {r.token_hash: _timestamp(r.expires_at) for r in rows}
+            self._revoked.clear()
+            self._ip_overrides = {r.token_hash: (r.client_ip, _timestamp(r.expires_at)) for r in rows}
+
+    def revoke(self, digest: bytes, expires_at: datetime.datetime):
+        with self._lock:
+            self._preboot.pop(digest, None)
+            self._ip_overrides.pop(digest, None)
+            self._revoked[digest] = _timestamp(expires_at)
+
+    def set_ip(self, digest: bytes, client_ip: str, expires_at: datetime.datetime):
+        with self._lock:
+            self._ip_overrides[digest] = (client_ip, _timestamp(expires_at))
+
+    def is_revoked(self, digest: bytes, issued_at: Optional[float]) -> bool:
+        with self._lock:
+            if digest in self._revoked:
+                return True
+            if issued_at is None or self._loaded_at is None or issued_at < self._loaded_at:
+                return digest not in self._preboot
+            return False
+
+    def client_ip(self, digest: bytes, default: str) -> str:
+        entry = self._ip_overrides.get(digest)
+        return entry[0] if entry else default
+
+    def compact(self) -> int:
+        """清理已过期的条目，返回清理数量"""
+        now = time.time()
+        removed = 0
+        with self._lock:
+            for table in (self._preboot, self._revoked):
+                expired = [k for k, exp in table.items() if exp <= now]
+                for k in expired:
+                    del table[k]
+                removed += len(expired)
+            expired = [k for k, (_, exp) in self._ip_overrides.items() if exp <= now]
+            for k in expired:
+                del self._ip_overrides[k]
+            removed += len(expired)
+        return removed
+
+
+revocation_set = RevocationSet(enabled=TOKEN_VERIFY_MODE == "jwt")
+
+
+def revoke_on_commit(s: Session, digest: bytes, expires_at: datetime.datetime):
+    """在当前写事务里登记吊销，提交后生效"""
+    s.info.setdefault("pending_revocations", []).append((digest, expires_at))
+
+
+@event.listens_for(Session, "after_commit")
+def _after_commit(s: Session):
+    pending: List[Tuple[bytes, datetime.datetime]] = s.info.pop("pending_revocations", [])
+    for digest, expires_at in pending:
+        revocation_set.revoke(digest, expires_at)
+
+
+@event.listens_for(Session, "after_rollback")
+def _after_rollback(s: Session):
+    s.info.pop("pending_revocations", None)
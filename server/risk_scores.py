@@ -0,0 +1,122 @@
+"""玩家风险分
+
+每条违规记录按原因加权计入玩家的风险分，风险分随时间指数衰减（半衰期 RISK_HALF_LIFE_HOURS）。
+表里不存当前分数，而是存 decay_key = ln(分数) + λ·t（t 为距 EPOCH 的秒数，λ = ln2 / 半衰期）：
+- 当前分数 = exp(decay_key − λ·now)，所有玩家同时衰减，相对大小不变，
+  因此排行榜直接按 decay_key 索引倒序取前 N 条，不需要重算
+- 新增一条权重 w 的记录：decay_key = logaddexp(decay_key, ln(w) + λ·t)，每条 O(1)
+
+缓冲合并后的一行按一条计分，卡顿误报产生的大量重复上报不会把分数刷高。
+"""
+import datetime
+import json
+import math
+from typing import Dict, List, Optional
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from models import AntiCheatRollup, PlayerRisk
+from config import RISK_HALF_LIFE_HOURS, RISK_REASON_WEIGHTS, RISK_DEFAULT_WEIGHT
+
+EPOCH = datetime.datetime(2020, 1, 1)
+DECAY_RATE = math.log(2) / (RISK_HALF_LIFE_HOURS * 3600)
+
+
+def _t(ts: datetime.datetime) -> float:
+    return (ts - EPOCH).total_seconds()
+
+
+def _logaddexp(a: float, b: float) -> float:
+    high, low = max(a, b), min(a, b)
+    return high + math.log1p(math.exp(low - high))
+
+
+def weight(reason: str) -> float:
+    return RISK_REASON_WEIGHTS.get(reason, RISK_DEFAULT_WEIGHT)
+
+
+def score_at(decay_key: float, now: Optional[datetime.datetime] = None) -> float:
+    return math.exp(decay_key - DECAY_RATE * _t(now or datetime.datetime.utcnow()))
+
+
+def apply_risk(s: Session, rows: List[dict]):
+    """在当前写事务里把一批新记录计入风险分，rows 的字段同 anticheat_buffer.insert_reports"""
+    keys: Dict[str, float] = {}
+    latest: Dict[str, datetime.datetime] = {}
+    counts: Dict[str, int] = {}
+    for row in rows:
+        w = weight(row["reason"])
+        if w <= 0:
+            continue
+        username, created_at = row["username"], row["created_at"]
+        key = math.log(w) + DECAY_RATE * _t(created_at)
+        keys[username] = _logaddexp(keys[username], key) if username in keys else key
+        latest[username] = max(latest.get(username, created_at), created_at)
+        counts[username] = counts.get(username, 0) + 1
+    if not keys:
+        return
+
+    existing = {
+        risk.username: risk
+        for risk in s.scalars(select(PlayerRisk).where(PlayerRisk.username.in_(list(keys))).with_for_update())
+    }
+    for username, key in keys.items():
+        risk = existing.get(username)
+        if risk is None:
+            s.add(PlayerRisk(username=username, decay_key=key, logs=counts[username], last_report_at=latest[username]))
+        else:
+            risk.decay_key = _logaddexp(risk.decay_key, key)
+            risk.logs += counts[username]
+            risk.last_report_at = max(risk.last_report_at, latest[username])
+    s.flush()
+
+
+def backfill_from_rollups(s: Session):
+    """从按小时汇总（含已归档的记录）重建全部风险分，每个小时桶的记录按桶起始时间计"""
+    keys: Dict[str, float] = {}
+    logs: Dict[str, int] = {}
+    latest: Dict[str, datetime.datetime] = {}
+    rollups = s.execute(
+        select(AntiCheatRollup.username, AntiCheatRollup.bucket, AntiCheatRollup.reasons)
+        .where(AntiCheatRollup.period == "hour")
+    )
+    for username, bucket, reasons in rollups:
+        for reason, count in json.loads(reasons).items():
+            w = weight(reason) * count
+            if w <= 0:
+                continue
+            key = math.log(w) + DECAY_RATE * _t(bucket)
+            keys[username] = _logaddexp(keys[username], key) if username in keys else key
+            logs[username] = logs.get(username, 0) + count
+            latest[username] = max(latest.get(username, bucket), bucket)
+    s.execute(delete(PlayerRisk))
+    s.add_all(
+        PlayerRisk(username=username, decay_key=key, logs=logs[username], last_report_at=latest[username])
+        for username, key in keys.items()
+    )
+    s.flush()
+
+
+def risk_to_dict(risk: PlayerRisk, now: datetime.datetime) -> dict:
+    return {
+        "username": risk.username,
+        "score": round(score_at(risk.decay_key, now), 3),
+        "logs": risk.logs,
+        "last_report_at": risk.last_report_at.isoformat(),
+    }
+
+
+async def top_risks(db: AsyncSession, limit: int) -> List[dict]:
+    now = datetime.datetime.utcnow()
+    risks = (await db.scalars(select(PlayerRisk).order_by(PlayerRisk.decay_key.desc()).limit(limit))).all()
+    return [risk_to_dict(risk, now) for risk in risks]
+
+
+async def player_risk(db: AsyncSession, username: str) -> dict:
+    """单个玩家的当前风险分，没有违规记录时为 0"""
+    risk = await db.get(PlayerRisk, username)
+    if risk is None:
+        return {"username": username, "score": 0.0, "logs": 0, "last_report_at": None}
+    return risk_to_dict(risk, datetime.datetime.utcnow())
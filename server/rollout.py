@@ -0,0 +1,275 @@
+"""分批发布（灰度放量）
+
+发布启动器新版本（releases.py）或刷新 mods 清单（/mods/refresh）时，新内容先存进 rollouts 表，
+latest.yml / 清单文件保持旧版本，按机器码逐步放量：
+- 每台机器按 sha256(渠道:版本:机器码) 落在 0~9999 的一个桶里，桶号小于 percent×100 的机器拿到新内容；
+  同一次发布里桶号固定、比例只增不减，已拿到新版本的机器不会退回旧版本
+- 比例从 ROLLOUT_INITIAL_PERCENT 开始，在 ROLLOUT_RAMP_MINUTES 内线性增长到 100，
+  到 100 后把新内容写入 latest.yml / 清单文件，这次发布结束
+- 进行中的下载数（downloads）达到 ROLLOUT_MAX_CONCURRENT_DOWNLOADS 时暂停放量，暂停的时间不计入爬坡；
+  后台也可以手动暂停或直接放量到 100%
+- 请求没有带 X-Machine-Id（旧版本启动器）时按客户端 IP 分桶
+
+rollout_loop 每 ROLLOUT_TICK_SECONDS 推进一次比例并刷新本进程的缓存，请求路径只读缓存，
+发布后缓存刷新之前所有机器仍拿到旧版本。下载数按进程统计，多 worker 时任一 worker 饱和都会让放量停下。
+"""
+import asyncio
+import datetime
+import hashlib
+import logging
+import os
+import re
+from typing import Dict, List, NamedTuple, Optional
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from starlette.requests import Request
+from starlette.responses import Response
+
+from database import SessionLocal, run_write
+from models import Rollout
+from static_assets import Asset, REVALIDATE
+from config import (
+    UPDATES_DIR, MODS_MANIFEST, ROLLOUT_RAMP_MINUTES, ROLLOUT_INITIAL_PERCENT, ROLLOUT_MAX_CONCURRENT_DOWNLOADS,
+)
+
+logger = logging.getLogger("rollout")
+
+# 渠道 -> (放量结束后写入的文件, 响应类型)
+CHANNELS = {
+    "launcher": (os.path.join(UPDATES_DIR, "latest.yml"), "text/yaml"),
+    "mods": (MODS_MANIFEST, "application/json"),
+}
+
+BUCKETS = 10000
+VARY = "Accept-Encoding, X-Machine-Id"
+
+
+def bucket(channel: str, version: str, identity: str) -> int:
+    digest = hashlib.sha256(f"{channel}:{version}:{identity}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:4], "big") % BUCKETS
+
+
+def _write_file(path: str, payload: str):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp, path)
+
+
+def _read_file(path: str) -> Optional[str]:
+    if not os.path.isfile(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def _finish(rollout: Rollout, now: datetime.datetime):
+    _write_file(CHANNELS[rollout.channel][0], rollout.payload)
+    rollout.percent = 100.0
+    rollout.completed_at = now
+    logger.info("%s %s 已全部放量", rollout.channel, rollout.version)
+
+
+def _start(s: Session, channel: str, version: str, payload: str) -> bool:
+    now = datetime.datetime.utcnow()
+    path = CHANNELS[channel][0]
+    rollout = s.get(Rollout, channel, with_for_update=True)
+    active = rollout is not None and rollout.completed_at is None
+    if active and rollout.payload == payload:
+        return True
+    # 上一次发布还在放量时先直接完成，新的发布总是以完整的上一个版本为基准
+    if active:
+        _finish(rollout, now)
+    stable = _read_file(path)
+    if stable == payload:
+        return False
+    if stable is None or ROLLOUT_RAMP_MINUTES <= 0:
+        _write_file(path, payload)
+        return False
+    if rollout is None:
+        rollout = Rollout(channel=channel)
+        s.add(rollout)
+    rollout.version = version
+    rollout.payload = payload
+    rollout.percent = ROLLOUT_INITIAL_PERCENT
+    rollout.paused = 0
+    rollout.started_at = rollout.ramp_at = now
+    rollout.completed_at = None
+    s.flush()
+    return True
+
+
+def start(channel: str, version: str, payload: str) -> bool:
+    """发布新内容，返回是否进入分批放量（False 表示已直接写入文件或内容没有变化）"""
+    db = SessionLocal()
+    try:
+        return run_write(db, lambda s: _start(s, channel, version, payload))
+    finally:
+        db.close()
+
+
+def advance(s: Session, saturated: bool) -> List[str]:
+    """按距上次推进的时间增加放量比例，返回本次完成的渠道"""
+    now = datetime.datetime.utcnow()
+    rate = (100.0 - ROLLOUT_INITIAL_PERCENT) / (ROLLOUT_RAMP_MINUTES * 60) if ROLLOUT_RAMP_MINUTES > 0 else None
+    finished = []
+    for rollout in s.scalars(select(Rollout).where(Rollout.completed_at.is_(None)).with_for_update()):
+        if rollout.paused or saturated:
+            rollout.ramp_at = now
+            continue
+        elapsed = max((now - rollout.ramp_at).total_seconds(), 0.0)
+        rollout.percent = 100.0 if rate is None else min(rollout.percent + elapsed * rate, 100.0)
+        rollout.ramp_at = now
+        if rollout.percent >= 100.0:
+            _finish(rollout, now)
+            finished.append(rollout.channel)
+    s.flush()
+    return finished
+
+
+def set_paused(s: Session, channel: str, paused: bool) -> bool:
+    rollout = s.get(Rollout, channel, with_for_update=True)
+    if rollout is None or rollout.completed_at is not None:
+        return False
+    rollout.paused = 1 if paused else 0
+    # 恢复时从现在开始计时，暂停期间不计入爬坡
+    rollout.ramp_at = datetime.datetime.utcnow()
+    return True
+
+
+def complete(s: Session, channel: str) -> bool:
+    """立即放量到 100% 并写入文件"""
+    rollout = s.get(Rollout, channel, with_for_update=True)
+    if rollout is None or rollout.completed_at is not None:
+        return False
+    _finish(rollout, datetime.datetime.utcnow())
+    return True
+
+
+def rollout_to_dict(rollout: Rollout) -> dict:
+    return {
+        "channel": rollout.channel,
+        "version": rollout.version,
+        "percent": round(rollout.percent, 2),
+        "paused": bool(rollout.paused),
+        "started_at": rollout.started_at.isoformat(),
+        "completed_at": rollout.completed_at.isoformat() if rollout.completed_at else None,
+    }
+
+
+# ========== 请求路径 ==========
+
+class _State(NamedTuple):
+    version: str
+    started_at: datetime.datetime
+    percent: float
+    asset: Asset
+
+
+_states: Dict[str, _State] = {}
+
+
+def reload():
+    """从数据库刷新本进程的放量状态，新内容的压缩版本只在发布变化时重建"""
+    db = SessionLocal()
+    try:
+        rollouts = db.scalars(select(Rollout).where(Rollout.completed_at.is_(None))).all()
+        states = {}
+        for rollout in rollouts:
+            old = _states.get(rollout.channel)
+            if old is not None and (old.version, old.started_at) == (rollout.version, rollout.started_at):
+                asset = old.asset
+            else:
+                asset = Asset(rollout.payload.encode("utf-8"), CHANNELS[rollout.channel][1])
+            states[rollout.channel] = _State(rollout.version, rollout.started_at, rollout.percent, asset)
+    finally:
+        db.close()
+    _states.clear()
+    _states.update(states)
+
+
+def identity(request: Request) -> str:
+    machine_id = request.headers.get("x-machine-id", "").strip()
+    if machine_id:
+        return machine_id
+    return request.client.host if request.client else ""
+
+
+def selected(channel: str, request: Request) -> Optional[Asset]:
+    """该机器已在放量范围内时返回新内容，否则返回 None"""
+    state = _states.get(channel)
+    if state is None or bucket(channel, state.version, identity(request)) >= state.percent * (BUCKETS / 100):
+        return None
+    return state.asset
+
+
+def response_for(channel: str, request: Request) -> Optional[Response]:
+    """该机器已在放量范围内时返回新内容的响应，否则返回 None（由调用方提供当前文件）"""
+    asset = selected(channel, request)
+    if asset is None:
+        return None
+    response = asset.response(request.headers, REVALIDATE)
+    response.headers["Vary"] = VARY
+    return response
+
+
+# ========== 下载并发统计 ==========
+
+_DOWNLOAD_PATH = re.compile(r"^/(?:updates/[^/]+\.exe$|mods/download/|sync/[^/]+/download/)")
+
+
+class DownloadGauge:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= ROLLOUT_MAX_CONCURRENT_DOWNLOADS
+
+    def stats(self) -> dict:
+        return {"active": self.active, "peak": self.peak, "budget": ROLLOUT_MAX_CONCURRENT_DOWNLOADS}
+
+
+downloads = DownloadGauge()
+
+
+class DownloadGaugeMiddleware:
+    """ASGI 中间件：统计正在进行的 exe / mod / 同步文件下载（从请求开始到响应发送完）"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not _DOWNLOAD_PATH.match(scope["path"]):
+            await self.app(scope, receive, send)
+            return
+        downloads.active += 1
+        downloads.peak = max(downloads.peak, downloads.active)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            downloads.active -= 1
+
+
+def tick():
+    db = SessionLocal()
+    try:
+        run_write(db, lambda s: advance(s, downloads.saturated))
+    finally:
+        db.close()
+    reload()
+
+
+async def rollout_loop(interval: float):
+    """定期推进放量比例并刷新缓存；启动时先加载一次，重启后继续之前的放量"""
+    await asyncio.to_thread(reload)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await asyncio.to_thread(tick)
+        except Exception:
+            logger.exception("推进分批发布失败")
@@ -1,15 +1,30 @@
+import asyncio
 import datetime
 import json
 import os
-from fastapi import APIRouter, Depends, Header, HTTPException, Query, Body
-from fastapi.responses import HTMLResponse
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Body, Request, UploadFile, File, Form
+from fastapi.responses import HTMLResponse, StreamingResponse
+from jose import jwt, JWTError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import func, select
 from typing import Optional, Dict, Any
 
-from database import get_db
-from models import User, MachineBinding, LoginToken, Announcement, AntiCheatLog
-from config import ADMIN_TOKEN, SYNC_CONFIG_FILE
+from database import get_async_db, get_read_db, run_write_async, engine, async_engine, read_replicas, replica_status
+from engine_profiles import pool_stats
+from pagination import keyset_page, count_cache
+from anticheat_buffer import report_buffer
+from anticheat_rollups import read_rollups
+from risk_scores import top_risks
+from events import hub, current_snapshot, encode_event
+from static_assets import REVALIDATE, document
+from releases import publish, list_releases
+import rollout
+from search_index import username_filter, remove_from_index
+from models import User, MachineBinding, LoginToken, Announcement, AntiCheatLog, Rollout
+from revocation import revocation_set, revoke_on_commit
+from counters import bump, read_stats, read_series, SERIES
+from config import ADMIN_TOKEN, SECRET_KEY, ALGORITHM, SYNC_CONFIG_FILE, EVENTS_SNAPSHOT_SECONDS
 
 router = APIRouter(prefix="/admin", tags=["管理后台"])
 
@@ -21,34 +36,135 @@ def verify_admin(authorization: str = Header(None)):
         raise HTTPException(403, "无权限")
 
 
+# 事件流票据的有效期：只在建立连接时校验，连接建立后可以一直保持
+EVENTS_TICKET_SECONDS = 60
+EVENTS_TICKET_SCOPE = "admin_events"
+
+
+def verify_admin_stream(ticket: str = Query(""), authorization: str = Header(None)):
+    """EventSource 不能设置请求头，用 /api/events/ticket 换来的短期票据放在 ?ticket= 里，
+    管理员 Token 本身不出现在 URL（访问日志、代理日志、浏览器历史）中"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(503, "未配置 ADMIN_TOKEN")
+    if authorization == f"Bearer {ADMIN_TOKEN}":
+        return
+    try:
+        claims = jwt.decode(ticket, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        raise HTTPException(403, "无权限")
+    if claims.get("scope") != EVENTS_TICKET_SCOPE:
+        raise HTTPException(403, "无权限")
+
+
 # ========== API ==========
 
 @router.get("/api/stats", dependencies=[Depends(verify_admin)])
-def get_stats(db: Session = Depends(get_db)):
-    now = datetime.datetime.utcnow()
+async def get_stats(db: AsyncSession = Depends(get_read_db)):
+    """读 counters 表，不再逐表 COUNT；active_tokens 扣除了尚未清理的过期 Token"""
+    return await db.run_sync(read_stats)
+
+
+@router.get("/api/stats/series", dependencies=[Depends(verify_admin)])
+async def get_stats_series(
+    name: str = Query(...),
+    hours: int = Query(24, ge=1, le=24 * 31),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """逐小时事件数：registrations / logins / anticheat_reports"""
+    if name not in SERIES:
+        raise HTTPException(400, f"未知的序列: {name}")
+    return {"name": name, "hours": hours, "points": await read_series(db, name, hours)}
+
+
+@router.get("/api/anticheat/rollups", dependencies=[Depends(verify_admin)])
+async def get_anticheat_rollups(
+    period: str = Query("day", pattern="^(hour|day)$"),
+    username: str = Query("", description="按用户名精确过滤"),
+    since: Optional[datetime.datetime] = Query(None),
+    until: Optional[datetime.datetime] = Query(None),
+    limit: int = Query(200, ge=1, le=2000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """按玩家按小时/天的违规汇总，包含已归档的记录"""
+    return {"rollups": await read_rollups(db, period, username or None, since, until, limit)}
+
+
+@router.get("/api/anticheat/risk", dependencies=[Depends(verify_admin)])
+async def get_risk_ranking(limit: int = Query(20, ge=1, le=200), db: AsyncSession = Depends(get_read_db)):
+    """风险分最高的玩家"""
+    return {"players": await top_risks(db, limit)}
+
+
+# 没有事件时每隔这么多秒发一行注释，防止代理断开空闲连接
+EVENTS_KEEPALIVE_SECONDS = 15
+
+
+@router.post("/api/events/ticket", dependencies=[Depends(verify_admin)])
+def issue_events_ticket():
+    """签发连接 /api/events 用的短期票据"""
+    expires = datetime.datetime.utcnow() + datetime.timedelta(seconds=EVENTS_TICKET_SECONDS)
+    ticket = jwt.encode({"scope": EVENTS_TICKET_SCOPE, "exp": expires}, SECRET_KEY, algorithm=ALGORITHM)
+    return {"ticket": ticket, "expires_in": EVENTS_TICKET_SECONDS}
+
+
+@router.get("/api/events", dependencies=[Depends(verify_admin_stream)])
+async def admin_events():
+    """后台实时事件流（SSE）：先推送一次完整统计，之后推送增量事件"""
+    snapshot = await current_snapshot(EVENTS_SNAPSHOT_SECONDS)
+
+    async def stream():
+        queue = hub.subscribe()
+        try:
+            yield b"retry: 3000\n\n" + encode_event("stats", snapshot)
+            while True:
+                try:
+                    payload = await asyncio.wait_for(queue.get(), EVENTS_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield b": keepalive\n\n"
+                    continue
+                if payload is None:
+                    return
+                yield payload
+        finally:
+            hub.unsubscribe(queue)
+
+    return StreamingResponse(
+        stream(), media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/api/db-pool", dependencies=[Depends(verify_admin)])
+def get_db_pool_stats():
+    """连接池当前连接数、借出次数和等待时间"""
     return {
-        "users": db.query(func.count(User.id)).scalar(),
-        "machines": db.query(func.count(func.distinct(MachineBinding.machine_id))).scalar(),
-        "active_tokens": db.query(func.count(LoginToken.id)).filter(LoginToken.expires_at > now).scalar(),
-        "announcements": db.query(func.count(Announcement.id)).filter(Announcement.active == 1).scalar(),
-        "anticheat_logs": db.query(func.count(AntiCheatLog.id)).scalar(),
+        "sync": pool_stats(engine),
+        "async": pool_stats(async_engine),
+        "replicas": [
+            dict(status, pool=pool_stats(replica.engine))
+            for status, replica in zip(replica_status(), read_replicas)
+        ],
+        "anticheat_buffer": report_buffer.stats(),
+        "downloads": rollout.downloads.stats(),
+        "events": {"subscribers": hub.subscribers, "published": hub.published},
     }
 
 
 @router.get("/api/users", dependencies=[Depends(verify_admin)])
-def list_users(
-    page: int = Query(1, ge=1),
+async def list_users(
+    cursor: Optional[str] = Query(None),
     size: int = Query(20, ge=1, le=100),
     search: str = Query(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    q = db.query(User)
+    q = select(User)
     if search:
-        q = q.filter(User.username.contains(search))
-    total = q.count()
-    users = q.order_by(User.created_at.desc()).offset((page - 1) * size).limit(size).all()
+        q = q.where(await username_filter(db, User, search))
+    total = await count_cache.get(db, ("users", search), q)
+    users, next_cursor = await keyset_page(db, q, User, cursor, size)
     return {
         "total": total,
+        "next_cursor": next_cursor,
         "users": [
             {
                 "id": u.id,
@@ -62,29 +178,48 @@ def list_users(
 
 
 @router.delete("/api/users/{user_id}", dependencies=[Depends(verify_admin)])
-def delete_user(user_id: int, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user:
+async def delete_user(user_id: int, db: AsyncSession = Depends(get_async_db)):
+    username = await db.scalar(select(User.username).where(User.id == user_id))
+    if not username:
         raise HTTPException(404, "用户不存在")
-    db.query(MachineBinding).filter(MachineBinding.username == user.username).delete()
-    db.query(LoginToken).filter(LoginToken.user_id == user.id).delete()
-    db.delete(user)
-    db.commit()
-    return {"message": f"用户 {user.username} 已删除"}
+
+    def _delete(s: Session):
+        machine_ids = [m for (m,) in s.query(MachineBinding.machine_id).filter(MachineBinding.username == username)]
+        s.query(MachineBinding).filter(MachineBinding.username == username).delete()
+        if revocation_set.enabled:
+            for t in s.query(LoginToken.token_hash, LoginToken.expires_at).filter(LoginToken.user_id == user_id):
+                revoke_on_commit(s, t.token_hash, t.expires_at)
+        removed_tokens = s.query(LoginToken).filter(LoginToken.user_id == user_id).delete()
+        s.query(User).filter(User.id == user_id).delete()
+        remove_from_index(s.connection(), User, [user_id])
+        # 该账号是机器码上最后一个绑定时，机器数减一
+        still_bound = s.query(func.count(func.distinct(MachineBinding.machine_id))).filter(
+            MachineBinding.machine_id.in_(machine_ids)
+        ).scalar() if machine_ids else 0
+        bump(s, "users", -1)
+        bump(s, "machines", still_bound - len(machine_ids))
+        bump(s, "login_tokens", -removed_tokens)
+
+    await run_write_async(db, _delete)
+    count_cache.invalidate("users")
+    count_cache.invalidate("tokens")
+    count_cache.invalidate("machines")
+    return {"message": f"用户 {username} 已删除"}
 
 
 @router.get("/api/tokens", dependencies=[Depends(verify_admin)])
-def list_tokens(
-    page: int = Query(1, ge=1),
+async def list_tokens(
+    cursor: Optional[str] = Query(None),
     size: int = Query(20, ge=1, le=100),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     now = datetime.datetime.utcnow()
-    q = db.query(LoginToken).filter(LoginToken.expires_at > now)
-    total = q.count()
-    tokens = q.order_by(LoginToken.created_at.desc()).offset((page - 1) * size).limit(size).all()
+    q = select(LoginToken).where(LoginToken.expires_at > now)
+    total = await count_cache.get(db, ("tokens",), q)
+    tokens, next_cursor = await keyset_page(db, q, LoginToken, cursor, size, options=(joinedload(LoginToken.user),))
     return {
         "total": total,
+        "next_cursor": next_cursor,
         "tokens": [
             {
                 "id": t.id,
@@ -98,33 +233,63 @@ def list_tokens(
     }
 
 
+def _machine_row(machine_id: str, usernames: Optional[str]) -> Dict[str, Any]:
+    names = usernames.split(",") if usernames else []
+    return {"machine_id": machine_id, "usernames": names, "count": len(names)}
+
+
+def _machines_query():
+    # 分组和拼接都在数据库里完成，走 ix_machine_user (machine_id, username) 覆盖索引
+    return (
+        select(MachineBinding.machine_id, func.group_concat(MachineBinding.username))
+        .group_by(MachineBinding.machine_id)
+    )
+
+
 @router.get("/api/machines", dependencies=[Depends(verify_admin)])
-def list_machines(db: Session = Depends(get_db)):
-    bindings = db.query(MachineBinding).order_by(MachineBinding.created_at.desc()).all()
-    grouped = {}
-    for b in bindings:
-        if b.machine_id not in grouped:
-            grouped[b.machine_id] = []
-        grouped[b.machine_id].append(b.username)
+async def list_machines(
+    cursor: Optional[str] = Query(None),
+    size: int = Query(50, ge=1, le=200),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """按 machine_id 升序分页，cursor 为上一页最后一个 machine_id"""
+    total = await count_cache.get(db, ("machines",), select(MachineBinding.machine_id).distinct())
+    q = _machines_query()
+    if cursor:
+        q = q.where(MachineBinding.machine_id > cursor)
+    rows = (await db.execute(q.order_by(MachineBinding.machine_id).limit(size + 1))).all()
+    next_cursor = rows[size - 1][0] if len(rows) > size else None
     return {
-        "total": len(grouped),
-        "machines": [
-            {"machine_id": mid, "usernames": names, "count": len(names)}
-            for mid, names in grouped.items()
-        ],
+        "total": total,
+        "next_cursor": next_cursor,
+        "machines": [_machine_row(mid, names) for mid, names in rows[:size]],
     }
 
 
+@router.get("/api/machines/{machine_id}", dependencies=[Depends(verify_admin)])
+async def get_machine(machine_id: str, db: AsyncSession = Depends(get_read_db)):
+    row = (await db.execute(_machines_query().where(MachineBinding.machine_id == machine_id))).first()
+    if not row:
+        raise HTTPException(404, "机器码不存在")
+    return _machine_row(*row)
+
+
 @router.delete("/api/machines/{machine_id}", dependencies=[Depends(verify_admin)])
-def delete_machine_bindings(machine_id: str, db: Session = Depends(get_db)):
-    count = db.query(MachineBinding).filter(MachineBinding.machine_id == machine_id).delete()
-    db.commit()
+async def delete_machine_bindings(machine_id: str, db: AsyncSession = Depends(get_async_db)):
+    def _delete(s: Session) -> int:
+        count = s.query(MachineBinding).filter(MachineBinding.machine_id == machine_id).delete()
+        if count:
+            bump(s, "machines", -1)
+        return count
+
+    count = await run_write_async(db, _delete)
+    count_cache.invalidate("machines")
     return {"message": f"已删除 {count} 条绑定记录"}
 
 
 @router.get("/api/announcements", dependencies=[Depends(verify_admin)])
-def list_all_announcements(db: Session = Depends(get_db)):
-    items = db.query(Announcement).order_by(Announcement.created_at.desc()).limit(50).all()
+async def list_all_announcements(db: AsyncSession = Depends(get_read_db)):
+    items = (await db.scalars(select(Announcement).order_by(Announcement.created_at.desc()).limit(50))).all()
     return {
         "announcements": [
             {
@@ -141,19 +306,20 @@ def list_all_announcements(db: Session = Depends(get_db)):
 
 
 @router.get("/api/anticheat", dependencies=[Depends(verify_admin)])
-def list_anticheat(
-    page: int = Query(1, ge=1),
+async def list_anticheat(
+    cursor: Optional[str] = Query(None),
     size: int = Query(20, ge=1, le=100),
     username: str = Query(""),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    q = db.query(AntiCheatLog)
+    q = select(AntiCheatLog)
     if username:
-        q = q.filter(AntiCheatLog.username.contains(username))
-    total = q.count()
-    logs = q.order_by(AntiCheatLog.created_at.desc()).offset((page - 1) * size).limit(size).all()
+        q = q.where(await username_filter(db, AntiCheatLog, username))
+    total = await count_cache.get(db, ("anticheat", username), q)
+    logs, next_cursor = await keyset_page(db, q, AntiCheatLog, cursor, size)
     return {
         "total": total,
+        "next_cursor": next_cursor,
         "logs": [
             {
                 "id": l.id,
@@ -245,11 +411,53 @@ def delete_sync_folder(folder_id: str):
     return {"message": f"文件夹 {folder_id} 已删除"}
 
 
+# ========== 启动器版本发布 ==========
+
+@router.get("/api/releases", dependencies=[Depends(verify_admin)])
+def get_releases():
+    return list_releases()
+
+
+@router.post("/api/releases", dependencies=[Depends(verify_admin)])
+def publish_release(file: UploadFile = File(...), version: str = Form(...)):
+    """上传新版本 exe，计算 sha512 和 blockmap 后更新 latest.yml（约 10 秒/70MB）"""
+    try:
+        return publish(file.file, version)
+    except ValueError as e:
+        raise HTTPException(400, str(e))
+
+
+# ========== 分批发布 ==========
+
+@router.get("/api/rollouts", dependencies=[Depends(verify_admin)])
+async def get_rollouts(db: AsyncSession = Depends(get_read_db)):
+    rollouts = (await db.scalars(select(Rollout).order_by(Rollout.started_at.desc()))).all()
+    return {"downloads": rollout.downloads.stats(), "rollouts": [rollout.rollout_to_dict(r) for r in rollouts]}
+
+
+ROLLOUT_ACTIONS = {
+    "pause": lambda s, channel: rollout.set_paused(s, channel, True),
+    "resume": lambda s, channel: rollout.set_paused(s, channel, False),
+    "complete": rollout.complete,
+}
+
+
+@router.post("/api/rollouts/{channel}/{action}", dependencies=[Depends(verify_admin)])
+async def update_rollout(channel: str, action: str, db: AsyncSession = Depends(get_async_db)):
+    """暂停 / 恢复放量，或立即放量到 100%"""
+    if action not in ROLLOUT_ACTIONS:
+        raise HTTPException(404, f"不支持的操作: {action}")
+    if not await run_write_async(db, lambda s: ROLLOUT_ACTIONS[action](s, channel)):
+        raise HTTPException(404, f"{channel} 没有进行中的分批发布")
+    await asyncio.to_thread(rollout.reload)
+    return {"message": "已更新"}
+
+
 # ========== HTML 页面 ==========
 
 @router.get("", response_class=HTMLResponse)
-def admin_page():
-    return ADMIN_HTML
+def admin_page(request: Request):
+    return ADMIN_PAGE.response(request.headers, REVALIDATE)
 
 
 ADMIN_HTML = r"""<!DOCTYPE html>
@@ -318,6 +526,9 @@ body{font-family:var(--font-b);font-size:18px;background:var(--bg-primary);color
 .stat-card::before{content:'';position:absolute;top:0;left:0;right:0;height:4px;background:linear-gradient(90deg,var(--mc-grass) 0%,var(--mc-grass) 33%,var(--mc-grass-dark) 33%,var(--mc-grass-dark) 66%,var(--mc-grass-light) 66%)}
 .stat-card .num{font-family:var(--font-h);font-size:20px;color:var(--mc-gold);text-shadow:2px 2px 0 #000}
 .stat-card .label{font-family:var(--font-b);font-size:18px;color:var(--text-secondary);margin-top:6px}
+.series{display:grid;grid-template-columns:repeat(auto-fit,minmax(260px,1fr));gap:16px;margin-bottom:24px}
+.bars{display:flex;align-items:flex-end;gap:2px;height:80px;margin-top:8px}
+.bars div{flex:1;background:var(--mc-grass);min-height:1px}
 /* 表格 */
 table{width:100%;border-collapse:collapse;background:var(--bg-card);border:var(--pixel) solid #000;box-shadow:inset -3px -3px 0 0 #222,inset 3px 3px 0 0 #555}
 th,td{padding:8px 12px;text-align:left;border-bottom:2px solid #222;font-family:var(--font-b);font-size:18px}
@@ -389,6 +600,9 @@ const API = '/admin/api';
 const tabs = ['dashboard','users','tokens','machines','announcements','anticheat','sync'];
 let currentTab = 'dashboard';
 let pageState = {};
+// 实时事件（/events）维护的统计、小时序列和动态列表，总览页直接用它绘制
+let live = { stats: null, series: {}, feed: [] };
+let events = null;
 
 function headers() { return { 'Authorization': 'Bearer ' + TOKEN, 'Content-Type': 'application/json' }; }
 
@@ -407,6 +621,7 @@ async function doLogin() {
     localStorage.setItem('admin_token', TOKEN);
     document.getElementById('loginWrap').style.display = 'none';
     document.getElementById('app').style.display = 'block';
+    connectEvents().catch(() => {});
     showTab('dashboard');
   } catch(e) {
     document.getElementById('loginErr').textContent = '登录失败：Token无效';
@@ -415,6 +630,8 @@ async function doLogin() {
 }
 
 function doLogout() {
+  if (events) { events.close(); events = null; }
+  live = { stats: null, series: {}, feed: [] };
   TOKEN = '';
   localStorage.removeItem('admin_token');
   document.getElementById('app').style.display = 'none';
@@ -428,7 +645,7 @@ function showTab(tab) {
     const el = document.getElementById('tab-' + t);
     if (el) el.className = t === tab ? 'active' : '';
   });
-  pageState = { page: 1, search: '' };
+  pageState = { page: 1, search: '', cursors: [''] };
   render();
 }
 
@@ -445,26 +662,80 @@ async function render() {
   } catch(e) { m.innerHTML = '<p style="color:#e94560">加载失败: ' + e.message + '</p>'; }
 }
 
+const SERIES = [['registrations', '24h 注册'], ['logins', '24h 登录'], ['anticheat_reports', '24h 违规上报']];
 async function renderDashboard(m) {
-  const s = await api('/stats');
+  // 只在首次进入时查询，之后由实时事件增量更新
+  if (!live.stats) live.stats = await api('/stats');
+  await Promise.all(SERIES.filter(([name]) => !live.series[name]).map(async ([name]) => {
+    live.series[name] = (await api('/stats/series?name=' + name + '&hours=24')).points;
+  }));
+  drawDashboard(m);
+}
+function drawDashboard(m) {
+  const s = live.stats;
   m.innerHTML = '<h2><span class="crosshair">[+]</span> 作战总览</h2><div class="stats">'
     + card(s.users, '注册士兵') + card(s.machines, '绑定装备')
     + card(s.active_tokens, '活跃令牌') + card(s.announcements, '战报公告')
     + card(s.anticheat_logs, '违规记录')
-    + '</div><div class="grass-stripe"></div>';
+    + '</div><div class="series">' + SERIES.map(([name, label]) => series(live.series[name], label)).join('')
+    + '</div><h2><span class="crosshair">[~]</span> 实时动态</h2><table>'
+    + (live.feed.length ? live.feed.map(f => '<tr><td>' + fmtTime(f.at) + '</td><td>' + f.kind + '</td><td>' + esc(f.text) + '</td></tr>').join('') : '<tr><td>暂无动态</td></tr>')
+    + '</table><div class="grass-stripe"></div>';
+}
+function series(points, label) {
+  const max = Math.max(1, ...points.map(p => p.value));
+  const total = points.reduce((a, p) => a + p.value, 0);
+  return '<div class="stat-card"><div class="label">' + label + ' (' + total + ')</div><div class="bars">'
+    + points.map(p => '<div title="' + fmtTime(p.bucket) + ': ' + p.value + '" style="height:' + (p.value / max * 100) + '%"></div>').join('')
+    + '</div></div>';
+}
+
+async function connectEvents() {
+  if (events) { events.close(); events = null; }
+  // 管理员 Token 不放进 URL，先用请求头换一个短期票据
+  const { ticket } = await api('/events/ticket', { method: 'POST' });
+  if (!TOKEN) return;
+  events = new EventSource(API + '/events?ticket=' + encodeURIComponent(ticket));
+  // 票据只在建立连接时有效：连接被拒绝（如服务重启后票据已过期）时换新票据重连
+  const source = events;
+  events.onerror = () => {
+    if (source.readyState === EventSource.CLOSED && events === source) {
+      setTimeout(() => { if (events === source) connectEvents().catch(() => {}); }, 3000);
+    }
+  };
+  const on = (type, fn) => events.addEventListener(type, e => { fn(JSON.parse(e.data)); if (currentTab === 'dashboard' && live.stats) drawDashboard(document.getElementById('mainContent')); });
+  on('stats', d => { live.stats = d; });
+  on('counters', d => { if (live.stats) for (const k in d) live.stats[k] = (live.stats[k] || 0) + d[k]; });
+  on('series', d => {
+    const points = live.series[d.name];
+    if (!points) return;
+    let p = points.find(p => p.bucket === d.bucket);
+    if (!p && d.bucket > points[points.length - 1].bucket) { points.push(p = { bucket: d.bucket, value: 0 }); points.shift(); }
+    if (p) p.value += d.value;
+  });
+  on('registration', d => pushFeed('注册', d.username, d.created_at));
+  on('login', d => pushFeed('登录', d.username + ' @ ' + d.client_ip, d.created_at));
+  on('anticheat', d => {
+    d.logs.forEach(l => pushFeed('违规', l.username + ' (' + l.reason + ' x' + l.violation_count + ')', l.created_at));
+    prependAnticheat(d.logs);
+  });
+}
+function pushFeed(kind, text, at) {
+  live.feed.unshift({ kind, text, at });
+  live.feed.length = Math.min(live.feed.length, 20);
 }
 function card(n, l) { return '<div class="stat-card"><div class="num">' + n + '</div><div class="label">' + l + '</div></div>'; }
 
 async function renderUsers(m) {
   const p = pageState.page || 1;
   const s = pageState.search || '';
-  const d = await api('/users?page=' + p + '&size=20&search=' + encodeURIComponent(s));
-  let h = '<h2><span class="crosshair">[U]</span> 士兵管理</h2><div class="toolbar"><input placeholder="搜索代号..." value="' + esc(s) + '" onkeyup="if(event.key===\'Enter\'){pageState.search=this.value;pageState.page=1;render()}" /><button class="mc-btn mc-btn-olive mc-btn-sm" onclick="pageState.search=this.previousElementSibling.value;pageState.page=1;render()">SEARCH</button></div>';
+  const d = await api('/users?' + cursorQuery() + '&size=20&search=' + encodeURIComponent(s));
+  let h = '<h2><span class="crosshair">[U]</span> 士兵管理</h2><div class="toolbar"><input placeholder="搜索代号..." value="' + esc(s) + '" onkeyup="if(event.key===\'Enter\')searchPage(this.value)" /><button class="mc-btn mc-btn-olive mc-btn-sm" onclick="searchPage(this.previousElementSibling.value)">SEARCH</button></div>';
   h += '<table><tr><th>ID</th><th>代号</th><th>装备码</th><th>入伍时间</th><th>操作</th></tr>';
   d.users.forEach(u => {
     h += '<tr><td>' + u.id + '</td><td>' + esc(u.username) + '</td><td title="' + esc(u.machine_id) + '">' + esc(u.machine_id).slice(0,12) + '...</td><td>' + fmtTime(u.created_at) + '</td><td><button class="mc-btn mc-btn-red mc-btn-sm" onclick="delUser(' + u.id + ',\'' + esc(u.username) + '\')">KICK</button></td></tr>';
   });
-  h += '</table>' + pager(d.total, p, 20);
+  h += '</table>' + pager(d.total, p, 20, d.next_cursor);
   m.innerHTML = h;
 }
 
@@ -476,22 +747,23 @@ async function delUser(id, name) {
 
 async function renderTokens(m) {
   const p = pageState.page || 1;
-  const d = await api('/tokens?page=' + p + '&size=20');
+  const d = await api('/tokens?' + cursorQuery() + '&size=20');
   let h = '<h2><span class="crosshair">[T]</span> 通行令牌</h2><table><tr><th>ID</th><th>代号</th><th>IP坐标</th><th>签发时间</th><th>失效时间</th></tr>';
   d.tokens.forEach(t => {
     h += '<tr><td>' + t.id + '</td><td>' + esc(t.username) + '</td><td>' + esc(t.client_ip) + '</td><td>' + fmtTime(t.created_at) + '</td><td>' + fmtTime(t.expires_at) + '</td></tr>';
   });
-  h += '</table>' + pager(d.total, p, 20);
+  h += '</table>' + pager(d.total, p, 20, d.next_cursor);
   m.innerHTML = h;
 }
 
 async function renderMachines(m) {
-  const d = await api('/machines');
+  const p = pageState.page || 1;
+  const d = await api('/machines?' + cursorQuery() + '&size=50');
   let h = '<h2><span class="crosshair">[M]</span> 装备绑定 (' + d.total + ')</h2><table><tr><th>装备码</th><th>绑定士兵</th><th>数量</th><th>操作</th></tr>';
   d.machines.forEach(mc => {
     h += '<tr><td title="' + esc(mc.machine_id) + '">' + esc(mc.machine_id).slice(0,16) + '...</td><td>' + mc.usernames.map(esc).join(', ') + '</td><td>' + mc.count + '</td><td><button class="mc-btn mc-btn-red mc-btn-sm" onclick="delMachine(\'' + esc(mc.machine_id) + '\')">UNBIND</button></td></tr>';
   });
-  h += '</table>';
+  h += '</table>' + pager(d.total, p, 50, d.next_cursor);
   m.innerHTML = h;
 }
 
@@ -540,15 +812,23 @@ async function delAnnouncement(id) {
 async function renderAnticheat(m) {
   const p = pageState.page || 1;
   const s = pageState.search || '';
-  const d = await api('/anticheat?page=' + p + '&size=20&username=' + encodeURIComponent(s));
-  let h = '<h2><span class="crosshair">[X]</span> 违规侦察</h2><div class="toolbar"><input placeholder="搜索代号..." value="' + esc(s) + '" onkeyup="if(event.key===\'Enter\'){pageState.search=this.value;pageState.page=1;render()}" /><button class="mc-btn mc-btn-olive mc-btn-sm" onclick="pageState.search=this.previousElementSibling.value;pageState.page=1;render()">SEARCH</button></div>';
-  h += '<table><tr><th>ID</th><th>代号</th><th>IP坐标</th><th>违规次数</th><th>原因</th><th>时间</th></tr>';
-  d.logs.forEach(l => {
-    h += '<tr><td>' + l.id + '</td><td>' + esc(l.username) + '</td><td>' + esc(l.client_ip) + '</td><td style="color:var(--mc-redstone)">' + l.violation_count + '</td><td>' + esc(l.reason) + '</td><td>' + fmtTime(l.created_at) + '</td></tr>';
-  });
-  h += '</table>' + pager(d.total, p, 20);
+  const d = await api('/anticheat?' + cursorQuery() + '&size=20&username=' + encodeURIComponent(s));
+  let h = '<h2><span class="crosshair">[X]</span> 违规侦察</h2><div class="toolbar"><input placeholder="搜索代号..." value="' + esc(s) + '" onkeyup="if(event.key===\'Enter\')searchPage(this.value)" /><button class="mc-btn mc-btn-olive mc-btn-sm" onclick="searchPage(this.previousElementSibling.value)">SEARCH</button></div>';
+  h += '<table id="anticheatTable"><tr><th>ID</th><th>代号</th><th>IP坐标</th><th>违规次数</th><th>原因</th><th>时间</th></tr>';
+  d.logs.forEach(l => { h += anticheatRow(l); });
+  h += '</table>' + pager(d.total, p, 20, d.next_cursor);
   m.innerHTML = h;
 }
+function anticheatRow(l) {
+  return '<tr><td>' + (l.id || '-') + '</td><td>' + esc(l.username) + '</td><td>' + esc(l.client_ip) + '</td><td style="color:var(--mc-redstone)">' + l.violation_count + '</td><td>' + esc(l.reason) + '</td><td>' + fmtTime(l.created_at) + '</td></tr>';
+}
+// 新的违规记录直接插到第一页顶部，不重新查询
+function prependAnticheat(logs) {
+  const table = document.getElementById('anticheatTable');
+  if (currentTab !== 'anticheat' || pageState.page !== 1 || pageState.search || !table) return;
+  logs.forEach(l => table.rows[0].insertAdjacentHTML('afterend', anticheatRow(l)));
+  while (table.rows.length > 21) table.deleteRow(table.rows.length - 1);
+}
 
 async function renderSync(m) {
   const d = await api('/sync-config');
@@ -641,9 +921,14 @@ async function delFolder(id) {
   render();
 }
 
-function pager(total, page, size) {
-  const pages = Math.ceil(total / size) || 1;
-  return '<div class="pager"><button class="mc-btn mc-btn-sm" ' + (page <= 1 ? 'disabled' : 'onclick="pageState.page--;render()"') + '>&lt; PREV</button><span>[ ' + page + ' / ' + pages + ' ] 共 ' + total + ' 条</span><button class="mc-btn mc-btn-sm" ' + (page >= pages ? 'disabled' : 'onclick="pageState.page++;render()"') + '>NEXT &gt;</button></div>';
+// 游标分页：cursors[i] 是第 i+1 页的游标，只能逐页前进/后退
+function cursorQuery() { return 'cursor=' + encodeURIComponent(pageState.cursors[pageState.page - 1] || ''); }
+function searchPage(v) { pageState.search = v; pageState.page = 1; pageState.cursors = ['']; render(); }
+function nextPage() { pageState.cursors[pageState.page] = pageState.next; pageState.page++; render(); }
+function pager(total, page, size, next) {
+  const pages = Math.max(Math.ceil(total / size), page);
+  pageState.next = next;
+  return '<div class="pager"><button class="mc-btn mc-btn-sm" ' + (page <= 1 ? 'disabled' : 'onclick="pageState.page--;render()"') + '>&lt; PREV</button><span>[ ' + page + ' / ' + pages + ' ] 共 ' + total + ' 条</span><button class="mc-btn mc-btn-sm" ' + (!next ? 'disabled' : 'onclick="nextPage()"') + '>NEXT &gt;</button></div>';
 }
 
 function esc(s) { if (!s) return ''; const d = document.createElement('div'); d.textContent = s; return d.innerHTML; }
@@ -654,6 +939,7 @@ if (TOKEN) {
   api('/stats').then(() => {
     document.getElementById('loginWrap').style.display = 'none';
     document.getElementById('app').style.display = 'block';
+    connectEvents().catch(() => {});
     showTab('dashboard');
   }).catch(() => { TOKEN = ''; localStorage.removeItem('admin_token'); });
 }
@@ -662,3 +948,5 @@ document.getElementById('tokenInput').addEventListener('keyup', e => { if (e.key
 </script>
 </body>
 </html>"""
+
+ADMIN_PAGE = document("admin", ADMIN_HTML)
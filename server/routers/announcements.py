@@ -1,12 +1,19 @@
+import asyncio
 import datetime
-from fastapi import APIRouter, Depends, Header, HTTPException
+import hashlib
+import json
+import time
+from fastapi import APIRouter, Depends, Header, HTTPException, Response
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Tuple
 
-from database import get_db
+from database import get_async_db, run_write_async, AsyncSessionLocal
 from models import Announcement
-from config import ADMIN_TOKEN
+from counters import bump
+from config import ADMIN_TOKEN, ANNOUNCEMENTS_CACHE_SECONDS, ANNOUNCEMENTS_MAX_AGE
 
 router = APIRouter(prefix="/announcements", tags=["公告"])
 
@@ -33,17 +40,22 @@ class AnnouncementResponse(BaseModel):
     created_at: str
 
 
-@router.get("/")
-def get_announcements(db: Session = Depends(get_db)):
-    """获取所有活跃公告（最新的在前，最多20条）"""
-    items = (
-        db.query(Announcement)
-        .filter(Announcement.active == 1)
-        .order_by(Announcement.created_at.desc())
-        .limit(20)
-        .all()
-    )
-    return {
+# 启动器每次启动都会拉公告，而公告一周只改几次：响应体预先序列化成字节缓存在内存里，
+# 本进程创建/删除公告提交后立即重建；多 worker 时其他 worker 最多 ANNOUNCEMENTS_CACHE_SECONDS 后重建
+_feed: Optional[Tuple[bytes, str, float]] = None  # (响应体, ETag, 生成时间)
+_feed_lock = asyncio.Lock()
+
+
+async def _build_feed() -> Tuple[bytes, str, float]:
+    # 刚提交的修改可能还没复制到只读副本，这里读主库
+    async with AsyncSessionLocal() as db:
+        items = (await db.scalars(
+            select(Announcement)
+            .where(Announcement.active == 1)
+            .order_by(Announcement.created_at.desc())
+            .limit(20)
+        )).all()
+    body = json.dumps({
         "announcements": [
             {
                 "id": a.id,
@@ -54,29 +66,68 @@ def get_announcements(db: Session = Depends(get_db)):
             }
             for a in items
         ]
-    }
+    }, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+    return body, etag, time.monotonic()
+
+
+async def _get_feed(refresh: bool = False) -> Tuple[bytes, str, float]:
+    global _feed
+    feed = _feed
+    if refresh or feed is None or (
+        ANNOUNCEMENTS_CACHE_SECONDS > 0 and time.monotonic() - feed[2] > ANNOUNCEMENTS_CACHE_SECONDS
+    ):
+        async with _feed_lock:
+            # 等锁期间可能已被其他请求重建
+            if _feed is feed or refresh:
+                _feed = await _build_feed()
+        feed = _feed
+    return feed
+
+
+@router.get("/")
+async def get_announcements(if_none_match: Optional[str] = Header(None)):
+    """获取所有活跃公告（最新的在前，最多20条）"""
+    body, etag, _ = await _get_feed()
+    headers = {"ETag": etag, "Cache-Control": f"public, max-age={ANNOUNCEMENTS_MAX_AGE}"}
+    if if_none_match and etag in [t.strip() for t in if_none_match.split(",")]:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
 
 
 @router.post("/", dependencies=[Depends(verify_admin)])
-def create_announcement(req: AnnouncementCreate, db: Session = Depends(get_db)):
+async def create_announcement(req: AnnouncementCreate, db: AsyncSession = Depends(get_async_db)):
     """创建公告（需要管理员权限）"""
-    ann = Announcement(
-        title=req.title,
-        content=req.content,
-        important=1 if req.important else 0,
-    )
-    db.add(ann)
-    db.commit()
-    db.refresh(ann)
-    return {"message": "公告创建成功", "id": ann.id}
+    def _insert(s: Session) -> int:
+        ann = Announcement(
+            title=req.title,
+            content=req.content,
+            important=1 if req.important else 0,
+        )
+        s.add(ann)
+        s.flush()
+        bump(s, "announcements")
+        return ann.id
+
+    ann_id = await run_write_async(db, _insert)
+    await _get_feed(refresh=True)
+    return {"message": "公告创建成功", "id": ann_id}
 
 
 @router.delete("/{announcement_id}", dependencies=[Depends(verify_admin)])
-def delete_announcement(announcement_id: int, db: Session = Depends(get_db)):
+async def delete_announcement(announcement_id: int, db: AsyncSession = Depends(get_async_db)):
     """删除（隐藏）公告（需要管理员权限）"""
-    ann = db.query(Announcement).filter(Announcement.id == announcement_id).first()
-    if not ann:
+    def _hide(s: Session) -> bool:
+        active = s.query(Announcement.active).filter(Announcement.id == announcement_id).scalar()
+        if active is None:
+            return False
+        if active:
+            s.query(Announcement).filter(Announcement.id == announcement_id).update({Announcement.active: 0})
+            bump(s, "announcements", -1)
+        return True
+
+    updated = await run_write_async(db, _hide)
+    if not updated:
         raise HTTPException(404, "公告不存在")
-    ann.active = 0
-    db.commit()
+    await _get_feed(refresh=True)
     return {"message": "公告已删除"}
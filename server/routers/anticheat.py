@@ -1,11 +1,17 @@
+import asyncio
 import datetime
 from fastapi import APIRouter, Depends, Header, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
-from typing import Optional
+from typing import List, Optional
 
-from database import get_db
+from database import get_async_db, get_read_db, run_write_async
 from models import AntiCheatLog
+from anticheat_buffer import report_buffer, coalesce, insert_reports
+from anticheat_archive import archived_before, log_to_dict
+from anticheat_rollups import days_with_logs
+from risk_scores import player_risk
 from config import MOD_API_KEY, ADMIN_TOKEN
 
 router = APIRouter(prefix="/anticheat", tags=["反作弊"])
@@ -32,41 +38,57 @@ class ViolationReport(BaseModel):
     reason: str
 
 
+# 单次批量上报的最大条数
+MAX_BATCH_REPORTS = 1000
+
+
+async def _ingest(reports: List[dict], db: AsyncSession) -> int:
+    """开启缓冲时放入缓冲区立即返回，否则合并后直接批量写库"""
+    if report_buffer.enabled:
+        report_buffer.add(reports)
+    else:
+        rows = coalesce(reports)
+        await run_write_async(db, lambda s: insert_reports(s, rows))
+    return len(reports)
+
+
 @router.post("/report", dependencies=[Depends(verify_mod_api_key)])
-def report_violation(req: ViolationReport, db: Session = Depends(get_db)):
+async def report_violation(req: ViolationReport, db: AsyncSession = Depends(get_async_db)):
     """接收服务端 Mod 的反作弊上报"""
-    log = AntiCheatLog(
-        username=req.username,
-        client_ip=req.client_ip,
-        violation_count=req.violation_count,
-        reason=req.reason,
-    )
-    db.add(log)
-    db.commit()
-    return {"message": "违规记录已保存", "id": log.id}
+    await _ingest([req.model_dump()], db)
+    return {"message": "违规记录已接收"}
+
+
+@router.post("/report/batch", dependencies=[Depends(verify_mod_api_key)])
+async def report_violations(reports: List[ViolationReport], db: AsyncSession = Depends(get_async_db)):
+    """批量接收反作弊上报"""
+    if len(reports) > MAX_BATCH_REPORTS:
+        raise HTTPException(413, f"单次最多上报 {MAX_BATCH_REPORTS} 条")
+    accepted = await _ingest([r.model_dump() for r in reports], db)
+    return {"message": "违规记录已接收", "accepted": accepted}
+
+
+@router.get("/risk/{username}", dependencies=[Depends(verify_mod_api_key)])
+async def get_player_risk(username: str, db: AsyncSession = Depends(get_read_db)):
+    """玩家当前风险分，供服务端 Mod 在玩家进服时查询（主键查找，不扫描日志）"""
+    return await player_risk(db, username)
 
 
 @router.get("/logs", dependencies=[Depends(verify_admin)])
-def get_anticheat_logs(
+async def get_anticheat_logs(
     username: Optional[str] = None,
     limit: int = 50,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """查询反作弊日志（管理接口）"""
-    query = db.query(AntiCheatLog).order_by(AntiCheatLog.created_at.desc())
+    """查询反作弊日志（管理接口），热表里不够 limit 条时继续读归档"""
+    query = select(AntiCheatLog).order_by(AntiCheatLog.created_at.desc(), AntiCheatLog.id.desc())
     if username:
-        query = query.filter(AntiCheatLog.username == username)
-    items = query.limit(limit).all()
-    return {
-        "logs": [
-            {
-                "id": log.id,
-                "username": log.username,
-                "client_ip": log.client_ip,
-                "violation_count": log.violation_count,
-                "reason": log.reason,
-                "created_at": log.created_at.isoformat() if log.created_at else None,
-            }
-            for log in items
-        ]
-    }
+        query = query.where(AntiCheatLog.username == username)
+    items = (await db.scalars(query.limit(limit))).all()
+    logs = [log_to_dict(log) for log in items]
+    if len(logs) < limit:
+        before = (items[-1].created_at, items[-1].id) if items else None
+        # 按玩家查时只打开该玩家有记录的日期的分段
+        days = await days_with_logs(db, username) if username else None
+        logs += await asyncio.to_thread(archived_before, limit - len(logs), before, username, days)
+    return {"logs": logs}
@@ -1,18 +1,25 @@
 import re
+import time
 import hashlib
-import secrets
 import datetime
 from fastapi import APIRouter, Depends, HTTPException, Request, Header
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select, func
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, field_validator
-from jose import jwt
+from jose import jwt, JWTError, ExpiredSignatureError
 from passlib.context import CryptContext
 
-from database import get_db
-from models import User, MachineBinding, LoginToken
+from database import get_async_db, get_read_db, run_write_async, AsyncSessionLocal
+from models import User, MachineBinding, LoginToken, token_digest
+from launch_tokens import launch_token_store
+from revocation import revocation_set, revoke_on_commit
+from counters import bump, record
+from events import emit
 from config import (
     SECRET_KEY, ALGORITHM, TOKEN_EXPIRE_HOURS,
-    MAX_ACCOUNTS_PER_MACHINE, USERNAME_PATTERN, MOD_API_KEY,
+    MAX_ACCOUNTS_PER_MACHINE, USERNAME_PATTERN, MOD_API_KEY, TOKEN_VERIFY_MODE,
 )
 
 router = APIRouter(prefix="/auth", tags=["认证"])
@@ -82,38 +89,46 @@ class VerifyRequest(BaseModel):
 
 
 @router.post("/register")
-def register(req: RegisterRequest, db: Session = Depends(get_db)):
+async def register(req: RegisterRequest, db: AsyncSession = Depends(get_async_db)):
     # 检查用户名是否已存在
-    if db.query(User).filter(User.username == req.username).first():
+    if await db.scalar(select(User.id).where(User.username == req.username)):
         raise HTTPException(400, "用户名已存在")
 
     # 检查机器码绑定数量
-    binding_count = db.query(MachineBinding).filter(
-        MachineBinding.machine_id == req.machine_id
-    ).count()
+    binding_count = await db.scalar(
+        select(func.count(MachineBinding.id)).where(MachineBinding.machine_id == req.machine_id)
+    )
     if binding_count >= MAX_ACCOUNTS_PER_MACHINE:
         raise HTTPException(400, f"该机器已绑定{MAX_ACCOUNTS_PER_MACHINE}个账号，无法再注册")
 
-    # 创建用户
-    user = User(
-        username=req.username,
-        password_hash=hash_password(req.password),
-        machine_id=req.machine_id,
-    )
-    db.add(user)
-
-    # 创建机器码绑定
-    binding = MachineBinding(machine_id=req.machine_id, username=req.username)
-    db.add(binding)
-
-    db.commit()
+    # bcrypt 是 CPU 密集操作，放到线程池避免阻塞事件循环
+    password_hash = await run_in_threadpool(hash_password, req.password)
+
+    new_machine = binding_count == 0
+
+    def _create(s: Session):
+        # 创建用户
+        s.add(User(
+            username=req.username,
+            password_hash=password_hash,
+            machine_id=req.machine_id,
+        ))
+        # 创建机器码绑定
+        s.add(MachineBinding(machine_id=req.machine_id, username=req.username))
+        bump(s, "users")
+        if new_machine:
+            bump(s, "machines")
+        record(s, "registrations")
+        emit(s, "registration", {"username": req.username, "created_at": datetime.datetime.utcnow().isoformat()})
+
+    await run_write_async(db, _create)
     return {"message": "注册成功", "username": req.username}
 
 
 @router.post("/login")
-def login(req: LoginRequest, request: Request, db: Session = Depends(get_db)):
-    user = db.query(User).filter(User.username == req.username).first()
-    if not user or not verify_password(req.password, user.password_hash):
+async def login(req: LoginRequest, request: Request, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(User).where(User.username == req.username))
+    if not user or not await run_in_threadpool(verify_password, req.password, user.password_hash):
         raise HTTPException(401, "用户名或密码错误")
 
     # 获取客户端 IP（标准化 localhost 变体）
@@ -124,20 +139,33 @@ def login(req: LoginRequest, request: Request, db: Session = Depends(get_db)):
     token_data = {
         "sub": user.username,
         "exp": expire,
+        "iat": int(time.time()),
         "ip": client_ip,
     }
     token = jwt.encode(token_data, SECRET_KEY, algorithm=ALGORITHM)
+    digest = token_digest(token)
 
     # 清除旧 Token，保存新 Token
-    db.query(LoginToken).filter(LoginToken.user_id == user.id).delete()
-    login_token = LoginToken(
-        user_id=user.id,
-        token=token,
-        client_ip=client_ip,
-        expires_at=expire,
-    )
-    db.add(login_token)
-    db.commit()
+    user_id = user.id
+
+    def _save(s: Session):
+        if revocation_set.enabled:
+            for old in s.query(LoginToken.token_hash, LoginToken.expires_at).filter(LoginToken.user_id == user_id):
+                # 同一秒内重复登录会得到完全相同的 Token，不能吊销
+                if old.token_hash != digest:
+                    revoke_on_commit(s, old.token_hash, old.expires_at)
+        removed = s.query(LoginToken).filter(LoginToken.user_id == user_id).delete()
+        s.add(LoginToken(
+            user_id=user_id,
+            token_hash=digest,
+            client_ip=client_ip,
+            expires_at=expire,
+        ))
+        bump(s, "login_tokens", 1 - removed)
+        record(s, "logins")
+        emit(s, "login", {"username": req.username, "client_ip": client_ip, "created_at": datetime.datetime.utcnow().isoformat()})
+
+    await run_write_async(db, _save)
 
     return {
         "message": "登录成功",
@@ -147,12 +175,40 @@ def login(req: LoginRequest, request: Request, db: Session = Depends(get_db)):
     }
 
 
+def _verify_token_locally(req: VerifyRequest):
+    """只校验 JWT 签名和声明 + 内存吊销表，不访问数据库，结果与查库方式一致"""
+    try:
+        claims = jwt.decode(req.token, SECRET_KEY, algorithms=[ALGORITHM])
+    except ExpiredSignatureError:
+        return {"valid": False, "reason": "Token已过期"}
+    except JWTError:
+        return {"valid": False, "reason": "Token不存在"}
+
+    digest = token_digest(req.token)
+    if revocation_set.is_revoked(digest, claims.get("iat")):
+        return {"valid": False, "reason": "Token不存在"}
+
+    if claims.get("sub") != req.username:
+        return {"valid": False, "reason": "用户名不匹配"}
+
+    client_ip = revocation_set.client_ip(digest, claims.get("ip", ""))
+    if normalize_ip(client_ip) != normalize_ip(req.client_ip):
+        return {"valid": False, "reason": "IP不匹配"}
+
+    return {"valid": True, "username": req.username}
+
+
 @router.post("/verify")
-def verify_token(req: VerifyRequest, db: Session = Depends(get_db)):
+async def verify_token(req: VerifyRequest, db: AsyncSession = Depends(get_async_db)):
     """供服务端 Mod 调用，验证玩家 Token + IP"""
-    login_token = db.query(LoginToken).filter(
-        LoginToken.token == req.token
-    ).first()
+    if TOKEN_VERIFY_MODE == "jwt":
+        return _verify_token_locally(req)
+
+    login_token = (await db.execute(
+        select(LoginToken.client_ip, LoginToken.expires_at, User.username)
+        .join(User, User.id == LoginToken.user_id)
+        .where(LoginToken.token_hash == token_digest(req.token))
+    )).first()
 
     if not login_token:
         return {"valid": False, "reason": "Token不存在"}
@@ -160,7 +216,7 @@ def verify_token(req: VerifyRequest, db: Session = Depends(get_db)):
     if login_token.expires_at < datetime.datetime.utcnow():
         return {"valid": False, "reason": "Token已过期"}
 
-    if login_token.user.username != req.username:
+    if login_token.username != req.username:
         return {"valid": False, "reason": "用户名不匹配"}
 
     if normalize_ip(login_token.client_ip) != normalize_ip(req.client_ip):
@@ -185,19 +241,30 @@ def verify_mod_api_key(request: Request = None, x_api_key: str = Header(None)):
 
 
 @router.post("/verify-player", dependencies=[Depends(verify_mod_api_key)])
-def verify_player(req: VerifyPlayerRequest, db: Session = Depends(get_db)):
+async def verify_player(req: VerifyPlayerRequest, db: AsyncSession = Depends(get_read_db)):
     """供服务端 Mod 调用，根据用户名 + IP 验证玩家是否通过启动器登录
     Mod 不知道 Token，只知道玩家用户名和 IP，
     所以这里根据用户名查找最新有效 Token 并校验 IP 是否匹配"""
-    user = db.query(User).filter(User.username == req.username).first()
-    if not user:
+    result = await _check_player(db, req)
+    if not result["valid"]:
+        # 读副本可能还没复制到刚完成的登录，失败结果再到主库确认一次
+        async with AsyncSessionLocal() as primary:
+            result = await _check_player(primary, req)
+    return result
+
+
+async def _check_player(db: AsyncSession, req: VerifyPlayerRequest) -> dict:
+    user_id = await db.scalar(select(User.id).where(User.username == req.username))
+    if not user_id:
         return {"valid": False, "reason": "用户不存在"}
 
     # 查找该用户最新的有效 Token
-    login_token = db.query(LoginToken).filter(
-        LoginToken.user_id == user.id,
-        LoginToken.expires_at > datetime.datetime.utcnow(),
-    ).order_by(LoginToken.created_at.desc()).first()
+    login_token = await db.scalar(
+        select(LoginToken).where(
+            LoginToken.user_id == user_id,
+            LoginToken.expires_at > datetime.datetime.utcnow(),
+        ).order_by(LoginToken.created_at.desc()).limit(1)
+    )
 
     if not login_token:
         return {"valid": False, "reason": "未登录或Token已过期，请通过启动器登录"}
@@ -216,37 +283,36 @@ class CreateLaunchTokenRequest(BaseModel):
 
 
 @router.post("/create-launch-token")
-def create_launch_token(req: CreateLaunchTokenRequest, request: Request, db: Session = Depends(get_db)):
+async def create_launch_token(req: CreateLaunchTokenRequest, request: Request,
+                              db: AsyncSession = Depends(get_async_db)):
     """启动器在启动游戏前调用，生成一次性 launch token"""
     # 验证登录 token 有效
-    from models import LoginToken, LaunchToken
-    login_token = db.query(LoginToken).filter(
-        LoginToken.token == req.token,
-        LoginToken.expires_at > datetime.datetime.utcnow(),
-    ).first()
-
-    if not login_token or login_token.user.username != req.username:
+    login_token = (await db.execute(
+        select(LoginToken.id, LoginToken.token_hash, LoginToken.client_ip, LoginToken.expires_at, User.username)
+        .join(User, User.id == LoginToken.user_id)
+        .where(
+            LoginToken.token_hash == token_digest(req.token),
+            LoginToken.expires_at > datetime.datetime.utcnow(),
+        )
+    )).first()
+
+    if not login_token or login_token.username != req.username:
         raise HTTPException(401, "登录 Token 无效或已过期")
 
     # 更新 login token 的 client_ip 为当前请求 IP（用户可能切换了网络）
     current_ip = normalize_ip(request.client.host)
     if login_token.client_ip != current_ip:
-        login_token.client_ip = current_ip
-
-
-    # 清理该用户旧的 launch token
-    db.query(LaunchToken).filter(LaunchToken.username == req.username).delete()
-
-    # 生成新的 launch token（2分钟有效）
-    launch_token = secrets.token_hex(32)
-    expires = datetime.datetime.utcnow() + datetime.timedelta(minutes=2)
-    lt = LaunchToken(
-        username=req.username,
-        token=launch_token,
-        expires_at=expires,
-    )
-    db.add(lt)
-    db.commit()
+        token_id, token_hash, token_expires = login_token.id, login_token.token_hash, login_token.expires_at
+        await run_write_async(db, lambda s: s.query(LoginToken).filter(LoginToken.id == token_id).update(
+            {LoginToken.client_ip: current_ip}
+        ))
+        if revocation_set.enabled:
+            revocation_set.set_ip(token_hash, current_ip, token_expires)
+
+    # 生成新的 launch token（覆盖该用户旧的 launch token，不写业务数据库）
+    # sqlite 存储时是阻塞的文件写入，放到线程池里执行
+    launch_token, expires_ts = await run_in_threadpool(launch_token_store.issue, req.username)
+    expires = datetime.datetime.utcfromtimestamp(expires_ts)
 
     return {"launch_token": launch_token, "expires_at": expires.isoformat()}
 
@@ -257,21 +323,9 @@ class VerifyLaunchTokenRequest(BaseModel):
 
 
 @router.post("/verify-launch-token", dependencies=[Depends(verify_mod_api_key)])
-def verify_launch_token(req: VerifyLaunchTokenRequest, db: Session = Depends(get_db)):
-    """服务端 Mod 调用，验证玩家的 launch token"""
-    from models import LaunchToken
-    lt = db.query(LaunchToken).filter(
-        LaunchToken.token == req.launch_token,
-        LaunchToken.username == req.username,
-        LaunchToken.used == 0,
-        LaunchToken.expires_at > datetime.datetime.utcnow(),
-    ).first()
-
-    if not lt:
+def verify_launch_token(req: VerifyLaunchTokenRequest):
+    """服务端 Mod 调用，验证玩家的 launch token（校验即作废，一次性）"""
+    if not launch_token_store.consume(req.username, req.launch_token):
         return {"valid": False, "reason": "启动令牌无效、已过期或已使用"}
 
-    # 标记为已使用（一次性）
-    lt.used = 1
-    db.commit()
-
     return {"valid": True, "username": req.username}
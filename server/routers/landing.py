@@ -1,12 +1,23 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import HTMLResponse
 
+from static_assets import ASSETS, IMMUTABLE, REVALIDATE, document
+
 router = APIRouter(tags=["官网"])
 
 
 @router.get("/", response_class=HTMLResponse)
-def landing_page():
-    return LANDING_HTML
+def landing_page(request: Request):
+    return LANDING_PAGE.response(request.headers, REVALIDATE)
+
+
+@router.get("/static/{filename}")
+def static_asset(filename: str, request: Request):
+    """页面样式和脚本，文件名带内容指纹，可以长期缓存"""
+    asset = ASSETS.get(filename)
+    if asset is None:
+        raise HTTPException(404, "文件不存在")
+    return asset.response(request.headers, IMMUTABLE)
 
 
 LANDING_HTML = r"""<!DOCTYPE html>
@@ -289,3 +300,5 @@ document.querySelectorAll('a[href^="#"]').forEach(a => {
 </script>
 </body>
 </html>"""
+
+LANDING_PAGE = document("landing", LANDING_HTML)
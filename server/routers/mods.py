@@ -1,13 +1,34 @@
 import os
+import re
 import json
 import hashlib
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import FileResponse
-
-from config import MODS_DIR, MODS_MANIFEST, MODS_DOWNLOAD_BASE_URL
+import tempfile
+import threading
+from typing import Any, Dict, Iterator, Set, Tuple
+from fastapi import APIRouter, Depends, Header, HTTPException, Request
+from fastapi.responses import FileResponse, Response
+
+import manifest_pack
+import rollout
+from fast_json import FastJSONResponse, stream_object
+from static_assets import REVALIDATE
+from config import MODS_DIR, MODS_MANIFEST, MODS_DOWNLOAD_BASE_URL, MODS_STORE_DIR, ADMIN_TOKEN
 
 router = APIRouter(prefix="/mods", tags=["Mods同步"])
 
+_MD5 = re.compile(r"[0-9a-f]{32}")
+
+# 生成清单（写入副本）和清理副本必须串行，否则一次刷新的清理可能删掉另一次刚保存的副本
+_refresh_lock = threading.Lock()
+
+
+def verify_admin(authorization: str = Header(None)):
+    """验证管理员 Token"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(503, "管理接口未配置 ADMIN_TOKEN")
+    if not authorization or authorization != f"Bearer {ADMIN_TOKEN}":
+        raise HTTPException(403, "无权限操作")
+
 
 def compute_md5(filepath: str) -> str:
     h = hashlib.md5()
@@ -17,45 +38,140 @@ def compute_md5(filepath: str) -> str:
     return h.hexdigest()
 
 
+def iter_manifest() -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """扫描 mods 目录，逐个产出 (文件名, 清单条目)"""
+    with os.scandir(MODS_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".jar") and entry.is_file():
+                yield entry.name, {
+                    "md5": compute_md5(entry.path),
+                    "size": entry.stat().st_size,
+                    "url": f"{MODS_DOWNLOAD_BASE_URL}/{entry.name}",
+                }
+
+
+def _store_copy(path: str) -> Tuple[str, int]:
+    """把 jar 复制进 MODS_STORE_DIR/<md5>.jar（边复制边计算 MD5，内容与清单一致），返回 (md5, 大小)"""
+    h = hashlib.md5()
+    size = 0
+    # 每次复制使用独立的临时文件，多个进程同时刷新也不会写到同一个文件里
+    fd, tmp = tempfile.mkstemp(dir=MODS_STORE_DIR, prefix=".", suffix=".tmp")
+    try:
+        with open(path, "rb") as src, os.fdopen(fd, "wb") as dst:
+            for chunk in iter(lambda: src.read(1024 * 1024), b""):
+                h.update(chunk)
+                dst.write(chunk)
+                size += len(chunk)
+    except BaseException:
+        os.remove(tmp)
+        raise
+    md5 = h.hexdigest()
+    stored = os.path.join(MODS_STORE_DIR, f"{md5}.jar")
+    # 已有的同名副本大小不对（例如之前写坏了）时用新副本替换
+    if os.path.isfile(stored) and os.path.getsize(stored) == size:
+        os.remove(tmp)
+    else:
+        os.replace(tmp, stored)
+    return md5, size
+
+
 def generate_manifest():
-    """扫描 mods 目录生成清单"""
+    """扫描 mods 目录生成清单，每个 jar 的副本按 MD5 保存，下载地址指向副本"""
     if not os.path.isdir(MODS_DIR):
         os.makedirs(MODS_DIR, exist_ok=True)
         return {}
-
+    os.makedirs(MODS_STORE_DIR, exist_ok=True)
     manifest = {}
-    for filename in os.listdir(MODS_DIR):
-        filepath = os.path.join(MODS_DIR, filename)
-        if os.path.isfile(filepath) and filename.endswith(".jar"):
-            manifest[filename] = {
-                "md5": compute_md5(filepath),
-                "size": os.path.getsize(filepath),
-                "url": f"{MODS_DOWNLOAD_BASE_URL}/{filename}",
-            }
+    with os.scandir(MODS_DIR) as entries:
+        for entry in entries:
+            if entry.name.endswith(".jar") and entry.is_file():
+                md5, size = _store_copy(entry.path)
+                manifest[entry.name] = {"md5": md5, "size": size, "url": f"{MODS_DOWNLOAD_BASE_URL}/{md5}/{entry.name}"}
     return manifest
 
 
+def _manifest_digests(manifest: Dict[str, Any]) -> Set[str]:
+    return {entry.get("md5") for entry in manifest.values() if isinstance(entry, dict)}
+
+
+def _prune_store(keep: Set[str]) -> int:
+    """删除不再被当前清单和放量中的新清单引用的副本"""
+    removed = 0
+    for name in os.listdir(MODS_STORE_DIR):
+        if name.endswith(".jar") and name[:-4] not in keep:
+            os.remove(os.path.join(MODS_STORE_DIR, name))
+            removed += 1
+    return removed
+
+
 @router.get("/manifest")
-def get_mods_manifest():
-    """返回服务端 mods 的 MD5 清单"""
-    # 优先读取手动维护的清单文件
+def get_mods_manifest(request: Request):
+    """返回服务端 mods 的 MD5 清单（Accept: application/x-msgpack 时返回二进制清单）"""
+    response = _manifest_response(request)
+    # 同一地址按机器码和 Accept 返回不同内容
+    response.headers["Vary"] = f"{rollout.VARY}, Accept"
+    return response
+
+
+def _manifest_response(request: Request) -> Response:
+    packed = manifest_pack.accepts(request.headers)
+
+    # 分批发布中且该机器已在放量范围内时返回新清单
+    asset = rollout.selected("mods", request)
+    if asset is not None:
+        body = manifest_pack.pack_json(asset.variants["identity"], MODS_DOWNLOAD_BASE_URL) if packed else None
+        if body is not None:
+            return manifest_pack.response(body)
+        return asset.response(request.headers, REVALIDATE)
+
+    # 优先返回手动维护（或 /refresh 生成）的清单文件：内容本身就是 JSON，原样发送，不解析再序列化
     if os.path.isfile(MODS_MANIFEST):
-        with open(MODS_MANIFEST, "r", encoding="utf-8") as f:
-            return json.load(f)
+        body = manifest_pack.pack_file(MODS_MANIFEST, MODS_DOWNLOAD_BASE_URL) if packed else None
+        if body is not None:
+            return manifest_pack.response(body)
+        return FileResponse(MODS_MANIFEST, media_type="application/json")
 
-    # 否则自动扫描生成
-    return generate_manifest()
+    # 否则边扫描边输出
+    if not os.path.isdir(MODS_DIR):
+        os.makedirs(MODS_DIR, exist_ok=True)
+        return FastJSONResponse({})
+    if packed:
+        return manifest_pack.response(manifest_pack.pack(iter_manifest(), MODS_DOWNLOAD_BASE_URL))
+    return stream_object(iter_manifest())
 
 
-@router.post("/refresh")
+@router.post("/refresh", dependencies=[Depends(verify_admin)])
 def refresh_manifest():
-    """重新扫描 mods 目录并更新清单文件"""
-    manifest = generate_manifest()
-    with open(MODS_MANIFEST, "w", encoding="utf-8") as f:
-        json.dump(manifest, f, indent=2, ensure_ascii=False)
+    """重新扫描 mods 目录并更新清单文件（开启分批发布时按机器码逐步放量）
+
+    清单里的下载地址指向按 MD5 保存的副本，放量期间直接替换或删除 MODS_DIR 里的 jar 不会影响
+    还拿着旧清单的机器；旧清单和新清单都不再引用的副本在这里清理，所以放量结束后旧副本保留到下一次刷新。
+    """
+    with _refresh_lock:
+        manifest = generate_manifest()
+        payload = json.dumps(manifest, indent=2, ensure_ascii=False)
+        version = hashlib.sha256(payload.encode("utf-8")).hexdigest()[:12]
+        rolling = rollout.start("mods", version, payload)
+        # start 之后清单文件是当前对未放量机器生效的版本（上一次放量已在 start 里完成）
+        with open(MODS_MANIFEST, encoding="utf-8") as f:
+            stable = json.load(f)
+        _prune_store(_manifest_digests(stable) | _manifest_digests(manifest))
+    if rolling:
+        return {"message": "清单已更新，正在分批发布", "count": len(manifest), "mods": manifest, "rollout": version}
     return {"message": "清单已更新", "count": len(manifest), "mods": manifest}
 
 
+@router.get("/download/{md5}/{filename}")
+def download_stored_mod(md5: str, filename: str):
+    """按 MD5 下载 /mods/refresh 保存的 mod 副本"""
+    if not _MD5.fullmatch(md5):
+        raise HTTPException(404, "Mod文件不存在")
+    filepath = os.path.join(MODS_STORE_DIR, f"{md5}.jar")
+    if not os.path.isfile(filepath):
+        raise HTTPException(404, "Mod文件不存在")
+    return FileResponse(filepath, filename=os.path.basename(filename))
+
+
 @router.get("/download/{filename}")
 def download_mod(filename: str):
     """下载单个 mod 文件"""
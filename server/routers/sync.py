@@ -1,10 +1,12 @@
 import os
 import json
 import hashlib
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import FileResponse
-from typing import Dict, Any
+from typing import Dict, Any, Iterator, Tuple
 
+import manifest_pack
+from fast_json import stream_object
 from config import SYNC_CONFIG_FILE
 
 router = APIRouter(prefix="/sync", tags=["通用同步"])
@@ -52,18 +54,9 @@ def get_sync_config():
     }
 
 
-@router.get("/{folder_id}/manifest")
-def get_folder_manifest(folder_id: str):
-    """扫描指定文件夹并返回文件清单"""
-    folder = get_folder_config(folder_id)
+def iter_folder_manifest(folder: Dict[str, Any]) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    """递归扫描文件夹，逐个产出 (相对路径, 清单条目)"""
     folder_path = folder["path"]
-
-    # 确保目录存在
-    if not os.path.isdir(folder_path):
-        os.makedirs(folder_path, exist_ok=True)
-        return {}
-
-    manifest = {}
     extensions = folder.get("extensions", [])
     sync_all = "*" in extensions  # 通配符：同步所有文件
     ext_tuple = tuple(extensions) if not sync_all else ()
@@ -81,7 +74,7 @@ def get_folder_manifest(folder_id: str):
                 rel_path = os.path.relpath(filepath, folder_path).replace("\\", "/")
 
                 try:
-                    manifest[rel_path] = {
+                    entry = {
                         "md5": compute_md5(filepath),
                         "size": os.path.getsize(filepath),
                         "url": f"{folder['download_base_url']}/{rel_path}"
@@ -89,8 +82,30 @@ def get_folder_manifest(folder_id: str):
                 except Exception as e:
                     print(f"处理文件失败 {filepath}: {e}")
                     continue
+                yield rel_path, entry
+
 
-    return manifest
+@router.get("/{folder_id}/manifest")
+def get_folder_manifest(folder_id: str, request: Request):
+    """扫描指定文件夹并返回文件清单
+
+    默认边计算 MD5 边输出 JSON，不在内存里拼完整清单；Accept: application/x-msgpack 时返回二进制清单
+    """
+    folder = get_folder_config(folder_id)
+    folder_path = folder["path"]
+
+    # 确保目录存在
+    if not os.path.isdir(folder_path):
+        os.makedirs(folder_path, exist_ok=True)
+        items = iter(())
+    else:
+        items = iter_folder_manifest(folder)
+
+    if manifest_pack.accepts(request.headers):
+        return manifest_pack.response(manifest_pack.pack(items, folder["download_base_url"]))
+    response = stream_object(items)
+    response.headers["Vary"] = "Accept"
+    return response
 
 
 @router.get("/{folder_id}/download/{filepath:path}")
@@ -0,0 +1,21 @@
+import os
+from fastapi import APIRouter, HTTPException, Request
+
+import rollout
+from static_assets import REVALIDATE, file_asset
+from config import UPDATES_DIR
+
+router = APIRouter(prefix="/updates", tags=["自动更新"])
+
+
+@router.get("/latest.yml")
+async def get_latest_yml(request: Request):
+    """启动器版本描述文件，分批发布期间按机器码返回新版本或当前版本（其余文件由 /updates 静态目录提供）"""
+    response = rollout.response_for("launcher", request)
+    if response is None:
+        asset = await file_asset(os.path.join(UPDATES_DIR, "latest.yml"), "text/yaml")
+        if asset is None:
+            raise HTTPException(404, "版本文件不存在")
+        response = asset.response(request.headers, REVALIDATE)
+        response.headers["Vary"] = rollout.VARY
+    return response
@@ -0,0 +1,112 @@
+"""后台用户名搜索索引
+
+`username LIKE '%x%'` 无法使用普通 B-Tree 索引，每次搜索都是全表扫描。
+这里为 users / anticheat_logs 的 username 建子串索引：
+- SQLite: FTS5 trigram 虚拟表（<表名>_fts，rowid = 原表 id），由 ORM 写入事件同步
+- MySQL: InnoDB FULLTEXT ngram 索引，由数据库自己维护
+
+trigram / ngram 至少需要 3 个字符，更短的搜索词和命中极多的常见片段回落到 LIKE。
+不经过 ORM 单行写入的批量删除/插入需要调用 remove_from_index / add_to_index 同步。
+"""
+import logging
+from typing import Iterable, Sequence
+
+from sqlalchemy import event, inspect, text
+from sqlalchemy.engine import Connection
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from models import User, AntiCheatLog
+
+logger = logging.getLogger("search_index")
+
+MIN_TERM_LENGTH = 3
+# FTS 命中数达到这个值时认为是常见片段，改用 LIKE（见 username_filter）
+DENSE_HITS = 2000
+
+# 需要建索引的表：模型 -> 索引列
+INDEXED = {User: "username", AntiCheatLog: "username"}
+
+
+def _fts_table(model) -> str:
+    return f"{model.__tablename__}_fts"
+
+
+def add_to_index(conn: Connection, model, rows: Sequence[tuple]):
+    """rows: [(id, 索引列值), ...]；rowid 可能被 SQLite 复用，先删后插"""
+    if conn.dialect.name != "sqlite" or not rows:
+        return
+    fts = _fts_table(model)
+    params = [{"id": row_id, "v": value} for row_id, value in rows]
+    conn.execute(text(f"DELETE FROM {fts} WHERE rowid = :id"), params)
+    conn.execute(text(f"INSERT INTO {fts} (rowid, {INDEXED[model]}) VALUES (:id, :v)"), params)
+
+
+def remove_from_index(conn: Connection, model, ids: Iterable[int]):
+    if conn.dialect.name != "sqlite":
+        return
+    params = [{"id": row_id} for row_id in ids]
+    if params:
+        conn.execute(text(f"DELETE FROM {_fts_table(model)} WHERE rowid = :id"), params)
+
+
+def _register(model):
+    column = INDEXED[model]
+
+    @event.listens_for(model, "after_insert")
+    def _after_insert(mapper, conn, target):
+        add_to_index(conn, model, [(target.id, getattr(target, column))])
+
+    @event.listens_for(model, "after_update")
+    def _after_update(mapper, conn, target):
+        if inspect(target).attrs[column].history.has_changes():
+            add_to_index(conn, model, [(target.id, getattr(target, column))])
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, conn, target):
+        remove_from_index(conn, model, [target.id])
+
+
+for _model in INDEXED:
+    _register(_model)
+
+
+async def username_filter(db: AsyncSession, model, term: str):
+    """搜索条件：够长且不太常见的搜索词走全文索引，否则用 LIKE。
+
+    命中很多行的常见片段用 LIKE 反而更快：按 (created_at, id) 倒序扫描几千行就能凑满一页，
+    而全文索引要先取出全部命中再排序。先在 FTS 表上做一次带 LIMIT 的计数来判断。"""
+    column = getattr(model, INDEXED[model])
+    dialect = db.bind.dialect.name
+    if len(term) < MIN_TERM_LENGTH or '"' in term or dialect not in ("sqlite", "mysql"):
+        return column.contains(term)
+    phrase = f'"{term}"'
+    if dialect == "mysql":
+        return column.match(phrase)
+    match = f"SELECT rowid FROM {_fts_table(model)} WHERE {INDEXED[model]} MATCH :phrase"
+    hits = await db.scalar(
+        text(f"SELECT COUNT(*) FROM ({match} LIMIT :n)"), {"phrase": phrase, "n": DENSE_HITS}
+    )
+    if hits >= DENSE_HITS:
+        return column.contains(term)
+    return model.id.in_(text(match).bindparams(phrase=phrase))
+
+
+def ensure_search_index(conn: Connection):
+    """建索引（由 migrations.py 调用）；SQLite 新建 FTS 表时从原表回填"""
+    dialect = conn.dialect.name
+    existing = set(inspect(conn).get_table_names())
+    for model, column in INDEXED.items():
+        table = model.__tablename__
+        if dialect == "sqlite":
+            fts = _fts_table(model)
+            if fts in existing:
+                continue
+            conn.execute(text(f"CREATE VIRTUAL TABLE {fts} USING fts5({column}, tokenize='trigram')"))
+            conn.execute(text(f"INSERT INTO {fts} (rowid, {column}) SELECT id, {column} FROM {table}"))
+            logger.info("已创建并回填搜索索引 %s", fts)
+        elif dialect == "mysql":
+            name = f"ft_{table}_{column}"
+            if any(ix["name"] == name for ix in inspect(conn).get_indexes(table)):
+                continue
+            conn.execute(text(f"ALTER TABLE {table} ADD FULLTEXT INDEX {name} ({column}) WITH PARSER ngram"))
+            logger.info("已创建全文索引 %s", name)
@@ -0,0 +1,116 @@
+"""按请求统计 SQL（可选，SQL_PROFILE=1 开启）
+
+在所有 Engine 上挂 before/after_cursor_execute 事件，把语句数、数据库耗时和
+每种语句（参数化后的 SQL 文本）的执行次数累计到当前请求的 ContextVar 里。
+- 非生产环境在响应头返回 X-DB-Statements / X-DB-Time-Ms / X-DB-Max-Repeat
+- 语句数或耗时超过阈值时记录告警
+- 同一语句在一个请求里重复执行多次（典型的 N+1：循环里逐行懒加载关联对象）时记录告警，带上路由
+
+async 会话的语句在当前协程的上下文里执行，run_in_threadpool / asyncio.to_thread 会复制上下文，
+都能归到发起的请求上；写队列线程里执行的语句是多个请求合并提交的，不计入单个请求。
+"""
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from config import (
+    IS_PROD, SQL_PROFILE_MAX_STATEMENTS, SQL_PROFILE_MAX_DB_MS, SQL_PROFILE_REPEAT_THRESHOLD,
+)
+
+logger = logging.getLogger("sql_profiler")
+
+
+class RequestProfile:
+    __slots__ = ("statements", "db_time", "shapes")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        self.shapes: Counter = Counter()
+
+    def max_repeat(self):
+        """重复次数最多的语句和次数"""
+        if not self.shapes:
+            return None, 0
+        return self.shapes.most_common(1)[0]
+
+
+_current: ContextVar[Optional[RequestProfile]] = ContextVar("sql_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _current.get() is not None:
+        conn.info.setdefault("sql_profile_start", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = _current.get()
+    if profile is None:
+        return
+    starts = conn.info.get("sql_profile_start")
+    if starts:
+        profile.db_time += time.perf_counter() - starts.pop()
+    profile.statements += 1
+    profile.shapes[statement] += 1
+
+
+def install():
+    """在所有 Engine（含 async 引擎底层的同步引擎）上注册事件"""
+    event.listen(Engine, "before_cursor_execute", _before_cursor_execute)
+    event.listen(Engine, "after_cursor_execute", _after_cursor_execute)
+
+
+def _route_name(scope) -> str:
+    route = scope.get("route")
+    path = getattr(route, "path", None) or scope.get("path", "?")
+    return f"{scope.get('method', '')} {path}"
+
+
+class SQLProfilerMiddleware:
+    """ASGI 中间件：为每个 HTTP 请求建立一个 RequestProfile"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = RequestProfile()
+        token = _current.set(profile)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start" and not IS_PROD:
+                _, repeat = profile.max_repeat()
+                headers = list(message.get("headers", []))
+                headers += [
+                    (b"x-db-statements", str(profile.statements).encode()),
+                    (b"x-db-time-ms", f"{profile.db_time * 1000:.2f}".encode()),
+                    (b"x-db-max-repeat", str(repeat).encode()),
+                ]
+                message = dict(message, headers=headers)
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            _current.reset(token)
+            _report(scope, profile)
+
+
+def _report(scope, profile: RequestProfile):
+    route = _route_name(scope)
+    db_ms = profile.db_time * 1000
+    if profile.statements > SQL_PROFILE_MAX_STATEMENTS or db_ms > SQL_PROFILE_MAX_DB_MS:
+        logger.warning("%s: %d 条 SQL，数据库耗时 %.1fms", route, profile.statements, db_ms)
+    for statement, count in profile.shapes.items():
+        if count >= SQL_PROFILE_REPEAT_THRESHOLD:
+            logger.warning(
+                "%s: 疑似 N+1，同一语句执行了 %d 次: %s",
+                route, count, " ".join(statement.split())[:300],
+            )
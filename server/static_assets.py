@@ -0,0 +1,272 @@
+"""静态内容的预压缩和缓存
+
+官网和后台页面是代码里的大段 HTML 常量，启动时处理一次：
+- 内联的 <style> / <script> 抽成带内容指纹的独立文件（/static/<页面>.<指纹>.css|js），
+  内容不变地址就不变，按 immutable 长期缓存；HTML 本身用 no-cache + ETag，每次只做一次 304 协商
+- 每份内容预先生成 gzip 和 brotli（需安装 brotli 包，未安装时只有 gzip）压缩版本，
+  按 Accept-Encoding 选择，带 Vary: Accept-Encoding，不同编码使用不同的 ETag
+
+/updates 下的文本文件（latest.yml 等）由 CompressedStaticFiles 按同样方式处理，
+压缩结果按 (路径, 修改时间, 大小) 缓存，文件被替换后自动失效。
+其余文件（启动器 exe 等）支持 Range 请求（单段或多段 multipart/byteranges），
+启动器按 blockmap 差分更新时只下载变化的块（见 releases.py）。
+"""
+import functools
+import gzip
+import hashlib
+import os
+import re
+import secrets
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import anyio
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import StaticFiles
+
+try:
+    import brotli
+except ImportError:  # 可选依赖
+    brotli = None
+
+# 小于这个大小的内容压缩收益不大，只提供原文
+MIN_COMPRESS_BYTES = 512
+# brotli 最高级别约 1MB/s，超过这个大小的内容（大清单等）用较低级别
+BROTLI_MAX_QUALITY_BYTES = 256 * 1024
+# /updates 下超过这个大小的文本文件不读进内存压缩
+MAX_FILE_COMPRESS_BYTES = 2 * 1024 * 1024
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+TEXT_SUFFIXES = {".yml", ".yaml", ".json", ".txt", ".xml", ".html", ".css", ".js", ".md"}
+
+# 一个 Range 请求最多包含的区间数，超过则按整个文件返回
+MAX_RANGES = 256
+
+
+def _negotiate(accept_encoding: str, available) -> str:
+    prefs: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        for param in params.split(";"):
+            key, _, value = param.strip().partition("=")
+            if key == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        prefs[name.strip().lower()] = q
+    for encoding in ("br", "gzip"):
+        if encoding in available and prefs.get(encoding, prefs.get("*", 0.0)) > 0:
+            return encoding
+    return "identity"
+
+
+class Asset:
+    """一份内容及其预压缩版本"""
+
+    def __init__(self, body: bytes, media_type: str):
+        self.media_type = media_type
+        digest = hashlib.sha256(body).hexdigest()
+        self.fingerprint = digest[:12]
+        self.variants: Dict[str, bytes] = {"identity": body}
+        if len(body) >= MIN_COMPRESS_BYTES:
+            self.variants["gzip"] = gzip.compress(body, compresslevel=9, mtime=0)
+            if brotli is not None:
+                quality = 11 if len(body) <= BROTLI_MAX_QUALITY_BYTES else 5
+                self.variants["br"] = brotli.compress(body, quality=quality)
+        self.etags = {
+            encoding: f'"{digest[:32]}"' if encoding == "identity" else f'"{digest[:32]}-{encoding}"'
+            for encoding in self.variants
+        }
+
+    def response(self, request_headers: Mapping[str, str], cache_control: str) -> Response:
+        encoding = _negotiate(request_headers.get("accept-encoding", ""), self.variants)
+        etag = self.etags[encoding]
+        headers = {"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+        if_none_match = request_headers.get("if-none-match")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            return Response(status_code=304, headers=headers)
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        return Response(self.variants[encoding], media_type=self.media_type, headers=headers)
+
+
+# 带指纹的文件名 -> 内容，由 /static/{filename} 提供
+ASSETS: Dict[str, Asset] = {}
+
+_INLINE_STYLE = re.compile(r"<style>(.*?)</style>", re.S)
+_INLINE_SCRIPT = re.compile(r"<script>(.*?)</script>", re.S)
+
+
+def _register(page: str, ext: str, content: str, media_type: str) -> str:
+    asset = Asset(content.encode("utf-8"), media_type)
+    filename = f"{page}.{asset.fingerprint}.{ext}"
+    ASSETS[filename] = asset
+    return f"/static/{filename}"
+
+
+def document(page: str, html: str) -> Asset:
+    """把页面里内联的样式和脚本抽成带指纹的文件，返回替换后的 HTML"""
+    html = _INLINE_STYLE.sub(
+        lambda m: f'<link rel="stylesheet" href="{_register(page, "css", m.group(1), "text/css")}">',
+        html,
+    )
+    html = _INLINE_SCRIPT.sub(
+        lambda m: f'<script src="{_register(page, "js", m.group(1), "application/javascript; charset=utf-8")}"></script>',
+        html,
+    )
+    return Asset(html.encode("utf-8"), "text/html")
+
+
+@functools.lru_cache(maxsize=64)
+def _file_asset(path: str, mtime_ns: int, size: int, media_type: str) -> Asset:
+    with open(path, "rb") as f:
+        return Asset(f.read(), media_type)
+
+
+async def file_asset(path: str, media_type: str) -> Optional[Asset]:
+    """文件的预压缩版本（按修改时间和大小缓存），文件不存在时返回 None"""
+    try:
+        stat = await anyio.to_thread.run_sync(os.stat, path)
+    except FileNotFoundError:
+        return None
+    return await anyio.to_thread.run_sync(_file_asset, path, stat.st_mtime_ns, stat.st_size, media_type)
+
+
+def parse_range(header: str, size: int) -> Optional[List[Tuple[int, int]]]:
+    """解析 Range: bytes=...，返回按起点排序、合并重叠后的 [start, end) 区间
+
+    格式不对或不是 bytes 单位时返回 None（按整个文件响应），没有可满足的区间时返回 []。
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or not spec.strip():
+        return None
+    ranges = []
+    for part in spec.split(","):
+        first, sep, last = part.strip().partition("-")
+        if not sep:
+            return None
+        try:
+            if first:
+                start = int(first)
+                end = int(last) + 1 if last else None
+                if start < 0 or (end is not None and end <= start):
+                    return None
+                end = size if end is None else min(end, size)
+            else:
+                suffix = int(last)
+                if suffix < 0:
+                    return None
+                start, end = max(size - suffix, 0), size
+        except ValueError:
+            return None
+        if start < end:
+            ranges.append((start, end))
+    if len(ranges) > MAX_RANGES:
+        return None
+    merged: List[Tuple[int, int]] = []
+    for start, end in sorted(ranges):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+class RangeFileResponse(Response):
+    """按区间读取文件的 206 响应，多个区间时为 multipart/byteranges"""
+
+    chunk_size = 64 * 1024
+
+    def __init__(self, path: str, ranges: List[Tuple[int, int]], size: int, media_type: str, headers: Mapping[str, str]):
+        self.path = path
+        self.status_code = 206
+        self.media_type = None
+        self.background = None
+        self.parts: List[Tuple[bytes, int, int]] = []
+        if len(ranges) == 1:
+            start, end = ranges[0]
+            self.init_headers(headers)
+            self.headers["content-type"] = media_type
+            self.headers["content-range"] = f"bytes {start}-{end - 1}/{size}"
+            self.headers["content-length"] = str(end - start)
+            self.parts.append((b"", start, end))
+            self.tail = b""
+        else:
+            boundary = secrets.token_hex(16)
+            for start, end in ranges:
+                head = (
+                    f"--{boundary}\r\nContent-Type: {media_type}\r\n"
+                    f"Content-Range: bytes {start}-{end - 1}/{size}\r\n\r\n"
+                ).encode("latin-1")
+                self.parts.append((head if not self.parts else b"\r\n" + head, start, end))
+            self.tail = f"\r\n--{boundary}--\r\n".encode("latin-1")
+            self.init_headers(headers)
+            self.headers["content-type"] = f"multipart/byteranges; boundary={boundary}"
+            length = sum(len(head) + end - start for head, start, end in self.parts) + len(self.tail)
+            self.headers["content-length"] = str(length)
+
+    async def __call__(self, scope, receive, send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"].upper() == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        async with await anyio.open_file(self.path, mode="rb") as file:
+            for head, start, end in self.parts:
+                if head:
+                    await send({"type": "http.response.body", "body": head, "more_body": True})
+                await file.seek(start)
+                remaining = end - start
+                while remaining > 0:
+                    chunk = await file.read(min(self.chunk_size, remaining))
+                    if not chunk:
+                        raise RuntimeError(f"文件 {self.path} 在读取时被截断")
+                    remaining -= len(chunk)
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+        await send({"type": "http.response.body", "body": self.tail, "more_body": False})
+
+
+def _range_response(response: FileResponse, request_headers: Headers) -> Response:
+    """对非文本文件处理 Range / If-Range，没有 Range 时原样返回并声明 Accept-Ranges"""
+    response.headers["accept-ranges"] = "bytes"
+    range_header = request_headers.get("range")
+    if not range_header:
+        return response
+    # If-Range 与当前版本不符（文件已被替换）时按整个文件返回，避免拼出新旧混合的内容
+    if_range = request_headers.get("if-range")
+    if if_range and if_range not in (response.headers.get("etag"), response.headers.get("last-modified")):
+        return response
+    size = response.stat_result.st_size
+    ranges = parse_range(range_header, size)
+    if ranges is None:
+        return response
+    if not ranges:
+        return Response(status_code=416, headers={"Content-Range": f"bytes */{size}", "Accept-Ranges": "bytes"})
+    headers = {
+        key: response.headers[key]
+        for key in ("etag", "last-modified", "accept-ranges", "cache-control")
+        if key in response.headers
+    }
+    return RangeFileResponse(response.path, ranges, size, response.media_type, headers)
+
+
+class CompressedStaticFiles(StaticFiles):
+    """文本文件使用预压缩版本和内容 ETag，其余文件支持 Range 请求"""
+
+    async def get_response(self, path: str, scope) -> Response:
+        response = await super().get_response(path, scope)
+        if not isinstance(response, FileResponse) or response.status_code != 200 or response.stat_result is None:
+            return response
+        if os.path.splitext(response.path)[1].lower() not in TEXT_SUFFIXES:
+            return _range_response(response, Headers(scope=scope))
+        if response.stat_result.st_size > MAX_FILE_COMPRESS_BYTES:
+            return response
+        stat = response.stat_result
+        # 同一文件的后续请求直接命中缓存，只有首次（或文件变化后）需要读文件和压缩
+        asset = await anyio.to_thread.run_sync(
+            _file_asset, response.path, stat.st_mtime_ns, stat.st_size, response.media_type,
+        )
+        return asset.response(Headers(scope=scope), REVALIDATE)
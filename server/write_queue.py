@@ -0,0 +1,133 @@
+"""单写线程 + 组提交
+
+SQLite 同一时刻只允许一个写事务，多个请求各自 commit 会在数据库锁上排队，
+高峰期表现为 "database is locked"。开启写队列后，所有写操作都提交给同一个线程，
+该线程每隔几毫秒把积压的操作合并进一个事务、一次提交（一次 fsync）。
+
+整批操作先在同一个事务里依次执行，每个操作之后 flush，后面的操作能看到前面操作的写入；
+如果其中某个操作抛异常，整批回滚后再逐个单独提交，失败的操作只影响它自己。
+因此提交的操作必须可以安全重放（每次调用都新建对象，不依赖外部状态）。
+调用方通过 Future 拿到自己那一条的结果或异常。
+"""
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import Session, sessionmaker
+
+logger = logging.getLogger("write_queue")
+
+WriteOp = Callable[[Session], Any]
+
+
+def sqlite_writer_sessionmaker(engine: Engine) -> sessionmaker:
+    """写线程专用的 SQLite 会话工厂
+
+    pysqlite 默认在第一条写语句前才隐式 BEGIN（DEFERRED），批内先读后写时要从读锁升级为写锁，
+    其他连接持有读锁时会直接报 "database is locked"。这里关掉驱动自己的事务管理，
+    每批开始就用 BEGIN IMMEDIATE 拿到写锁。
+    """
+    @event.listens_for(engine, "connect")
+    def _disable_pysqlite_transactions(dbapi_conn, _):
+        dbapi_conn.isolation_level = None
+
+    @event.listens_for(engine, "begin")
+    def _begin_immediate(conn):
+        conn.exec_driver_sql("BEGIN IMMEDIATE")
+
+    return sessionmaker(bind=engine, autoflush=False, autocommit=False)
+
+
+class WriteQueue:
+    def __init__(self, session_factory, interval_ms: int = 5, max_batch: int = 64):
+        self._session_factory = session_factory
+        self._interval = interval_ms / 1000
+        self._max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[Future, WriteOp]]" = queue.Queue()
+        self._thread = None
+        self._stopping = threading.Event()
+        self.batches = 0
+        self.ops = 0
+
+    def start(self):
+        if self._thread is None:
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name="db-writer", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        """停止写线程，队列中剩余的操作会先全部提交"""
+        if self._thread is not None:
+            self._stopping.set()
+            self._thread.join()
+            self._thread = None
+
+    def submit(self, fn: WriteOp) -> Future:
+        future: Future = Future()
+        self._queue.put((future, fn))
+        return future
+
+    def _collect(self) -> List[Tuple[Future, WriteOp]]:
+        try:
+            batch = [self._queue.get(timeout=0.1)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self._interval
+        while len(batch) < self._max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._collect()
+            if batch:
+                self._process(batch)
+
+    def _process(self, batch: List[Tuple[Future, WriteOp]]):
+        pending = [(future, fn) for future, fn in batch if future.set_running_or_notify_cancel()]
+        if not pending:
+            return
+        session = self._session_factory()
+        try:
+            try:
+                results = []
+                for _, fn in pending:
+                    results.append(fn(session))
+                    # 会话不自动 flush：每个操作执行完立即 flush，后面的操作才能看到前面操作的写入，
+                    # 与各自单独提交时的结果一致（例如同一用户的两次登录只留下一个 Token）
+                    session.flush()
+                session.commit()
+            except Exception:
+                # 整批回滚，再逐个单独提交，把失败的操作隔离出来
+                session.rollback()
+                self._replay(session, pending)
+            else:
+                for (future, _), result in zip(pending, results):
+                    future.set_result(result)
+        finally:
+            session.close()
+        self.batches += 1
+        self.ops += len(pending)
+
+    @staticmethod
+    def _replay(session: Session, pending: List[Tuple[Future, WriteOp]]):
+        for future, fn in pending:
+            try:
+                result = fn(session)
+                session.commit()
+            except BaseException as e:
+                session.rollback()
+                future.set_exception(e)
+            else:
+                future.set_result(result)